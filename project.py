@@ -62,6 +62,9 @@ project = dict(
     entry_points={
         'console_scripts': [
             'soylent = soylent_recipes.main:main', # just an example, any module will do, this template doesn't care where you put it
+            'soylent-benchmark = soylent_recipes.benchmark:main',
+            'soylent-benchmark-solvers = soylent_recipes.benchmark:compare_solvers',
+            'soylent-synthetic-usda = soylent_recipes.synthetic:main',
         ],
     },
     
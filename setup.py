@@ -34,12 +34,17 @@ setup(
                        'Programming Language :: Python :: Implementation :: CPython',
                        'Programming Language :: Python :: Implementation :: Stackless'],
     'description': 'Mine a food database for food combinations that match a nutrient profile',
-    'entry_points': {'console_scripts': ['soylent = soylent_recipes.main:main']},
+    'entry_points': {   'console_scripts': [   'soylent = soylent_recipes.main:main',
+                                               'soylent-benchmark = soylent_recipes.benchmark:main',
+                                               'soylent-benchmark-solvers = soylent_recipes.benchmark:compare_solvers',
+                                               'soylent-synthetic-usda = soylent_recipes.synthetic:main']},
     'extras_require': {   'dev': ['numpydoc', 'sphinx', 'sphinx-rtd-theme'],
+                          'parquet': ['pyarrow'],
+                          'solvers': ['scipy>=1.9'],
                           'test': ['pytest', 'pytest-env']},
     'install_requires': [   'attrs',
                             'chicken-turtle-util[click,test,data_frame,path,logging]==4.*',
-                            'numpy',
+                            'numpy>=1.17',
                             'pandas',
                             'tabulate',
                             'swiglpk',
@@ -0,0 +1,427 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Benchmarks of loading foods, solving and mining, compared to a baseline
+
+Run ``soylent-benchmark --usda-data data/usda_nutrient_db_sr28`` to compare
+against the baseline file, or add ``--save-baseline`` to replace it. Run
+``soylent-benchmark-solvers --usda-data data/usda_nutrient_db_sr28`` to compare
+the solvers to each other.
+'''
+
+from collections import OrderedDict
+from pathlib import Path
+from functools import partial
+import json
+import logging
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from chicken_turtle_util import click as click_
+from tabulate import tabulate
+import click
+import numpy as np
+import swiglpk as glp
+from soylent_recipes import __version__
+from soylent_recipes import nutrition_target as nutrition_target_, foods as foods_, main as main_
+from soylent_recipes.config import max_foods
+from soylent_recipes.mining.miners import Miner
+from soylent_recipes.mining.sampling import sample_recipes
+from soylent_recipes.mining.screening import Screen
+from soylent_recipes.solver import GlpkSolver, solvers
+
+_logger = logging.getLogger(__name__)
+
+def benchmark_import(usda_directory):
+    '''
+    Benchmark `soylent_recipes.foods.import_usda`
+    
+    Parameters
+    ----------
+    usda_directory : Path
+    
+    Returns
+    -------
+    OrderedDict
+        ``seconds``: wall time of the import. ``peak_bytes``: peak memory
+        allocated during the import, as traced by tracemalloc in a second
+        import (tracing slows it down).
+    '''
+    start = time.perf_counter()
+    foods_.import_usda(usda_directory)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        foods_.import_usda(usda_directory)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return OrderedDict([('seconds', seconds), ('peak_bytes', peak_bytes)])
+
+def get_candidates(nutrition_target, foods, seed, count, max_tries=10**6):
+    '''
+    Get fixed sets of feasible and infeasible recipes to benchmark solving on
+    
+    Recipes are picked as the miner does, with a fixed seed, so the same foods
+    give the same candidates. Only recipes which pass the screen are used, as
+    only those are solved when mining.
+    
+    Parameters
+    ----------
+    nutrition_target : soylent_recipes.nutrition_target.NutritionTarget
+    foods : np.array
+    seed : int
+    count : int
+        Number of recipes to get of each set
+    max_tries : int
+        Number of recipes to try at most. Sets may be smaller when reached.
+    
+    Returns
+    -------
+    feasible : [np.array([int])]
+        Food indices of recipes which can be solved
+    infeasible : [np.array([int])]
+        Food indices of recipes which cannot be solved
+    '''
+    rng = np.random.default_rng(seed)
+    screen = Screen(nutrition_target, foods)
+    solver = GlpkSolver(nutrition_target, foods)
+    foods_per_recipe = min(max_foods, len(foods))
+    feasible = []
+    infeasible = []
+    for _ in range(0, max_tries, 1000):
+        batch = sample_recipes(rng, len(foods), 1000, foods_per_recipe)
+        for food_indices in batch[screen(batch)]:
+            candidates = infeasible if solver.solve(food_indices) is None else feasible
+            if len(candidates) < count:
+                candidates.append(food_indices)
+        if len(feasible) == count and len(infeasible) == count:
+            break
+    return feasible, infeasible
+
+def benchmark_solve(nutrition_target, foods, candidates, repeat=3, solver='glpk', granularity=1, round_relaxation=False):
+    '''
+    Benchmark solving with one of `soylent_recipes.solver.solvers`
+    
+    Parameters
+    ----------
+    nutrition_target : soylent_recipes.nutrition_target.NutritionTarget
+    foods : np.array
+    candidates : [np.array([int])]
+        Recipes to solve, see `get_candidates`
+    repeat : int
+        Number of times to solve all candidates
+    solver : str
+        Name of the solver
+    granularity : int
+    round_relaxation : bool
+        See `soylent_recipes.solver.GlpkSolver`
+        
+    Returns
+    -------
+    OrderedDict or None
+        ``median_seconds`` and ``mean_seconds``: wall time of a solve.
+        ``solves_per_second``. ``iterations_mean``: simplex iterations per
+        solve (None if the solver has no simplex iterations) and
+        ``kkt_violations``: solves rejected by the KKT check, both from a
+        separate pass with telemetry on so they don't skew the timings. None if
+        there are no candidates.
+    '''
+    if not candidates:
+        return None
+    solver_class = solvers[solver]
+    solver = solver_class(nutrition_target, foods, granularity=granularity, round_relaxation=round_relaxation)
+    latencies = []
+    for _ in range(repeat):
+        for food_indices in candidates:
+            start = time.perf_counter()
+            solver.solve(food_indices)
+            latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies)
+    solver = solver_class(nutrition_target, foods, telemetry=True, granularity=granularity, round_relaxation=round_relaxation)
+    for food_indices in candidates:
+        solver.solve(food_indices)
+    telemetry = solver.stats.telemetry
+    iterations_mean = telemetry.iterations.mean
+    return OrderedDict([
+        ('median_seconds', float(np.median(latencies))),
+        ('mean_seconds', float(latencies.mean())),
+        ('solves_per_second', len(latencies) / float(latencies.sum())),
+        ('iterations_mean', None if iterations_mean is None else float(iterations_mean)),
+        ('kkt_violations', telemetry.outcomes['kkt_violation']),
+    ])
+
+def benchmark_mine(nutrition_target, foods, seed, seconds, solver='glpk', granularity=1, round_relaxation=False):
+    '''
+    Benchmark `soylent_recipes.mining.miners.Miner` end to end
+    
+    Mines with a single miner, i.e. a single process.
+    
+    Parameters
+    ----------
+    nutrition_target : soylent_recipes.nutrition_target.NutritionTarget
+    foods : np.array
+    seed : int
+    seconds : float
+        How long to mine
+    solver : str
+        Name of the solver, one of `soylent_recipes.solver.solvers`
+    granularity : int
+    round_relaxation : bool
+        See `soylent_recipes.solver.GlpkSolver`
+    
+    Returns
+    -------
+    OrderedDict
+        ``tried_per_second`` and ``solved_per_second``: recipes per second
+    '''
+    cancelled = threading.Event()
+    miner = Miner(np.random.default_rng(seed), cancelled, granularity=granularity, round_relaxation=round_relaxation, solver=solver)
+    timer = threading.Timer(seconds, cancelled.set)
+    start = time.perf_counter()
+    timer.start()
+    try:
+        for _ in miner.iter_random(nutrition_target, foods):
+            pass
+    finally:
+        timer.cancel()
+    elapsed = time.perf_counter() - start
+    stats = miner.stats
+    return OrderedDict([
+        ('tried_per_second', stats.recipes_tried / elapsed),
+        ('solved_per_second', stats.recipes_solved / elapsed),
+    ])
+
+def benchmark_solvers(nutrition_target, foods, candidates, names, granularity=1, round_relaxation=False):
+    '''
+    Benchmark solvers against each other on the same recipes
+    
+    Parameters
+    ----------
+    nutrition_target : soylent_recipes.nutrition_target.NutritionTarget
+    foods : np.array
+    candidates : [np.array([int])]
+        Recipes to solve, see `get_candidates`
+    names : [str]
+        Names of the solvers to benchmark, see `soylent_recipes.solver.solvers`.
+        The first available one is the reference to compare the others to.
+    granularity : int
+    round_relaxation : bool
+        See `soylent_recipes.solver.GlpkSolver`
+        
+    Returns
+    -------
+    OrderedDict
+        By solver name, ``recipes_per_second``; ``solved``: number of
+        candidates solved; ``agreement``: fraction of candidates on which the
+        solver agrees with the reference on whether it can be solved; and
+        ``invalid``: number of solutions which do not satisfy the nutrition
+        target. Or, when the solver is unavailable (e.g. missing a
+        dependency), the reason why.
+    '''
+    minima = nutrition_target['min'].values
+    maxima = nutrition_target['max'].values
+    reference = None
+    results = OrderedDict()
+    for name in names:
+        try:
+            solver = solvers[name](nutrition_target, foods, granularity=granularity, round_relaxation=round_relaxation)
+        except Exception as ex:
+            _logger.warning('Skipping solver {}: {}'.format(name, ex))
+            results[name] = str(ex)
+            continue
+        start = time.perf_counter()
+        solutions = [solver.solve(food_indices) for food_indices in candidates]
+        elapsed = time.perf_counter() - start
+        solved = np.array([amounts is not None for amounts in solutions])
+        if reference is None:
+            reference = solved
+        invalid = 0
+        for food_indices, amounts in zip(candidates, solutions):
+            if amounts is not None:
+                nutrition = amounts @ foods[food_indices]
+                too_little = (nutrition < minima) & ~np.isclose(nutrition, minima)
+                too_much = (nutrition > maxima) & ~np.isclose(nutrition, maxima)
+                invalid += bool((too_little | too_much).any())
+        results[name] = OrderedDict([
+            ('recipes_per_second', len(candidates) / elapsed),
+            ('solved', int(solved.sum())),
+            ('agreement', float((solved == reference).mean())),
+            ('invalid', invalid),
+        ])
+    return results
+
+def _higher_is_better(metric):
+    return metric.endswith('_per_second')
+
+def compare(results, baseline, tolerance):
+    '''
+    Compare benchmark results to a baseline
+    
+    Parameters
+    ----------
+    results : {str => {str => float} or None}
+        Metrics by benchmark, as returned by the benchmark_* functions
+    baseline : {str => {str => float} or None}
+        Results to compare to
+    tolerance : float
+        Fraction a metric may be worse than its baseline before it counts as a
+        regression. Metrics ending in ``_per_second`` are better when higher,
+        others when lower. A metric with a baseline of 0, e.g. the count
+        ``kkt_violations``, regresses on any change for the worse.
+    
+    Returns
+    -------
+    [(str, str, float or None, float or None, float or None, bool)]
+        (benchmark, metric, baseline value, value, change, regression) for
+        each metric in results or baseline. Change is the relative change of
+        the value, None when either value is missing or the baseline is 0.
+    '''
+    rows = []
+    for benchmark in sorted(set(results) | set(baseline)):
+        metrics = results.get(benchmark) or {}
+        baseline_metrics = baseline.get(benchmark) or {}
+        for metric in sorted(set(metrics) | set(baseline_metrics)):
+            value = metrics.get(metric)
+            baseline_value = baseline_metrics.get(metric)
+            if value is None or baseline_value is None:
+                change = None
+                regression = False
+            elif baseline_value == 0:
+                change = None
+                regression = value < 0 if _higher_is_better(metric) else value > 0
+            else:
+                change = value / baseline_value - 1
+                regression = (-change if _higher_is_better(metric) else change) > tolerance
+            rows.append((benchmark, metric, baseline_value, value, change, regression))
+    return rows
+
+def _get_environment():
+    return OrderedDict([
+        ('soylent_recipes', __version__),
+        ('python', platform.python_version()),
+        ('numpy', np.__version__),
+        ('glpk', glp.glp_version()),
+        ('machine', platform.machine()),
+        ('processor', platform.processor()),
+        ('time', time.strftime('%Y-%m-%dT%H:%M:%S%z')),
+    ])
+
+_benchmarks = ('import', 'solve', 'mine')
+
+@click.command(context_settings={'help_option_names': ['-h', '--help']})
+@click_.option('--usda-data', 'usda_directory', type=click.Path(exists=True, file_okay=False), help='USDA data directory to benchmark on')
+@click_.option('--cache-dir', 'cache_directory', type=click.Path(file_okay=False), default=str(main_._default_cache_directory), help='Directory to cache preprocessed foods in')
+@click_.option('--baseline', 'baseline_path', type=click.Path(dir_okay=False), default='benchmark_baseline.json', help='Baseline file to compare to')
+@click.option('--save-baseline', is_flag=True, help='Save the results as baseline instead of comparing to it')
+@click_.option('--tolerance', type=click.FloatRange(min=0), default=0.1, help='Fraction a metric may be worse than its baseline')
+@click_.option('--seed', type=int, default=0, help='Seed to pick candidate recipes and mine with')
+@click_.option('--candidates', 'candidate_count', type=click.IntRange(min=1), default=100, help='Number of feasible and of infeasible recipes to benchmark solving with')
+@click_.option('--mine-seconds', type=click.FloatRange(min=0), default=30, help='Seconds to mine')
+@click_.option('--solver', type=click.Choice(sorted(solvers)), default='glpk', help='Library or algorithm to solve recipes with')
+@click_.option('--granularity', type=click.IntRange(min=1), default=1, help='Grams recipe amounts are a multiple of')
+@click.option('--round-relaxation', is_flag=True, help='Round solutions with non-integer amounts, see config.round_relaxation')
+@click.option('--only', 'benchmarks', type=click.Choice(_benchmarks), multiple=True, help='Only run these benchmarks, can be repeated')
+def main(usda_directory, cache_directory, baseline_path, save_baseline, tolerance, seed, candidate_count, mine_seconds, solver, granularity, round_relaxation, benchmarks):
+    '''
+    Benchmark loading foods, solving and mining
+    
+    Results are compared to the baseline file. Exits with status 1 if a metric
+    regressed by more than the tolerance. To measure what --solver,
+    --granularity or --round-relaxation gain, compare to a baseline saved
+    without them.
+    '''
+    logging.basicConfig(level=logging.INFO)
+    usda_directory = Path(usda_directory)
+    baseline_path = Path(baseline_path)
+    benchmarks = benchmarks or _benchmarks
+    results = OrderedDict()
+    
+    if 'import' in benchmarks:
+        _logger.info('Benchmarking import')
+        results['import_usda'] = benchmark_import(usda_directory)
+    if 'solve' in benchmarks or 'mine' in benchmarks:
+        nutrition_target = nutrition_target_.from_config()
+        foods = main_.load_foods(usda_directory, nutrition_target, Path(cache_directory)).values
+    if 'solve' in benchmarks:
+        _logger.info('Benchmarking solve')
+        feasible, infeasible = get_candidates(nutrition_target, foods, seed, candidate_count)
+        solve = partial(benchmark_solve, nutrition_target, foods, solver=solver, granularity=granularity, round_relaxation=round_relaxation)
+        results['solve_feasible'] = solve(feasible)
+        results['solve_infeasible'] = solve(infeasible)
+    if 'mine' in benchmarks:
+        _logger.info('Benchmarking mine')
+        results['mine'] = benchmark_mine(nutrition_target, foods, seed, mine_seconds, solver, granularity, round_relaxation)
+        
+    if save_baseline or not baseline_path.exists():
+        with baseline_path.open('w') as f:
+            json.dump(OrderedDict([('environment', _get_environment()), ('results', results)]), f, indent=2)
+        print('Saved baseline to {}'.format(baseline_path))
+        baseline = {}
+    else:
+        with baseline_path.open() as f:
+            baseline = json.load(f, object_pairs_hook=OrderedDict)
+        baseline = OrderedDict((benchmark, baseline['results'].get(benchmark)) for benchmark in results)
+    
+    rows = compare(results, baseline, tolerance)
+    format_ = lambda value, format_: '' if value is None else format_.format(value)
+    print(tabulate(
+        [
+            (benchmark, metric, format_(baseline_value, '{:.4g}'), format_(value, '{:.4g}'), format_(change, '{:+.1%}'), 'REGRESSION' if regression else '')
+            for benchmark, metric, baseline_value, value, change, regression in rows
+        ],
+        headers=('Benchmark', 'Metric', 'Baseline', 'Value', 'Change', ''),
+    ))
+    if any(row[-1] for row in rows):
+        sys.exit(1)
+
+@click.command(context_settings={'help_option_names': ['-h', '--help']})
+@click_.option('--usda-data', 'usda_directory', type=click.Path(exists=True, file_okay=False), help='USDA data directory to benchmark on')
+@click_.option('--cache-dir', 'cache_directory', type=click.Path(file_okay=False), default=str(main_._default_cache_directory), help='Directory to cache preprocessed foods in')
+@click_.option('--seed', type=int, default=0, help='Seed to pick candidate recipes with')
+@click_.option('--candidates', 'candidate_count', type=click.IntRange(min=1), default=100, help='Number of feasible and of infeasible recipes to solve')
+@click.option('--solver', 'names', type=click.Choice(sorted(solvers)), multiple=True, help='Only benchmark these solvers, can be repeated. The first is the reference.')
+@click_.option('--granularity', type=click.IntRange(min=1), default=1, help='Grams recipe amounts are a multiple of')
+@click.option('--round-relaxation', is_flag=True, help='Round solutions with non-integer amounts, see config.round_relaxation')
+def compare_solvers(usda_directory, cache_directory, seed, candidate_count, names, granularity, round_relaxation):
+    '''
+    Benchmark the solvers against each other
+    
+    Each solver solves the same candidate recipes, feasible and infeasible ones
+    as picked with GLPK. Reports recipes solved per second and how often each
+    solver agrees with the reference (glpk by default) on whether a recipe can
+    be solved. Solvers which are unavailable, e.g. due to a missing
+    dependency, are skipped.
+    '''
+    logging.basicConfig(level=logging.INFO)
+    names = names or ['glpk'] + sorted(set(solvers) - {'glpk'})
+    nutrition_target = nutrition_target_.from_config()
+    foods = main_.load_foods(Path(usda_directory), nutrition_target, Path(cache_directory)).values
+    feasible, infeasible = get_candidates(nutrition_target, foods, seed, candidate_count)
+    results = benchmark_solvers(nutrition_target, foods, feasible + infeasible, names, granularity, round_relaxation)
+    rows = []
+    for name, metrics in results.items():
+        if isinstance(metrics, str):
+            rows.append((name, '', '', '', '', metrics))
+        else:
+            rows.append((
+                name, '{:.4g}'.format(metrics['recipes_per_second']), metrics['solved'],
+                '{:.1%}'.format(metrics['agreement']), metrics['invalid'], ''
+            ))
+    print('{} feasible and {} infeasible candidates'.format(len(feasible), len(infeasible)))
+    print(tabulate(rows, headers=('Solver', 'Recipes/s', 'Solved', 'Agreement', 'Invalid', 'Unavailable')))
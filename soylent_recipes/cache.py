@@ -0,0 +1,120 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+On disk cache of preprocessed foods
+'''
+
+from functools import partial
+import hashlib
+import logging
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+_logger = logging.getLogger(__name__)
+
+def get_key(files, nutrition_target):
+    '''
+    Get cache key of foods derived from files and a nutrition target
+    
+    Parameters
+    ----------
+    files : iterable(Path)
+        Files the foods are derived from. Include the source code deriving
+        them, so that changes to it invalidate the cache.
+    nutrition_target : soylent_recipes.nutrition_target.NutritionTarget
+    
+    Returns
+    -------
+    str
+        Hash of the contents of the files and of the nutrition target
+    '''
+    hash_ = hashlib.sha256()
+    for file in files:
+        hash_.update('{}\0{}\0'.format(file.name, file.stat().st_size).encode())
+        with file.open('rb') as f:
+            for chunk in iter(partial(f.read, 2**20), b''):
+                hash_.update(chunk)
+    hash_.update(nutrition_target.to_csv().encode())
+    return hash_.hexdigest()
+
+def load(cache_directory, key):
+    '''
+    Load foods from cache
+    
+    Parameters
+    ----------
+    cache_directory : Path
+    key : str
+        See `get_key`
+    
+    Returns
+    -------
+    pd.DataFrame or None
+        Foods as they were saved, or None if not in the cache.
+    '''
+    path = cache_directory / (key + '.npz')
+    if not path.exists():
+        return None
+    with np.load(str(path), allow_pickle=False) as data:
+        index = pd.MultiIndex.from_arrays(
+            [data['food_ids'], _decode(data['descriptions'])],
+            names=('food_id', 'description'),
+        )
+        foods = pd.DataFrame(data['values'], index=index, columns=_decode(data['nutrients']))
+    _logger.info('Loaded foods from cache: {}'.format(path))
+    return foods
+
+def save(cache_directory, key, foods):
+    '''
+    Save foods to cache
+    
+    Parameters
+    ----------
+    cache_directory : Path
+        Created if it does not exist.
+    key : str
+        See `get_key`
+    foods : pd.DataFrame
+        Foods. Index: (food_id :: int, description :: str). Columns: nutrient
+        names. All values are floats.
+    '''
+    cache_directory.mkdir(parents=True, exist_ok=True)
+    path = cache_directory / (key + '.npz')
+    
+    # Write to a temporary file first so that an interrupted save does not
+    # leave a corrupt cache file behind
+    with tempfile.NamedTemporaryFile(dir=str(cache_directory), suffix='.tmp', delete=False) as f:
+        np.savez(
+            f,
+            values=foods.values,
+            food_ids=foods.index.get_level_values('food_id').values,
+            descriptions=_encode(foods.index.get_level_values('description')),
+            nutrients=_encode(foods.columns),
+        )
+    os.replace(f.name, str(path))
+    _logger.info('Saved foods to cache: {}'.format(path))
+    
+# Strings are stored as a single array of utf-8 bytes, separated by \0. This is
+# far more compact than a numpy unicode array, which pads each string to the
+# length of the longest one, using 4 bytes per character.
+
+def _encode(strings):
+    return np.frombuffer('\0'.join(strings).encode(), dtype=np.uint8)
+
+def _decode(array):
+    return array.tobytes().decode().split('\0')
@@ -32,6 +32,7 @@ https://ods.od.nih.gov/Health_Information/Dietary_Reference_Intakes.aspx
 
 import numpy as np
 import pandas as pd
+import os
 
 # All values are in grams (g) unless otherwise listed (in a comment that follows it)
 
@@ -50,6 +51,83 @@ max_foods = 20
 # the solved recipes found so far.
 max_recipes = 1000
 
+# Whether to first solve each recipe with non-integer amounts (its LP
+# relaxation) before solving it with integer amounts. Recipes which cannot be
+# solved even with non-integer amounts are rejected without an integer solve.
+# This only affects mining speed, not which recipes are found. The log shows
+# how many recipes were rejected this way and an estimate of the time saved
+# (which may be negative), so you can tell whether it helps. Off by default as
+# it did not help in measurements: GLPK's presolve already rejects these
+# recipes about as quickly (0.072ms with the screen, 0.076ms without), while
+# recipes which can be solved took 22% longer.
+screen_relaxation = False
+
+# Amounts of food in recipes are multiples of this many grams, e.g. 1, 5 or 10.
+# Coarser amounts are easier to weigh and leave fewer combinations to search,
+# but fewer recipes can be solved and proving that a recipe has no solution
+# can take longer, so check whether mining gets faster. Can be overridden with
+# `soylent --granularity`.
+granularity = 1
+
+# Whether to solve each recipe with non-integer amounts first and round those,
+# only doing the integer solve when rounding breaks the nutrition target. This
+# finds the same recipes, only their amounts may differ, and is much faster for
+# recipes which can be solved. Implies screen_relaxation. Can be overridden with
+# `soylent --round-relaxation/--no-round-relaxation`.
+round_relaxation = False
+
+# Library or algorithm to solve recipes with: 'glpk', 'highs' (HiGHS) or 'nnls'
+# (non-negative least squares); the latter two require the solvers extra,
+# `pip install "soylent-recipes[solvers]"`. nnls solves feasible recipes
+# fastest but rejects infeasible ones slower than glpk, and only finds recipes
+# whose non-integer amounts can be rounded. As most mined recipes are
+# infeasible, it is not necessarily faster at mining; use
+# `soylent-benchmark-solvers` to compare them on your foods. Can be overridden
+# with `soylent --solver`.
+solver = 'glpk'
+
+# Whether to collect solver telemetry: per solve outcome (solved, infeasible
+# relaxation, infeasible with integer amounts, ...), time, simplex iterations
+# and branch-and-bound nodes. It is logged as histograms at the end of mining,
+# showing which part of solving dominates. Slows down solving a little.
+solver_telemetry = False
+
+# Number of recipes to remember as tried, per worker process, and the maximum
+# chance of wrongly skipping a recipe as already tried. Memory use starts at
+# about 1.4MB per 1 million recipes at an error rate of 1%. When more recipes
+# are tried, memory is added (and logged) to keep the error rate; it then grows
+# a little faster than the number of recipes tried, without bound. The filter
+# is saved with each checkpoint: at the defaults about 14MB per worker.
+visited_capacity = 10**7
+visited_error_rate = 0.01
+
+# Seconds between checkpoints of a mining run, which `soylent --resume` can
+# continue from. A checkpoint is also saved when stopping with Ctrl-C, or on
+# `kill -USR1`. If None, checkpoints are only saved on those occasions.
+checkpoint_interval = 600
+
+# Seconds between writing mining metrics (recipes tried/solved per second,
+# success ratio, solve latency, ...) to stats.json and the log.
+metrics_interval = 10
+
+# Number of processes to mine with. By default, one per CPU core. Can be
+# overridden with `soylent --workers`.
+workers = os.cpu_count()
+
+# Number of threads per worker process to solve recipes with. The other stages
+# of mining (sampling, screening, verifying) share the process's state and run
+# with one thread each. GLPK holds Python's GIL while solving, so with the glpk
+# solver more threads rarely help: use more worker processes instead. With more
+# than one thread, solved recipes may be output in a different order, even with
+# the same seed. With solver_telemetry and the glpk solver, 1 thread is used, as
+# GLPK's output hook, which telemetry reads node counts from, is process-wide.
+solve_workers = 1
+
+# Seed of the random number generator used to pick foods. With the same seed
+# and number of workers, the same recipes are tried. If None, a random seed is
+# used.
+seed = None
+
 # Body weight (kg)
 _weight = 87
 
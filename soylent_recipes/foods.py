@@ -14,10 +14,17 @@
 # along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
+import numpy as np
 import pandas as pd
 
 _logger = logging.getLogger(__name__)
 
+# Files in the USDA data directory read by import_usda
+usda_files = ('FOOD_DES.txt', 'NUTR_DEF.txt', 'NUT_DATA.txt')
+
+# Number of rows of NUT_DATA.txt to read at a time
+_chunk_size = 2**18
+
 def import_usda(usda_directory):
     '''
     Import foods from USDA data files
@@ -52,11 +59,21 @@ def import_usda(usda_directory):
     
     _logger.info('Loading food data')
     
+    # Load food descriptions
+    foods = pd.read_csv(
+        (usda_directory / 'FOOD_DES.txt'),
+        index_col=0,
+        usecols=(0, 2, 4, 11, 12, 13),
+        names=('food_id', 'long_description', 'common_name', 'Conversion factor: protein', 'Conversion factor: fat', 'Conversion factor: carbohydrate'),
+        **csv_style
+    )
+    
     # Load nutrients
     nutrients = pd.read_csv(
         (usda_directory / 'NUTR_DEF.txt'),
         usecols=(0, 1, 3),
         names=('id', 'unit', 'name'),
+        dtype={'id': np.int32},
         **csv_style
     )
     nutrients = nutrients[nutrients['id'] != 268]  # Energy appears twice in sr28, don't use the one with id 268
@@ -66,19 +83,6 @@ def import_usda(usda_directory):
     used_nutrients = {x for x in used_nutrients if not x.endswith(': energy')}
     nutrients = nutrients[nutrients['name'].isin(used_nutrients)]
     
-    # Load food nutrient values
-    nutrient_values = pd.read_csv(
-        (usda_directory / 'NUT_DATA.txt'),
-        usecols=(0, 1, 2),
-        names=('food_id', 'nutrient_id', 'value'),
-        **csv_style
-    )
-    
-    # Merge in nutrient names
-    nutrient_values = pd.merge(nutrients, nutrient_values, left_on='id', right_on='nutrient_id')
-    del nutrient_values['id']
-    del nutrient_values['nutrient_id']
-    
     # Normalise values: transform ``value / (100 unit)`` to ``value/SI_unit``
     units = {
         'g': 1,
@@ -89,12 +93,40 @@ def import_usda(usda_directory):
         'cal': 1,
         'kcal': 1e3,
     }
-    nutrient_values['unit'] = nutrient_values['unit'].apply(lambda x: units[x])
-    nutrient_values['value'] = nutrient_values['value'] * nutrient_values['unit'] / 100
-    del nutrient_values['unit']
-    
-    # Give each nutrient its own column
-    nutrient_values = nutrient_values.pivot(index='food_id', columns='name', values='value')
+    factors = nutrients['unit'].map(units).values / 100
+    assert not np.isnan(factors).any(), 'Unknown unit in: {}'.format(set(nutrients['unit']))
+    
+    # Load food nutrient values.
+    #
+    # NUT_DATA is by far the largest file; it is read in chunks of compactly
+    # typed columns, rows of unused nutrients are dropped as they are read
+    # and the values are put straight into place in a food x nutrient array.
+    food_ids = pd.Index(foods.index)
+    nutrient_ids = pd.Index(nutrients['id'].values)
+    values = np.full((len(food_ids), len(nutrient_ids)), np.nan)
+    has_values = np.zeros(len(food_ids), dtype=bool)  # whether a food has any used nutrient
+    chunks = pd.read_csv(
+        (usda_directory / 'NUT_DATA.txt'),
+        usecols=(0, 1, 2),
+        names=('food_id', 'nutrient_id', 'value'),
+        dtype={'food_id': np.int32, 'nutrient_id': np.int32, 'value': np.float64},
+        chunksize=_chunk_size,
+        **csv_style
+    )
+    for chunk in chunks:
+        columns = nutrient_ids.get_indexer(chunk['nutrient_id'].values)
+        rows = food_ids.get_indexer(chunk['food_id'].values)
+        used = (columns != -1) & (rows != -1)
+        columns = columns[used]
+        rows = rows[used]
+        values[rows, columns] = chunk['value'].values[used] * factors[columns]
+        has_values[rows] = True
+        
+    # Drop foods without nutrient data
+    if not has_values.all():
+        _logger.warning('Dropped {} foods without nutrient data'.format(int((~has_values).sum())))
+    foods = foods[has_values]
+    nutrient_values = pd.DataFrame(values[has_values], index=foods.index, columns=nutrients['name'].values)
     _logger.debug('Non-null value counts by USDA nutrient column:\n{}'.format(nutrient_values.count().to_string()))
     
     # Map to internal nutrient names
@@ -121,14 +153,7 @@ def import_usda(usda_directory):
     # Sort nutrients by name
     nutrient_values = nutrient_values.sort_index(axis=1)
     
-    # Load and merge in food descriptions
-    foods = pd.read_csv(
-        (usda_directory / 'FOOD_DES.txt'),
-        index_col=0,
-        usecols=(0, 2, 4, 11, 12, 13),
-        names=('food_id', 'long_description', 'common_name', 'Conversion factor: protein', 'Conversion factor: fat', 'Conversion factor: carbohydrate'),
-        **csv_style
-    )
+    # Merge in food descriptions
     for column in foods.columns:
         if column.startswith('Conversion factor:'):
             foods[column] *= 1e3
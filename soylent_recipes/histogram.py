@@ -0,0 +1,212 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Histograms of durations and other positive values
+'''
+
+import numpy as np
+
+class Histogram(object):
+    
+    '''
+    Histogram of positive values, e.g. durations in seconds
+    
+    Buckets are logarithmic, 20 per decade from low to high, so percentiles
+    are accurate to within 12% while memory use is fixed. Values outside that
+    range fall in an underflow or overflow bucket. The exact mean, minimum and
+    maximum are kept as well.
+    
+    Histograms with the same range can be summed, e.g. to combine those of
+    multiple miners.
+    
+    Parameters
+    ----------
+    low : float
+        Lower edge of the first bucket
+    high : float
+        Upper edge of the last bucket
+    format_value : float -> str
+        Formats values in `str`. By default they are formatted as durations.
+    '''
+    
+    def __init__(self, low=1e-7, high=1e3, format_value=None):
+        decades = np.log10(high / low)
+        self._edges = 10.0 ** np.linspace(np.log10(low), np.log10(high), int(round(decades * 20)) + 1)
+        self._format_value = format_value or format_duration
+        self._counts = np.zeros(len(self._edges) + 1, dtype=np.int64)
+        self._total = 0.0
+        self._min = np.inf
+        self._max = 0.0
+        
+    def add(self, value):
+        '''
+        Add a value
+        
+        Parameters
+        ----------
+        value : float
+        '''
+        self._counts[np.searchsorted(self._edges, value, side='right')] += 1
+        self._total += value
+        self._min = min(self._min, value)
+        self._max = max(self._max, value)
+        
+    def add_many(self, values):
+        '''
+        Add values
+        
+        Parameters
+        ----------
+        values : np.array(float)
+        '''
+        if len(values):
+            self._counts += np.bincount(
+                np.searchsorted(self._edges, values, side='right'),
+                minlength=len(self._counts)
+            )
+            self._total += float(np.sum(values))
+            self._min = min(self._min, float(np.min(values)))
+            self._max = max(self._max, float(np.max(values)))
+        
+    @property
+    def count(self):
+        '''
+        Number of values added
+        '''
+        return int(self._counts.sum())
+    
+    @property
+    def mean(self):
+        '''
+        Mean of the values, or None if there are none
+        '''
+        count = self.count
+        return self._total / count if count else None
+    
+    @property
+    def max(self):
+        '''
+        Largest value, or None if there are none
+        '''
+        return self._max if self.count else None
+    
+    def percentile(self, q):
+        '''
+        Get approximate percentile
+        
+        Parameters
+        ----------
+        q : float
+            Percentile, between 0 and 100 inclusive
+        
+        Returns
+        -------
+        float or None
+            The geometric middle of the bucket containing the percentile,
+            clipped to the smallest and largest value. None if there are no
+            values.
+        '''
+        count = self.count
+        if not count:
+            return None
+        bucket = int(np.searchsorted(np.cumsum(self._counts), q / 100 * count, side='left'))
+        bucket = min(bucket, len(self._counts) - 1)
+        if bucket == 0:
+            value = self._min
+        elif bucket == len(self._edges):
+            value = self._max
+        else:
+            value = np.sqrt(self._edges[bucket - 1] * self._edges[bucket])
+        return float(min(max(value, self._min), self._max))
+    
+    def copy(self):
+        histogram = type(self).__new__(type(self))
+        histogram._edges = self._edges
+        histogram._format_value = self._format_value
+        histogram._counts = self._counts.copy()
+        histogram._total = self._total
+        histogram._min = self._min
+        histogram._max = self._max
+        return histogram
+        
+    def __add__(self, other):
+        assert np.array_equal(self._edges, other._edges)
+        histogram = self.copy()
+        histogram._counts += other._counts
+        histogram._total += other._total
+        histogram._min = min(self._min, other._min)
+        histogram._max = max(self._max, other._max)
+        return histogram
+    
+    def __eq__(self, other):
+        return (
+            isinstance(other, Histogram)
+            and np.array_equal(self._edges, other._edges)
+            and np.array_equal(self._counts, other._counts)
+            and self._total == other._total
+            and self._min == other._min
+            and self._max == other._max
+        )
+    
+    def __ne__(self, other):
+        return not self == other
+    
+    __hash__ = None
+    
+    def __str__(self):
+        if not self.count:
+            return 'n=0'
+        return (
+            'n={}, mean={}, p50={}, p90={}, p99={}, max={}'
+            .format(
+                self.count,
+                *map(self._format_value, (self.mean, self.percentile(50), self.percentile(90), self.percentile(99), self.max))
+            )
+        )
+    
+    def __repr__(self):
+        return 'Histogram({})'.format(self)
+    
+def format_duration(seconds):
+    '''
+    Format duration with a unit suited to its magnitude, e.g. 12.3ms
+    
+    Parameters
+    ----------
+    seconds : float
+    
+    Returns
+    -------
+    str
+    '''
+    for unit, factor in (('s', 1), ('ms', 1e-3), ('µs', 1e-6)):
+        if seconds >= factor:
+            return '{:.3g}{}'.format(seconds / factor, unit)
+    return '{:.3g}ns'.format(seconds / 1e-9)
+    
+def format_count(value):
+    '''
+    Format count, or mean or percentile of counts, e.g. 12.5
+    
+    Parameters
+    ----------
+    value : float
+    
+    Returns
+    -------
+    str
+    '''
+    return '{:.3g}'.format(value)
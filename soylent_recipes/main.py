@@ -18,39 +18,97 @@ from pathlib import Path
 from chicken_turtle_util import click as click_, logging as logging_
 import click
 from soylent_recipes import __version__
-from soylent_recipes import nutrition_target as nutrition_target_, foods as foods_
-from soylent_recipes.mining.miners import Miner
-from tabulate import tabulate
+from soylent_recipes import nutrition_target as nutrition_target_, foods as foods_, config, cache, output, metrics, solver as solver_
+from soylent_recipes.mining.parallel import ParallelMiner
 import asyncio
 import signal
-import numpy as np
-import pandas as pd
 import colored_traceback
 from functools import partial
+import os
 
 _logger = logging.getLogger(__name__)
 
+_default_cache_directory = Path(os.environ.get('XDG_CACHE_HOME', str(Path.home() / '.cache'))) / 'soylent_recipes'
+
+_checkpoint_path = Path('checkpoint.pickle')
+_stats_path = Path('stats.json')
+
 @click.command(context_settings={'help_option_names': ['-h', '--help']})
 @click.version_option(version=__version__)
 @click_.option('--usda-data', 'usda_directory', type=click.Path(exists=True, file_okay=False), help='USDA data directory to mine')
-def main(usda_directory):
+@click_.option('--workers', type=click.IntRange(min=1), default=config.workers, help='Number of processes to mine with')
+@click_.option('--cache-dir', 'cache_directory', type=click.Path(file_okay=False), default=str(_default_cache_directory), help='Directory to cache preprocessed foods in')
+@click_.option('--format', 'format_', type=click.Choice(sorted(output.writers)), default='text', help='Output format')
+@click_.option('--solver', type=click.Choice(sorted(solver_.solvers)), default=config.solver, help='Library or algorithm to solve recipes with')
+@click_.option('--granularity', type=click.IntRange(min=1), default=config.granularity, help='Grams recipe amounts are a multiple of, e.g. 1, 5 or 10')
+@click.option('--round-relaxation/--no-round-relaxation', default=config.round_relaxation, show_default=True, help='Round solutions with non-integer amounts, only solving with integer amounts when that fails')
+@click.option('--resume', is_flag=True, help='Resume the mining run of checkpoint.pickle')
+@click.option('--metrics-port', type=click.IntRange(min=0, max=65535), help='Serve live mining metrics on http://localhost:PORT')
+def main(usda_directory, workers, cache_directory, format_, solver, granularity, round_relaxation, resume, metrics_port):
     '''
-    Generate soylent recipes. Output is written to recipes.txt
+    Generate soylent recipes. Output is written to recipes.txt, or
+    recipes.{jsonl,csv,parquet} depending on --format
+    
+    Checkpoints are saved to checkpoint.pickle, see config.checkpoint_interval.
+    Send SIGUSR1 to save one without stopping.
+    
+    Live mining metrics are written to stats.json, see config.metrics_interval.
+    
+    --granularity and --round-relaxation trade exact amounts for speed, see
+    config.granularity and config.round_relaxation. For --solver, see
+    config.solver.
      
     E.g. soylent --usda-data data/usda_nutrient_db_sr28
     '''
+    if resume and not _checkpoint_path.exists():
+        raise click.UsageError('Cannot resume: {} not found'.format(_checkpoint_path))
+    if not resume and _checkpoint_path.exists():
+        raise click.UsageError(
+            '{} exists, pass --resume to continue its run or remove it to start a new one'
+            .format(_checkpoint_path)
+        )
     colored_traceback.add_hook()
     logging_.configure('soylent.log')
     logging.getLogger().setLevel(logging.DEBUG)
     nutrition_target = nutrition_target_.from_config()
-    foods = foods_.import_usda(Path(usda_directory))
-    foods = foods.set_index('description')
-    foods = handle_nans(foods, nutrition_target, 10)
-    foods = add_energy_components(foods)
-    foods = foods[nutrition_target.index]  # ignore nutrients which do not appear in nutrition target
-    foods = foods.astype(float)
-    top_recipes = mine(nutrition_target, foods)
-    output_result(foods, nutrition_target, top_recipes)
+    foods = load_foods(Path(usda_directory), nutrition_target, Path(cache_directory))
+    writer_class = output.writers[format_]
+    with writer_class(Path('recipes' + writer_class.extension), foods, nutrition_target) as writer:
+        mine(nutrition_target, foods, workers, writer.write, resume, metrics_port, granularity, round_relaxation, solver)
+    
+def load_foods(usda_directory, nutrition_target, cache_directory):
+    '''
+    Load foods from USDA data, preprocessed for the nutrition target
+    
+    The result is cached. The cache is used as long as the USDA data, the
+    nutrition target and the code that preprocesses remain the same.
+    
+    Parameters
+    ----------
+    usda_directory : Path
+    nutrition_target : soylent_recipes.nutrition_target.NutritionTarget
+    cache_directory : Path
+    
+    Returns
+    -------
+    pd.DataFrame
+        Index: (food_id, description). The USDA food id and description.
+        Columns: the nutrients of the nutrition target, in the same order.
+        Values are floats without NaN.
+    '''
+    files = [usda_directory / file for file in foods_.usda_files]
+    files.extend([Path(__file__), Path(foods_.__file__)])  # preprocessing code
+    key = cache.get_key(files, nutrition_target)
+    foods = cache.load(cache_directory, key)
+    if foods is None:
+        foods = foods_.import_usda(usda_directory)
+        foods = foods.set_index('description', append=True)
+        foods = handle_nans(foods, nutrition_target, 10)
+        foods = add_energy_components(foods)
+        foods = foods[nutrition_target.index]  # ignore nutrients which do not appear in nutrition target
+        foods = foods.astype(float)
+        cache.save(cache_directory, key, foods)
+    return foods
 
 # TODO not hardcoding conversion factors could easily be achieved by moving this to config.py 
 # Conversion factors (cal/g) to default to when NaN on a food
@@ -152,80 +210,43 @@ def add_energy_components(foods):
     
     return foods
 
-def mine(nutrition_target, foods):
+def mine(nutrition_target, foods, workers, emit, resume=False, metrics_port=None, granularity=config.granularity, round_relaxation=config.round_relaxation, solver=config.solver):
     '''
     Parameters
     ----------
     nutrition_target : soylent_recipes.nutrition_target.NutritionTarget
     foods : pd.DataFrame
-    
-    Returns
-    -------
-    TopRecipes
+    workers : int
+        Number of processes to mine with
+    emit : soylent_recipes.mining.recipe.Recipe -> None
+        Called with each solved recipe as soon as it is found
+    resume : bool
+        Whether to resume from the checkpoint. Its recipes are emitted first.
+    metrics_port : int or None
+        Port to serve live metrics on, if any
+    granularity : int
+        Grams recipe amounts are a multiple of
+    round_relaxation : bool
+        Whether to round solutions with non-integer amounts, see
+        `soylent_recipes.solver.GlpkSolver`
+    solver : str
+        Name of the solver to use, one of `soylent_recipes.solver.solvers`
     '''
     loop = asyncio.get_event_loop()
-    miner = Miner()
+    miner = ParallelMiner(workers, config.seed, _checkpoint_path, config.checkpoint_interval, granularity, round_relaxation, solver)
     cancel = miner.cancel  # Note: cancelling an executor does not cancel the thread running inside
     loop.add_signal_handler(signal.SIGHUP, cancel)
     loop.add_signal_handler(signal.SIGINT, cancel)
     loop.add_signal_handler(signal.SIGTERM, cancel)
+    loop.add_signal_handler(signal.SIGUSR1, miner.request_checkpoint)
     
-    # Mine
-    mine = partial(miner.mine_random, nutrition_target, foods)
-    recipes_tried, top_recipes = loop.run_until_complete(loop.run_in_executor(None, mine))
+    # Mine. Load the checkpoint first, so the reporter's rates start from its stats
+    if resume:
+        miner.load_checkpoint(nutrition_target, foods.values)
+    mine = partial(miner.mine_random, nutrition_target, foods.values, emit, resume)
+    with metrics.Reporter(lambda: miner.stats, _stats_path, config.metrics_interval, metrics_port):
+        stats = loop.run_until_complete(loop.run_in_executor(None, mine))
     loop.close()
     
     # Print stats
-    _logger.info('Recipes tried: {}'.format(recipes_tried))
-    
-    return top_recipes
-
-def less_or_close_or_nan(a, b):
-    return (a < b) | np.isclose(a, b) | np.isnan(a) | np.isnan(b)
-
-def output_result(foods, nutrition_target, top_recipes):
-    '''
-    foods : pd.DataFrame
-    nutrition_target : NutritionTarget
-    top_recipes : [Recipe]
-    '''
-    # Write recipes.txt
-    def format_recipe(recipe):
-        recipe_foods = foods.iloc[recipe.food_indices]
-         
-        # ignore foods with zero amount
-        mask = ~np.isclose(recipe.amounts, 0.0)
-        recipe_foods = recipe_foods[mask]
-        amounts = recipe.amounts[mask]
-        
-        # recipe_str
-        df = pd.concat(
-            [
-                pd.Series(amounts, name='amount').apply('{:.0f}g'.format), 
-                pd.Series(recipe_foods.index, name='food')
-            ],
-            axis=1
-        )
-        df = df.sort_values(['food'])
-        df.loc['append1'] = ['=', '']
-        df.loc['append2'] = ['{:.0f}g'.format(amounts.sum()), '']
-        recipe_str = tabulate(df, showindex=False, tablefmt='plain')
-        
-        # nutrition
-        nutrition_ = recipe_foods.transpose().dot(amounts)
-        nutrition = nutrition_target.copy()
-        max_err = ~less_or_close_or_nan(nutrition_, nutrition['max'])
-        nutrition.insert(1, 'max_err', max_err.apply(lambda x: '!' if x else ''))
-        nutrition.insert(1, 'actual', nutrition_)
-        min_err = ~less_or_close_or_nan(nutrition['min'], nutrition_)
-        nutrition.insert(1, 'min_err', min_err.apply(lambda x: '!' if x else ''))
-        nutrition = nutrition.sort_index()
-        
-        #
-        return '{}\n\n{}'.format(recipe_str, nutrition.to_string())
-    
-    with open('recipes.txt', 'w') as f:
-        f.write('Amounts are in grams of edible portion. E.g. if the food has bones, you should\n')
-        f.write('weigh without the bones.\n\n')
-        f.write(('\n\n' + '-'*60 + '\n\n').join(format_recipe(recipe) for recipe in top_recipes))
-    
\ No newline at end of file
+    _logger.info('Mining stats:\n{}'.format(stats))
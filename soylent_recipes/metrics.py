@@ -0,0 +1,265 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Live mining metrics: written to a stats file and optionally served over HTTP
+'''
+
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from soylent_recipes.histogram import format_duration
+from soylent_recipes import solver
+
+_logger = logging.getLogger(__name__)
+
+def get_metrics(stats, elapsed, start_stats, recent_stats, recent_elapsed):
+    '''
+    Derive metrics from mining stats
+    
+    Parameters
+    ----------
+    stats : soylent_recipes.mining.miners.Stats
+        Current stats
+    elapsed : float
+        Seconds since mining started
+    start_stats : soylent_recipes.mining.miners.Stats
+        Stats when mining started, e.g. those of a resumed run. Rates are
+        calculated from the difference with stats.
+    recent_stats : soylent_recipes.mining.miners.Stats
+        Stats recent_elapsed seconds ago, to calculate recent rates from
+    recent_elapsed : float
+    
+    Returns
+    -------
+    OrderedDict
+        Metrics, JSON serializable. Ratios and rates which cannot be calculated
+        yet (division by zero) are None.
+    '''
+    ratio = lambda numerator, denominator: numerator / denominator if denominator else None
+    rate = lambda name, since, seconds: ratio(getattr(stats, name) - getattr(since, name), seconds)
+    metrics = OrderedDict()
+    metrics['elapsed'] = elapsed
+    metrics['totals'] = OrderedDict(
+        (name, getattr(stats, name))
+        for name in (
+            'recipes_tried', 'recipes_solved', 'recipes_screened_out',
+            'recipes_skipped_due_to_visited', 'recipes_failed_verification',
+        )
+    )
+    metrics['rates'] = OrderedDict([
+        ('tried_per_second', rate('recipes_tried', start_stats, elapsed)),
+        ('solved_per_second', rate('recipes_solved', start_stats, elapsed)),
+        ('recent_tried_per_second', rate('recipes_tried', recent_stats, recent_elapsed)),
+        ('recent_solved_per_second', rate('recipes_solved', recent_stats, recent_elapsed)),
+    ])
+    metrics['ratios'] = OrderedDict([
+        ('success', ratio(stats.recipes_solved, stats.recipes_tried)),
+        ('screened_out', ratio(stats.recipes_screened_out, stats.recipes_tried)),
+        ('skipped_due_to_visited', ratio(
+            stats.recipes_skipped_due_to_visited,
+            stats.recipes_tried + stats.recipes_skipped_due_to_visited
+        )),
+        ('relaxation_infeasible', ratio(stats.solver.relaxations_infeasible, stats.solver.relaxations)),
+        ('failed_verification', ratio(
+            stats.recipes_failed_verification,
+            stats.recipes_solved + stats.recipes_failed_verification
+        )),
+    ])
+    metrics['stages'] = OrderedDict(
+        (name, OrderedDict([
+            ('throughput', stage.throughput),
+            ('utilization', stage.utilization),
+            ('queue_depth_mean', stage.queue_depth_mean),
+            ('latency', _get_histogram_metrics(stage.latency)),
+        ]))
+        for name, stage in stats.pipeline.stages.items()
+    )
+    telemetry = stats.solver.telemetry
+    if sum(telemetry.outcomes.values()):
+        metrics['solver_telemetry'] = OrderedDict([
+            ('outcomes', OrderedDict((outcome, telemetry.outcomes[outcome]) for outcome in solver.outcomes)),
+            ('return_codes', OrderedDict(sorted(telemetry.return_codes.items()))),
+            ('solve_time', OrderedDict(
+                (outcome, _get_histogram_metrics(histogram))
+                for outcome, histogram in telemetry.solve_time.items()
+            )),
+        ])
+        for name in ('load_time', 'relaxation_time', 'integer_time', 'check_time', 'iterations', 'nodes'):
+            metrics['solver_telemetry'][name] = _get_histogram_metrics(getattr(telemetry, name))
+    return metrics
+
+def _get_histogram_metrics(histogram):
+    return OrderedDict([
+        ('count', histogram.count),
+        ('mean', histogram.mean),
+        ('p50', histogram.percentile(50)),
+        ('p90', histogram.percentile(90)),
+        ('p99', histogram.percentile(99)),
+        ('max', histogram.max),
+    ])
+
+def format_metrics(metrics):
+    '''
+    Format the main metrics as a single line
+    
+    Parameters
+    ----------
+    metrics : OrderedDict
+        See `get_metrics`
+    
+    Returns
+    -------
+    str
+    '''
+    format_ = lambda value, format_: '-' if value is None else format_.format(value)
+    rates = metrics['rates']
+    ratios = metrics['ratios']
+    solve_latency = metrics['stages'].get('solve', {}).get('latency', {})
+    return (
+        'Tried {}/s, solved {}/s, success {}, screened out {}, solve latency p50 {}, p99 {}'
+        .format(
+            format_(rates['recent_tried_per_second'], '{:.0f}'),
+            format_(rates['recent_solved_per_second'], '{:.2f}'),
+            format_(ratios['success'], '{:.3%}'),
+            format_(ratios['screened_out'], '{:.1%}'),
+            *('-' if solve_latency.get(q) is None else format_duration(solve_latency[q]) for q in ('p50', 'p99'))
+        )
+    )
+
+class Reporter(object):
+    
+    '''
+    Report metrics of mining stats periodically, while used as context manager
+    
+    Every interval seconds, the metrics are written to a JSON file and logged.
+    Optionally, the latest metrics are served as JSON over HTTP on localhost,
+    e.g. ``curl localhost:port``. On exit, the metrics are reported one last
+    time.
+    
+    Parameters
+    ----------
+    get_stats : () -> soylent_recipes.mining.miners.Stats
+        Get current stats, called from another thread
+    path : Path
+        File to write metrics to. Replaced atomically.
+    interval : float
+        Seconds between reports
+    port : int or None
+        Port to serve metrics on. If None, metrics are not served.
+    '''
+    
+    def __init__(self, get_stats, path, interval, port=None):
+        self._get_stats = get_stats
+        self._path = path
+        self._interval = interval
+        self._port = port
+        self._stopped = threading.Event()
+        self._thread = None
+        self._server = None
+        self._lock = threading.Lock()
+        self._metrics = None  # guarded by _lock
+        
+        # Mode of the stats file, as if created with open(). The umask can
+        # only be read by setting it, so do so once, before threads start.
+        umask = os.umask(0)
+        os.umask(umask)
+        self._mode = 0o666 & ~umask
+        
+    @property
+    def metrics(self):
+        '''
+        Latest metrics, see `get_metrics`. None before the first report.
+        '''
+        with self._lock:
+            return self._metrics
+        
+    def __enter__(self):
+        self._start_time = time.monotonic()
+        self._start_stats = self._get_stats()
+        self._recent_time = self._start_time
+        self._recent_stats = self._start_stats
+        self._thread = threading.Thread(target=self._run, name='metrics reporter', daemon=True)
+        self._thread.start()
+        if self._port is not None:
+            self._server = HTTPServer(('localhost', self._port), _create_request_handler(self))
+            threading.Thread(target=self._server.serve_forever, name='metrics server', daemon=True).start()
+            _logger.info('Serving metrics on http://localhost:{}'.format(self._server.server_port))
+        return self
+    
+    def __exit__(self, *args):
+        self._stopped.set()
+        self._thread.join()
+        self._report()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            
+    @property
+    def port(self):
+        '''
+        Port metrics are served on, or None if not served
+        '''
+        return self._server.server_port if self._server is not None else None
+        
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            try:
+                self._report()
+            except Exception:
+                _logger.exception('Failed to report metrics')
+            
+    def _report(self):
+        now = time.monotonic()
+        stats = self._get_stats()
+        metrics = get_metrics(
+            stats, now - self._start_time, self._start_stats,
+            self._recent_stats, now - self._recent_time
+        )
+        self._recent_time = now
+        self._recent_stats = stats
+        with self._lock:
+            self._metrics = metrics
+        _logger.info(format_metrics(metrics))
+        
+        # Write to temporary file first so readers never see a partial file
+        with tempfile.NamedTemporaryFile('w', dir=str(self._path.parent), prefix=self._path.name, suffix='.tmp', delete=False) as f:
+            json.dump(metrics, f, indent=2)
+        os.chmod(f.name, self._mode)  # NamedTemporaryFile creates it readable by the owner only
+        os.replace(f.name, str(self._path))
+        
+def _create_request_handler(reporter):
+    class RequestHandler(BaseHTTPRequestHandler):
+        
+        def do_GET(self):
+            if self.path not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = json.dumps(reporter.metrics, indent=2).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            
+        def log_message(self, format_, *args):
+            _logger.debug(format_ % args)
+            
+    return RequestHandler
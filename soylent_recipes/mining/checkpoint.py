@@ -0,0 +1,221 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Checkpoints of mining runs, to resume them from later
+'''
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from soylent_recipes.config import max_foods
+
+_logger = logging.getLogger(__name__)
+
+# Version of the checkpoint format. Checkpoints of other versions are rejected.
+_version = 2
+
+def get_key(nutrition_target, foods):
+    '''
+    Get key identifying what is being mined
+    
+    A checkpoint can only be resumed with the same key.
+    
+    Parameters
+    ----------
+    nutrition_target : soylent_recipes.nutrition_target.NutritionTarget
+    foods : np.array
+        Foods being mined
+    
+    Returns
+    -------
+    str
+        Hash of the foods, nutrition target and max_foods
+    '''
+    hash_ = hashlib.sha256()
+    hash_.update('{}\0{}\0'.format(foods.shape, max_foods).encode())
+    hash_.update(foods.tobytes())
+    hash_.update(nutrition_target.to_csv().encode())
+    return hash_.hexdigest()
+
+def save(path, checkpoint):
+    '''
+    Save checkpoint
+    
+    The file is replaced atomically, so an interrupted save leaves the previous
+    checkpoint intact.
+    
+    Parameters
+    ----------
+    path : Path
+    checkpoint : dict
+        Anything picklable. Its version is added.
+    '''
+    checkpoint = dict(checkpoint, version=_version)
+    with tempfile.NamedTemporaryFile(dir=str(path.parent), prefix=path.name, suffix='.tmp', delete=False) as f:
+        pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f.name, str(path))
+    _logger.info('Saved checkpoint: {}'.format(path))
+    
+def load(path):
+    '''
+    Load checkpoint
+    
+    Parameters
+    ----------
+    path : Path
+    
+    Returns
+    -------
+    dict
+        The checkpoint as it was saved
+        
+    Raises
+    ------
+    ValueError
+        If the checkpoint has a different format version
+    '''
+    with path.open('rb') as f:
+        checkpoint = pickle.load(f)
+    if checkpoint.get('version') != _version:
+        raise ValueError(
+            'Checkpoint {} has format version {}, expected {}'
+            .format(path, checkpoint.get('version'), _version)
+        )
+    _logger.info('Loaded checkpoint: {}'.format(path))
+    return checkpoint
+
+def get_journal_path(path):
+    '''
+    Get path of the recipe journal belonging to the checkpoint at path
+    
+    Parameters
+    ----------
+    path : Path
+    
+    Returns
+    -------
+    Path
+    '''
+    return path.with_suffix('.recipes')
+
+class Journal(object):
+    
+    '''
+    Append-only file of the recipes emitted by a mining run
+    
+    Recipes are appended as they are emitted, so they need not be kept in
+    memory nor be saved again with each checkpoint. A checkpoint instead saves
+    how many recipes of each worker it covers, see `resume_journal`.
+    
+    Use as a context manager, or call `close` when done.
+    
+    Parameters
+    ----------
+    path : Path
+        File to write to. Overwritten if it exists.
+    run : str
+        Id of the mining run, saved in the checkpoint as well so that a
+        checkpoint is never resumed with the journal of another run
+    '''
+    
+    def __init__(self, path, run):
+        self._file = path.open('wb')
+        pickle.dump(run, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+        
+    def append(self, worker, recipe):
+        '''
+        Append recipe emitted by worker
+        
+        Parameters
+        ----------
+        worker : int
+            Index of the worker which found the recipe
+        recipe : soylent_recipes.mining.recipe.Recipe
+        '''
+        pickle.dump((worker, recipe), self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        
+    def flush(self):
+        '''
+        Write appended recipes to disk, call before saving a checkpoint
+        '''
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        
+    def close(self):
+        self._file.close()
+        
+def resume_journal(path, run, recipe_counts, emit):
+    '''
+    Resume the journal of a checkpoint
+    
+    The recipes covered by the checkpoint are emitted and copied to a new
+    journal, replacing the old one. Recipes appended after the checkpoint was
+    saved are dropped, they are found again when resuming.
+    
+    Parameters
+    ----------
+    path : Path
+        Journal file
+    run : str
+        Id of the mining run of the checkpoint
+    recipe_counts : [int]
+        Number of recipes of each worker the checkpoint covers
+    emit : soylent_recipes.mining.recipe.Recipe -> None
+        Called with each recipe covered by the checkpoint, in the order they
+        were appended
+        
+    Returns
+    -------
+    Journal
+        The new journal, to append to
+        
+    Raises
+    ------
+    ValueError
+        If the journal belongs to another run or misses recipes
+    '''
+    counts = [0] * len(recipe_counts)
+    new_path = path.with_name(path.name + '.tmp')
+    with path.open('rb') as old:
+        if pickle.load(old) != run:
+            raise ValueError('Cannot resume: {} belongs to another mining run'.format(path))
+        journal = Journal(new_path, run)
+        try:
+            while counts != recipe_counts:
+                try:
+                    worker, recipe = pickle.load(old)
+                except EOFError:
+                    raise ValueError('Cannot resume: {} misses recipes of the checkpoint'.format(path))
+                if counts[worker] < recipe_counts[worker]:
+                    counts[worker] += 1
+                    emit(recipe)
+                    journal.append(worker, recipe)
+            journal.flush()
+        except BaseException:
+            journal.close()
+            raise
+    os.replace(str(new_path), str(path))
+    return journal
@@ -14,55 +14,343 @@
 # along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
+import threading
 import attr
-from soylent_recipes.config import max_foods, max_recipes
+from soylent_recipes.config import (
+    max_foods, max_recipes, screen_relaxation, solver_telemetry, granularity, round_relaxation, solver,
+    visited_capacity, visited_error_rate, solve_workers
+)
 from soylent_recipes.various import profile
 from soylent_recipes.mining.recipe import Recipe
+from soylent_recipes.mining import pipeline
+from soylent_recipes.mining.sampling import sample_recipes
+from soylent_recipes.mining.screening import Screen
+from soylent_recipes.mining.visited import BloomFilter
+from soylent_recipes import solver as solver_
 import numpy as np
 
 _logger = logging.getLogger(__name__)
 
+# Number of recipes to sample and screen at once
+_batch_size = 1000
+
 @attr.s(frozen=True)
 class Stats(object):
-    recipes_scored = attr.ib()
-    recipes_skipped_due_to_visited = attr.ib()
+    
+    '''
+    Mining counters
+    
+    Stats can be summed, e.g. to combine stats of multiple miners.
+    
+    Attributes
+    ----------
+    recipes_tried : int
+        Number of recipes tried, including those rejected by the screen
+    recipes_screened_out : int
+        Number of recipes rejected by the screen
+    recipes_skipped_due_to_visited : int
+        Number of recipes not tried because they were tried before
+    recipes_failed_verification : int
+        Number of solved recipes which turned out not to satisfy the nutrition
+        target
+    recipes_solved : int
+        Number of solved recipes which satisfy the nutrition target
+    solver : soylent_recipes.solver.Stats
+        Solver counters
+    pipeline : soylent_recipes.mining.pipeline.Stats
+        Throughput and queue depth of each stage of mining
+    '''
+    
+    recipes_tried = attr.ib(default=0)
+    recipes_screened_out = attr.ib(default=0)
+    recipes_skipped_due_to_visited = attr.ib(default=0)
+    recipes_failed_verification = attr.ib(default=0)
+    recipes_solved = attr.ib(default=0)
+    solver = attr.ib(default=attr.Factory(solver_.Stats))
+    pipeline = attr.ib(default=attr.Factory(pipeline.Stats))
+    
+    def __add__(self, other):
+        values = attr.asdict(self, recurse=False)
+        return type(self)(**{name: value + getattr(other, name) for name, value in values.items()})
+    
+    def __str__(self):
+        return (
+            'Recipes tried: {}\n'
+            'Rejected by screen: {}\n'
+            'Skipped, tried before: {}\n'
+            'Failed verification: {}\n'
+            'Solved: {}\n'
+            '{}\n'
+            'Pipeline stages:\n'
+            '{}'
+            .format(
+                self.recipes_tried, self.recipes_screened_out,
+                self.recipes_skipped_due_to_visited, self.recipes_failed_verification,
+                self.recipes_solved,
+                self.solver,
+                self.pipeline
+            )
+        )
     
 class Miner(object):
     
-    def __init__(self):
-        self._cancel = False
+    '''
+    Recipe miner
+    
+    Parameters
+    ----------
+    rng : np.random.Generator or None
+        Random number generator to pick foods with. If None, a randomly seeded
+        one is used.
+    cancelled : threading.Event or None
+        Event which cancels mining when set. Any object with an ``is_set`` and
+        ``set`` method will do, e.g. a `multiprocessing.Event`. If None, a new
+        `threading.Event` is used.
+    visited : soylent_recipes.mining.visited.BloomFilter or None
+        Recipes tried before, which will not be tried again. E.g. those of
+        `Miner.visited` of a previous run. If None, a new empty one is used.
+    stats : Stats or None
+        Stats of a previous run to continue counting from.
+    granularity : int
+        Grams recipe amounts are a multiple of. Defaults to config.granularity.
+    round_relaxation : bool
+        Whether to round the solution with non-integer amounts, see
+        `soylent_recipes.solver.GlpkSolver`. Defaults to config.round_relaxation.
+    solver : str
+        Name of the solver to use, one of `soylent_recipes.solver.solvers`.
+        Defaults to config.solver.
+    '''
+    
+    def __init__(self, rng=None, cancelled=None, visited=None, stats=None, granularity=granularity, round_relaxation=round_relaxation, solver=solver):
+        self._rng = rng if rng is not None else np.random.default_rng()
+        self._initial_stats = stats if stats is not None else Stats()
+        self._cancelled = cancelled if cancelled is not None else threading.Event()
+        self._visited = visited if visited is not None else BloomFilter(visited_capacity, visited_error_rate)
+        self._granularity = granularity
+        self._round_relaxation = round_relaxation
+        self._solver_class = solver_.solvers[solver]
+        self._solvers = []  # one per solve stage worker
+        self._pipeline = None
+        self._recipes_tried = 0
+        self._recipes_screened_out = 0
+        self._recipes_skipped_due_to_visited = 0
+        self._recipes_failed_verification = 0
+        self._recipes_solved = 0
         assert max_foods > 0
         assert max_recipes > 0
         
     def cancel(self):
         _logger.info('Cancelling')
-        self._cancel = True
+        self._cancelled.set()
+        
+    @classmethod
+    def from_state(cls, state, cancelled=None, granularity=granularity, round_relaxation=round_relaxation, solver=solver):
+        '''
+        Create miner which continues where the miner of `state` left off
+        
+        Parameters
+        ----------
+        state : dict
+            See `Miner.state`
+        cancelled : threading.Event or None
+            See `Miner`
+        granularity : int
+            See `Miner`
+        round_relaxation : bool
+            See `Miner`
+        solver : str
+            See `Miner`
+            
+        Returns
+        -------
+        Miner
+        '''
+        rng = np.random.default_rng()
+        rng.bit_generator.state = state['rng']
+        return cls(rng, cancelled, state['visited'], state['stats'], granularity, round_relaxation, solver)
+    
+    @property
+    def state(self):
+        '''
+        State of the miner, to continue from later with `from_state`
+        
+        Only consistent when not mining, or while drained, see `iter_random`.
+        
+        Returns
+        -------
+        dict
+            Picklable state
+        '''
+        return {
+            'rng': self._rng.bit_generator.state,
+            'visited': self._visited,
+            'stats': self.stats,
+        }
+    
+    @property
+    def visited(self):
+        '''
+        Recipes tried or skipped by this miner, including those of the
+        `visited` it was created with
         
-    def mine_random(self, nutrition_target, foods):
+        Includes the recipes of the last batch picked, even if mining was
+        cancelled before trying all of them.
+        
+        Returns
+        -------
+        soylent_recipes.mining.visited.BloomFilter
+        '''
+        return self._visited
+        
+    @property
+    def stats(self):
+        '''
+        Snapshot of the counters of all mining done by this miner, including
+        the `stats` it was created with
+        
+        Returns
+        -------
+        Stats
+        '''
+        return self._initial_stats + Stats(
+            recipes_tried=self._recipes_tried,
+            recipes_screened_out=self._recipes_screened_out,
+            recipes_skipped_due_to_visited=self._recipes_skipped_due_to_visited,
+            recipes_failed_verification=self._recipes_failed_verification,
+            recipes_solved=self._recipes_solved,
+            solver=self._get_solver_stats(),
+            pipeline=self._pipeline.stats if self._pipeline else pipeline.Stats(),
+        )
+        
+    def _get_solver_stats(self):
+        stats = solver_.Stats()
+        for solver in list(self._solvers):
+            stats += attr.evolve(solver.stats, telemetry=solver.stats.telemetry.copy())
+        return stats
+        
+    def mine_random(self, nutrition_target, foods, emit):
         '''
         Randomly pick max_foods foods, repeat until k solved recipes are found.
         
+        Parameters
+        ----------
+        nutrition_target : soylent_recipes.nutrition_target.NutritionTarget
+        foods : np.array
+            All foods. Contains exactly the nutrients required by the nutrition
+            target in the exact same order. Rows represent foods, columns
+            represent nutrients.
+        emit : Recipe -> None
+            Called with each solved recipe as soon as it is found, up to k
+            times. Recipes are not kept, so memory use does not grow with k.
+        
         Returns
         -------
-        recipes_tried : int
-            Number of recipes tried.
-        [Recipe]
-            Up to k solved recipes.
+        Stats
+            Stats of the mining.
         '''
         _logger.info('Mining: random, max_foods={}, max_recipes={}'.format(max_foods, max_recipes))
-        solved_recipes = []
-        recipes_tried = 0
-        foods_ = foods.values
-        while not self._cancel:
-            food_indices = np.random.choice(len(foods_), max_foods, replace=False)
-            
-            recipes_tried += 1
-            recipe = Recipe(food_indices, nutrition_target, foods_)
+        solved_recipes = 0
+        for recipe in self.iter_random(nutrition_target, foods):
+            print('.', end='', flush=True)
+            emit(recipe)
+            solved_recipes += 1
+            if solved_recipes == max_recipes:
+                break
+        return self.stats
+    
+    def iter_random(self, nutrition_target, foods, drain_requested=None, on_drained=None):
+        '''
+        Randomly pick max_foods foods, yield the recipe if solved, repeat until
+        cancelled
+        
+        Mining is a pipeline of stages, each running in its own thread:
+        
+        - sample: pick recipes in batches of `_batch_size`
+        - screen: skip recipes which were tried before, reject recipes which
+          obviously cannot be solved. Passes on recipes one at a time.
+        - solve: solve recipes, pass on those which were solved
+        - verify: check the amounts of the solved recipe satisfy the
+          nutrition target
+        - emit: the consumer of this generator
+        
+        The stages are connected by bounded queues. When a stage cannot keep
+        up, the stages before it wait. See `Stats.pipeline` to find out which
+        stage is the bottleneck.
+        
+        The solve stage runs with `solve_workers` threads, each with its own
+        solver, as a solver's problem cannot be shared between threads. The
+        other stages share the miner's random generator, tried recipes and
+        counters, so they run with a single thread.
+        
+        Parameters
+        ----------
+        nutrition_target : soylent_recipes.nutrition_target.NutritionTarget
+        foods : np.array
+            See `mine_random`
+        drain_requested : (() -> bool) or None
+            While it returns True, sampling is paused. Once all sampled
+            recipes have been tried and the solved ones yielded, on_drained is
+            called, during which `state` is consistent. See
+            `soylent_recipes.mining.pipeline.Pipeline.run`.
+        on_drained : () -> None
             
-            if recipe.solved:
-                print('.', end='', flush=True)
-                solved_recipes.append(recipe)
-                if len(solved_recipes) == max_recipes:
-                    break
+        Yields
+        ------
+        Recipe
+            Solved recipe
+        '''
+        self._solvers = []
+        screen = Screen(nutrition_target, foods)
+        minima = nutrition_target['min'].values
+        maxima = nutrition_target['max'].values
+        
+        def sample():
+            while True:
+                yield sample_recipes(self._rng, len(foods), _batch_size, max_foods)
+                
+        def screen_(batch):
+            visited = self._visited.add(batch)
+            batch = batch[~visited]
+            passed_screen = screen(batch)
+            self._recipes_skipped_due_to_visited += int(visited.sum())
+            self._recipes_tried += len(batch)
+            self._recipes_screened_out += len(batch) - int(passed_screen.sum())
+            return batch[passed_screen]
+        
+        def create_solve():
+            solver = self._solver_class(
+                nutrition_target, foods, screen_relaxation, solver_telemetry,
+                self._granularity, self._round_relaxation
+            )
+            self._solvers.append(solver)
+            def solve(food_indices):
+                recipe = Recipe(food_indices, solver)
+                if recipe.solved:
+                    yield recipe
+            return solve
+        
+        def verify(recipe):
+            # Check the amounts, as rounded by the solver, satisfy the target
+            nutrition = recipe.amounts @ foods[recipe.food_indices]
+            too_little = (nutrition < minima) & ~np.isclose(nutrition, minima)
+            too_much = (nutrition > maxima) & ~np.isclose(nutrition, maxima)
+            if (too_little | too_much).any():
+                _logger.warning('Solved recipe does not satisfy nutrition target: {}'.format(recipe))
+                self._recipes_failed_verification += 1
+            else:
+                self._recipes_solved += 1
+                yield recipe
+                
+        # GLPK's output hook, used by telemetry, is process-wide
+        solve_workers_ = solve_workers
+        if solver_telemetry and self._solver_class is solver_.GlpkSolver and solve_workers > 1:
+            _logger.warning('Solving with 1 thread instead of {}, as solver_telemetry is on'.format(solve_workers))
+            solve_workers_ = 1
             
-        return recipes_tried, solved_recipes
+        self._pipeline = pipeline.Pipeline([
+            pipeline.Stage('sample', lambda: sample, queue_size=2),
+            pipeline.Stage('screen', lambda: screen_, queue_size=100),
+            pipeline.Stage('solve', create_solve, workers=solve_workers_, queue_size=100),
+            pipeline.Stage('verify', lambda: verify, queue_size=100),
+        ])
+        yield from self._pipeline.run(self._cancelled, drain_requested, on_drained)
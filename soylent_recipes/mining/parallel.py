@@ -0,0 +1,403 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+
+'''
+Mining with multiple processes
+'''
+
+from pathlib import Path
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from soylent_recipes.config import max_foods, max_recipes, granularity, round_relaxation, solver
+from soylent_recipes.mining import checkpoint as checkpoint_
+from soylent_recipes.mining.miners import Miner, Stats
+import numpy as np
+
+_logger = logging.getLogger(__name__)
+
+# Directory to put files shared with workers in. /dev/shm is in memory on Linux.
+_shared_directory = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# Seconds between stats sent by each worker, see ParallelMiner.stats
+_stats_interval = 1.0
+
+class ParallelMiner(object):
+    
+    '''
+    Recipe miner which mines with multiple worker processes
+    
+    Each worker runs a `Miner` with its own random number generator. Their
+    streams are independent as they are spawned from a single seed.
+    
+    Foods are shared with the workers through a read-only memory mapped file,
+    so each worker accesses the same copy.
+    
+    When given a checkpoint path, a checkpoint is saved every
+    checkpoint_interval seconds, on `request_checkpoint` and on `cancel`. A
+    checkpoint contains the number of recipes emitted so far by each worker
+    and the state of each worker's miner (random number generator, tried
+    recipes, stats). The recipes themselves are appended to a journal next to
+    it as they are emitted, see `soylent_recipes.mining.checkpoint.Journal`,
+    so memory use and checkpoint size do not grow with max_recipes. To take a
+    checkpoint, each worker drains its pipeline and sends its state; recipes
+    it sends after that are not part of the checkpoint, they are found again
+    when resuming. Resuming with the same seed and number of workers therefore
+    tries the same recipes as an uninterrupted run would have.
+    
+    Parameters
+    ----------
+    workers : int
+        Number of worker processes
+    seed : int or None
+        Seed to spawn the random number generators of the workers from. With
+        the same seed and number of workers, workers try the same recipes. If
+        None, a random seed is used. Ignored when resuming.
+    checkpoint_path : Path or None
+        File to save checkpoints to and resume from. If None, no checkpoints
+        are saved. A checkpoint takes about 14MB per worker with the default
+        visited_capacity, mostly the worker's Bloom filter of tried recipes;
+        it grows with the filter as more recipes are tried.
+    checkpoint_interval : float or None
+        Seconds between checkpoints. If None, checkpoints are only saved on
+        request and on cancel.
+    granularity : int
+        See `Miner`
+    round_relaxation : bool
+        See `Miner`
+    solver : str
+        See `Miner`
+    '''
+    
+    def __init__(self, workers, seed=None, checkpoint_path=None, checkpoint_interval=None, granularity=granularity, round_relaxation=round_relaxation, solver=solver):
+        assert workers > 0
+        self._workers = workers
+        self._granularity = granularity
+        self._round_relaxation = round_relaxation
+        self._solver = solver
+        self._seed = seed
+        self._checkpoint_path = checkpoint_path
+        self._checkpoint_interval = checkpoint_interval
+        self._context = multiprocessing.get_context('spawn')  # forking a process with threads is unsafe
+        self._cancelled = self._context.Event()
+        self._cancel_requested = threading.Event()
+        self._checkpoint_requested = threading.Event()
+        self._worker_stats = []
+        self._checkpoint = None  # checkpoint to resume from, see load_checkpoint
+        
+    def cancel(self):
+        '''
+        Stop mining
+        
+        When saving checkpoints, a checkpoint is saved first. Cancelling again
+        stops immediately, without saving a checkpoint.
+        '''
+        if self._checkpoint_path is not None and not self._cancel_requested.is_set():
+            _logger.info('Cancelling after saving a checkpoint, cancel again to cancel immediately')
+            self._cancel_requested.set()
+        else:
+            _logger.info('Cancelling')
+            self._cancelled.set()
+            
+    @property
+    def stats(self):
+        '''
+        Stats of all workers combined, while mining or after
+        
+        While mining, they lag up to a second behind. Can be called from any
+        thread.
+        
+        Returns
+        -------
+        Stats
+        '''
+        return sum(list(self._worker_stats), Stats())
+    
+    def request_checkpoint(self):
+        '''
+        Save a checkpoint without stopping
+        
+        Does nothing when not saving checkpoints.
+        '''
+        if self._checkpoint_path is None:
+            _logger.warning('Checkpoint requested, but no checkpoint path set')
+        else:
+            self._checkpoint_requested.set()
+            
+    def load_checkpoint(self, nutrition_target, foods):
+        '''
+        Load the checkpoint at checkpoint_path to resume from
+        
+        Its stats become the miner's `stats` right away, so that rates derived
+        from `stats` before mining starts do not count the resumed run's work
+        as new. `mine_random` loads it when resuming, unless it was loaded
+        already.
+        
+        Parameters
+        ----------
+        nutrition_target : soylent_recipes.nutrition_target.NutritionTarget
+        foods : np.array
+            See `mine_random`
+            
+        Raises
+        ------
+        ValueError
+            If the checkpoint was saved with different foods, nutrition target
+            or number of workers
+        '''
+        assert self._checkpoint_path is not None
+        checkpoint = checkpoint_.load(self._checkpoint_path)
+        if checkpoint['key'] != checkpoint_.get_key(nutrition_target, foods):
+            raise ValueError('Cannot resume: checkpoint was saved with different foods or nutrition target')
+        if checkpoint['workers'] != self._workers:
+            raise ValueError(
+                'Cannot resume: checkpoint was saved with {} workers, got {}'
+                .format(checkpoint['workers'], self._workers)
+            )
+        self._checkpoint = checkpoint
+        self._worker_stats = [state['stats'] for state in checkpoint['worker_states']]
+        
+    def mine_random(self, nutrition_target, foods, emit, resume=False):
+        '''
+        Like `Miner.mine_random`, but mine with all workers
+        
+        When k solved recipes have been emitted, all workers are cancelled.
+        Recipes solved in the meantime are dropped.
+        
+        Parameters
+        ----------
+        nutrition_target : soylent_recipes.nutrition_target.NutritionTarget
+        foods : np.array
+            See `Miner.mine_random`
+        emit : soylent_recipes.mining.recipe.Recipe -> None
+            See `Miner.mine_random`. Called from the thread calling this
+            method. When resuming, it is first called with the recipes of the
+            checkpoint.
+        resume : bool
+            Whether to resume from the checkpoint at checkpoint_path, see
+            `load_checkpoint`
+        
+        Returns
+        -------
+        Stats
+            Stats of all workers combined, including those of the run that was
+            resumed.
+            
+        Raises
+        ------
+        ValueError
+            If not resuming while a checkpoint exists at checkpoint_path. A new
+            run would overwrite the checkpoint's recipes.
+        '''
+        _logger.info(
+            'Mining: random, max_foods={}, max_recipes={}, workers={}, solver={}, granularity={}, round_relaxation={}'
+            .format(max_foods, max_recipes, self._workers, self._solver, self._granularity, self._round_relaxation)
+        )
+        key = checkpoint_.get_key(nutrition_target, foods)
+        
+        if not resume and self._checkpoint_path is not None and self._checkpoint_path.exists():
+            raise ValueError(
+                'A checkpoint exists at {}, resume it or remove it first'
+                .format(self._checkpoint_path)
+            )
+        
+        # Until workers report, the stats are those of the resumed run
+        if not resume:
+            checkpoint = None
+            self._worker_stats = [Stats()] * self._workers
+        else:
+            if self._checkpoint is None:
+                self.load_checkpoint(nutrition_target, foods)
+            checkpoint = self._checkpoint
+        
+        with tempfile.TemporaryDirectory(dir=_shared_directory) as directory:
+            foods_file = Path(directory) / 'foods.npy'
+            np.save(str(foods_file), foods)
+            return self._mine_random(nutrition_target, foods_file, emit, key, checkpoint)
+    
+    def _mine_random(self, nutrition_target, foods_file, emit, key, checkpoint):
+        # Checkpoints are numbered by generation. Workers poll it and send
+        # their state when it increments. When stopping is set, workers stay
+        # drained after sending their state, as the checkpoint is the last one.
+        generation = self._context.Value('i', 0)
+        stopping = self._context.Event()
+        
+        # Number of recipes emitted, per worker
+        if self._checkpoint_path is not None:
+            journal_path = checkpoint_.get_journal_path(self._checkpoint_path)
+        if checkpoint is None:
+            run = uuid.uuid4().hex
+            recipe_counts = [0] * self._workers
+            states = [None] * self._workers
+            journal = checkpoint_.Journal(journal_path, run) if self._checkpoint_path is not None else None
+        else:
+            run = checkpoint['run']
+            recipe_counts = list(checkpoint['recipe_counts'])
+            states = checkpoint['worker_states']
+            _logger.info('Resuming with {} recipes from checkpoint'.format(sum(recipe_counts)))
+            journal = checkpoint_.resume_journal(journal_path, run, recipe_counts, emit)
+        solved_recipes = sum(recipe_counts)
+        
+        messages = self._context.Queue()
+        seeds = np.random.SeedSequence(self._seed).spawn(self._workers)
+        workers = [
+            self._context.Process(
+                target=_mine_random,
+                args=(
+                    index, seed, state, nutrition_target, foods_file, messages, self._cancelled, generation, stopping,
+                    self._granularity, self._round_relaxation, self._solver
+                ),
+                daemon=True
+            )
+            for index, (seed, state) in enumerate(zip(seeds, states))
+        ]
+        for worker in workers:
+            worker.start()
+            
+        workers_done = set()
+        
+        # Checkpoint being taken: worker states and the number of recipes
+        # emitted of each worker up to the state
+        pending_workers = set()
+        checkpoint_states = [None] * self._workers
+        checkpoint_cuts = [None] * self._workers
+        last_checkpoint = time.monotonic()
+        
+        if solved_recipes >= max_recipes:
+            self._cancelled.set()
+        try:
+            while len(workers_done) < len(workers):
+                # Start a checkpoint if due
+                if self._checkpoint_path is not None and not pending_workers and not self._cancelled.is_set():
+                    interval_passed = (
+                        self._checkpoint_interval is not None
+                        and time.monotonic() - last_checkpoint >= self._checkpoint_interval
+                    )
+                    if interval_passed or self._checkpoint_requested.is_set() or self._cancel_requested.is_set():
+                        self._checkpoint_requested.clear()
+                        if self._cancel_requested.is_set():
+                            stopping.set()
+                        with generation.get_lock():
+                            generation.value += 1
+                        pending_workers = set(range(self._workers))
+                        _logger.info('Checkpoint {} started'.format(generation.value))
+                        
+                try:
+                    kind, value = messages.get(timeout=1)
+                except queue.Empty:
+                    if any(worker.exitcode not in (None, 0) for worker in workers):
+                        raise Exception('A worker process exited unexpectedly')
+                    continue
+                if kind == 'recipe':
+                    index, recipe = value
+                    if solved_recipes < max_recipes:
+                        print('.', end='', flush=True)
+                        emit(recipe)
+                        if journal is not None:
+                            journal.append(index, recipe)
+                        recipe_counts[index] += 1
+                        solved_recipes += 1
+                        if solved_recipes == max_recipes:
+                            self._cancelled.set()
+                elif kind == 'checkpoint':
+                    index, worker_generation, state = value
+                    if worker_generation == generation.value and index in pending_workers:
+                        checkpoint_states[index] = state
+                        checkpoint_cuts[index] = recipe_counts[index]
+                        pending_workers.remove(index)
+                        if not pending_workers:
+                            journal.flush()
+                            checkpoint_.save(self._checkpoint_path, {
+                                'key': key,
+                                'workers': self._workers,
+                                'run': run,
+                                'recipe_counts': checkpoint_cuts,
+                                'worker_states': checkpoint_states,
+                            })
+                            checkpoint_cuts = [None] * self._workers
+                            checkpoint_states = [None] * self._workers
+                            last_checkpoint = time.monotonic()
+                            if self._cancel_requested.is_set():
+                                self._cancelled.set()
+                elif kind == 'stats':
+                    index, stats = value
+                    if index not in workers_done:
+                        self._worker_stats[index] = stats
+                elif kind == 'done':
+                    index, stats = value
+                    self._worker_stats[index] = stats
+                    workers_done.add(index)
+                else:
+                    raise Exception('A worker process failed:\n{}'.format(value))
+        finally:
+            self._cancelled.set()
+            for worker in workers:
+                worker.join(timeout=1)
+                if worker.is_alive():
+                    worker.terminate()
+            if journal is not None:
+                journal.close()
+                    
+        return self.stats
+    
+def _mine_random(index, seed, state, nutrition_target, foods_file, messages, cancelled, generation, stopping, granularity, round_relaxation, solver):
+    '''
+    Worker process: mine recipes and send them to the parent
+    
+    Foods are memory mapped from foods_file. The miner continues from state if
+    not None, else it starts from seed.
+    
+    Sends ``('recipe', (index, recipe))`` for each solved recipe, ``('checkpoint',
+    (index, generation, state))`` each time generation increments, ``('stats',
+    (index, stats))`` every `_stats_interval` seconds, then ``('done', (index,
+    stats))`` when cancelled, or ``('error', traceback)`` when mining failed.
+    Once stopping is set, stops mining after sending the state.
+    '''
+    # Ctrl-C and hangups are handled by the parent, which then cancels us
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    try:
+        foods = np.load(str(foods_file), mmap_mode='r')
+        if state is None:
+            miner = Miner(np.random.default_rng(seed), cancelled, granularity=granularity, round_relaxation=round_relaxation, solver=solver)
+        else:
+            miner = Miner.from_state(state, cancelled, granularity, round_relaxation, solver)
+        
+        checkpointed_generation = [0]
+        def drain_requested():
+            return generation.value != checkpointed_generation[0] or stopping.is_set()
+        def on_drained():
+            if generation.value != checkpointed_generation[0]:
+                checkpointed_generation[0] = generation.value
+                messages.put(('checkpoint', (index, checkpointed_generation[0], miner.state)))
+            
+        def send_stats():
+            while not cancelled.wait(_stats_interval):
+                messages.put(('stats', (index, miner.stats)))
+        threading.Thread(target=send_stats, name='stats sender', daemon=True).start()
+        
+        for recipe in miner.iter_random(nutrition_target, foods, drain_requested, on_drained):
+            messages.put(('recipe', (index, recipe)))
+        messages.put(('done', (index, miner.stats)))
+    except Exception:
+        messages.put(('error', traceback.format_exc()))
@@ -0,0 +1,427 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Pipeline of stages connected by bounded queues
+'''
+
+from collections import OrderedDict
+import logging
+import queue
+import threading
+import time
+from soylent_recipes import histogram
+import attr
+
+_logger = logging.getLogger(__name__)
+
+# Seconds to wait on a queue before checking whether to stop
+_poll_interval = 0.1
+
+# Seconds a paused source waits before checking whether to continue
+_pause_interval = 0.01
+
+@attr.s(frozen=True)
+class StageStats(object):
+    
+    '''
+    Counters of a pipeline stage, summed over its workers
+    
+    Stage stats can be summed, e.g. to combine stats of the same stage in
+    multiple pipelines.
+    
+    Attributes
+    ----------
+    items_in : int
+        Number of items taken from the input queue. 0 for a source.
+    items_out : int
+        Number of items put on the output queue
+    busy_time : float
+        Seconds spent processing items
+    run_time : float
+        Seconds the workers of the stage ran
+    queue_depth_sum : int
+        Sum of the input queue's size, sampled whenever an item is taken from
+        it
+    queue_depth_max : int
+        Largest sampled input queue size
+    latency : soylent_recipes.histogram.Histogram
+        Seconds spent processing each item. For a source, producing each item.
+    '''
+    
+    items_in = attr.ib(default=0)
+    items_out = attr.ib(default=0)
+    busy_time = attr.ib(default=0.0)
+    run_time = attr.ib(default=0.0)
+    queue_depth_sum = attr.ib(default=0)
+    queue_depth_max = attr.ib(default=0)
+    latency = attr.ib(default=attr.Factory(histogram.Histogram))
+    
+    @property
+    def throughput(self):
+        '''
+        Items processed per busy second, or None if the stage was never busy
+        
+        For a source, items produced per busy second.
+        '''
+        if not self.busy_time:
+            return None
+        return (self.items_in or self.items_out) / self.busy_time
+    
+    @property
+    def utilization(self):
+        '''
+        Fraction of time the stage was busy, or None if it did not run
+        
+        A stage which is busy nearly all the time is a bottleneck, one which is
+        rarely busy is waiting for its input, or for room in its output queue.
+        '''
+        if not self.run_time:
+            return None
+        return self.busy_time / self.run_time
+    
+    @property
+    def queue_depth_mean(self):
+        '''
+        Mean sampled input queue size, or None if no items were taken
+        '''
+        if not self.items_in:
+            return None
+        return self.queue_depth_sum / self.items_in
+        
+    def __add__(self, other):
+        values = attr.asdict(self, recurse=False)
+        values = {name: value + getattr(other, name) for name, value in values.items()}
+        values['queue_depth_max'] = max(self.queue_depth_max, other.queue_depth_max)
+        return type(self)(**values)
+    
+    def __str__(self):
+        format_ = lambda value, format_: '-' if value is None else format_.format(value)
+        format_duration = lambda value: '-' if value is None else histogram.format_duration(value)
+        return (
+            '{} in, {} out, {}/s, {} busy, input queue depth: {} mean, {} max, '
+            'latency: p50 {}, p99 {}'
+            .format(
+                self.items_in, self.items_out,
+                format_(self.throughput, '{:.1f}'),
+                format_(self.utilization, '{:.0%}'),
+                format_(self.queue_depth_mean, '{:.1f}'),
+                self.queue_depth_max,
+                format_duration(self.latency.percentile(50)),
+                format_duration(self.latency.percentile(99)),
+            )
+        )
+    
+@attr.s(frozen=True)
+class Stats(object):
+    
+    '''
+    Counters of a pipeline
+    
+    Stats can be summed, stages are matched by name.
+    
+    Attributes
+    ----------
+    stages : OrderedDict(str -> StageStats)
+        Stats of each stage by name
+    '''
+    
+    stages = attr.ib(default=attr.Factory(OrderedDict))
+    
+    def __add__(self, other):
+        stages = OrderedDict(self.stages)
+        for name, stats in other.stages.items():
+            stages[name] = stages.get(name, StageStats()) + stats
+        return type(self)(stages)
+    
+    def __str__(self):
+        return '\n'.join('{}: {}'.format(name, stats) for name, stats in self.stages.items())
+    
+class Stage(object):
+    
+    '''
+    Stage of a `Pipeline`
+    
+    Parameters
+    ----------
+    name : str
+    create_function : () -> function
+        Called once per worker to create the function it processes items with.
+        The function of the first stage of a pipeline, the source, takes no
+        arguments and returns an iterable of items. Functions of other stages
+        take an item and return an iterable of items to pass on.
+    workers : int
+        Number of threads to run the stage with
+    queue_size : int
+        Maximum number of items in the output queue. Workers wait for room in
+        the queue, slowing down the stage to the pace of the next stages.
+    '''
+    
+    def __init__(self, name, create_function, workers=1, queue_size=1):
+        assert workers > 0
+        assert queue_size > 0
+        self.name = name
+        self.create_function = create_function
+        self.workers = workers
+        self.queue_size = queue_size
+        
+class Pipeline(object):
+    
+    '''
+    Stages, each run in their own threads, connected by bounded queues
+    
+    Each stage takes items from the output queue of the previous stage and puts
+    items on its own output queue. The output of the last stage is yielded by
+    `run`. The consumer of `run` is reported as stage 'emit'.
+    
+    Note that only one thread runs Python code at a time, so extra workers
+    help a stage only when it spends its time in code which releases the GIL.
+    
+    The pipeline can be drained: the source is paused until all items it
+    produced have passed through all stages. While drained, no stage is
+    running, which allows taking a consistent snapshot of their state.
+    
+    Parameters
+    ----------
+    stages : [Stage]
+        Stages in order, the first being the source.
+    '''
+    
+    def __init__(self, stages):
+        assert stages
+        self._stages = stages
+        self._queues = [queue.Queue(stage.queue_size) for stage in stages]  # output queue of each stage
+        self._counters = OrderedDict((stage.name, _Counters()) for stage in stages)
+        self._counters['emit'] = _Counters()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._error = None
+        
+        # Draining. Guarded by self._lock
+        self._paused = False  # whether the source should pause
+        self._source_waiting = False  # whether the source is paused
+        self._in_flight = 0  # number of items in queues or being processed
+        
+    @property
+    def stats(self):
+        '''
+        Snapshot of the pipeline's counters
+        
+        Returns
+        -------
+        Stats
+        '''
+        with self._lock:
+            stages = OrderedDict((name, counters.snapshot()) for name, counters in self._counters.items())
+        return Stats(stages)
+        
+    def run(self, cancelled, drain_requested=None, on_drained=None):
+        '''
+        Run the stages, yield the output of the last stage
+        
+        Stops when cancelled, or when the generator is closed.
+        
+        Parameters
+        ----------
+        cancelled : threading.Event
+            Event which stops the pipeline when set. Any object with an
+            ``is_set`` method will do.
+        drain_requested : (() -> bool) or None
+            Checked regularly. While it returns True, the source is paused
+            and on_drained is called each time it is checked while drained.
+            If None, the pipeline is never drained.
+        on_drained : () -> None
+            Called when drained, from the thread iterating this generator.
+        
+        Yields
+        ------
+        object
+            Output item of the last stage
+            
+        Raises
+        ------
+        Exception
+            When a stage raises, it is raised again here.
+        '''
+        threads = []
+        for index, stage in enumerate(self._stages):
+            for _ in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work, args=(index, stage.create_function()),
+                    name='{} stage'.format(stage.name), daemon=True
+                )
+                threads.append(thread)
+        for thread in threads:
+            thread.start()
+        counters = self._counters['emit']
+        with self._lock:
+            counters.start()
+        try:
+            while not cancelled.is_set():
+                if drain_requested is not None:
+                    paused = drain_requested()
+                    with self._lock:
+                        self._paused = paused
+                        drained = paused and self._source_waiting and not self._in_flight
+                    if drained:
+                        on_drained()
+                item = self._get(self._queues[-1], counters)
+                if self._error is not None:
+                    raise self._error
+                if item is not _nothing:
+                    started = time.perf_counter()
+                    yield item
+                    duration = time.perf_counter() - started
+                    with self._lock:
+                        counters.items_out += 1
+                        counters.busy_time += duration
+                        counters.latency.add(duration)
+                        self._in_flight -= 1
+        finally:
+            self._stopped.set()
+            with self._lock:
+                counters.stop()
+            for thread in threads:
+                thread.join(timeout=1)
+                if thread.is_alive():
+                    _logger.warning('{} did not stop in time'.format(thread.name))
+                    
+    def _work(self, index, function):
+        stage = self._stages[index]
+        counters = self._counters[stage.name]
+        with self._lock:
+            counters.start()
+        try:
+            if index == 0:
+                items = iter(function())
+                while not self._stopped.is_set():
+                    with self._lock:
+                        self._source_waiting = self._paused
+                    if self._source_waiting:
+                        time.sleep(_pause_interval)
+                        continue
+                    started = time.perf_counter()
+                    item = next(items, _nothing)
+                    if item is _nothing:
+                        break
+                    duration = time.perf_counter() - started
+                    with self._lock:
+                        counters.busy_time += duration
+                        counters.latency.add(duration)
+                    self._put(self._queues[index], item, counters)
+            else:
+                input_ = self._queues[index - 1]
+                while not self._stopped.is_set():
+                    item = self._get(input_, counters)
+                    if item is _nothing:
+                        continue
+                    started = time.perf_counter()
+                    outputs = list(function(item))
+                    duration = time.perf_counter() - started
+                    with self._lock:
+                        counters.busy_time += duration
+                        counters.latency.add(duration)
+                    for output in outputs:
+                        self._put(self._queues[index], output, counters)
+                    with self._lock:
+                        self._in_flight -= 1
+        except Exception as ex:
+            self._error = ex
+            self._stopped.set()
+        finally:
+            with self._lock:
+                counters.stop()
+                
+    def _get(self, queue_, counters):
+        '''
+        Get item from queue, or return _nothing if none arrived in time
+        '''
+        try:
+            item = queue_.get(timeout=_poll_interval)
+        except queue.Empty:
+            return _nothing
+        depth = queue_.qsize()
+        with self._lock:
+            counters.items_in += 1
+            counters.queue_depth_sum += depth
+            counters.queue_depth_max = max(counters.queue_depth_max, depth)
+        return item
+    
+    def _put(self, queue_, item, counters):
+        '''
+        Put item on queue, waiting for room unless stopped
+        '''
+        # Count the item as in flight before it becomes visible to the next
+        # stage, which uncounts it once processed
+        with self._lock:
+            self._in_flight += 1
+        while not self._stopped.is_set():
+            try:
+                queue_.put(item, timeout=_poll_interval)
+            except queue.Full:
+                continue
+            with self._lock:
+                counters.items_out += 1
+            return
+        
+# Returned by Pipeline._get when there is no item
+_nothing = object()
+
+@attr.s
+class _Counters(object):
+    
+    '''
+    Live counters of a stage, see StageStats
+    '''
+    
+    items_in = attr.ib(default=0)
+    items_out = attr.ib(default=0)
+    busy_time = attr.ib(default=0.0)
+    queue_depth_sum = attr.ib(default=0)
+    queue_depth_max = attr.ib(default=0)
+    latency = attr.ib(default=attr.Factory(histogram.Histogram))
+    run_time = attr.ib(default=0.0)  # of workers which stopped
+    running = attr.ib(default=0)  # number of workers running
+    started = attr.ib(default=None)  # when the running workers started
+    
+    def start(self):
+        if self.running:
+            self._accumulate()
+        else:
+            self.started = time.perf_counter()
+        self.running += 1
+        
+    def stop(self):
+        self._accumulate()
+        self.running -= 1
+        
+    def _accumulate(self):
+        now = time.perf_counter()
+        self.run_time += self.running * (now - self.started)
+        self.started = now
+        
+    def snapshot(self):
+        run_time = self.run_time
+        if self.running:
+            run_time += self.running * (time.perf_counter() - self.started)
+        return StageStats(
+            items_in=self.items_in,
+            items_out=self.items_out,
+            busy_time=self.busy_time,
+            run_time=run_time,
+            queue_depth_sum=self.queue_depth_sum,
+            queue_depth_max=self.queue_depth_max,
+            latency=self.latency.copy(),
+        )
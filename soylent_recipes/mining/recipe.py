@@ -14,7 +14,6 @@
 # along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
 
 from chicken_turtle_util.exceptions import InvalidOperationError
-from soylent_recipes import solver
 
 class Recipe(object):
     
@@ -24,17 +23,16 @@ class Recipe(object):
     Parameters
     ----------
     food_indices : np.array
-        Indices of foods in recipe referencing foods in all_foods
-    nutrition_target : soylent_recipes.nutrition_target.NormalizedNutritionTarget
-        Nutrition target the recipe should be solved for
-    all_foods : np.array
-        All normalized foods.
+        Indices of foods in recipe referencing the foods of solver
+    solver : soylent_recipes.solver.GlpkSolver
+        Solver of the nutrition target the recipe should be solved for, or
+        any other in `soylent_recipes.solver.solvers`
     '''
     
-    def __init__(self, food_indices, nutrition_target, all_foods):
+    def __init__(self, food_indices, solver):
         # Solve diet problem resulting in scored recipe
         self._food_indices = food_indices.copy()
-        self._amounts = solver.solve(nutrition_target, all_foods[food_indices])
+        self._amounts = solver.solve(food_indices)
     
     @property
     def food_indices(self):
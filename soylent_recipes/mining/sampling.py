@@ -0,0 +1,61 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Random sampling of recipes
+'''
+
+import numpy as np
+
+def sample_recipes(rng, food_count, recipe_count, foods_per_recipe):
+    '''
+    Pick recipes uniformly at random
+    
+    Each recipe is a set of distinct foods, picked uniformly from all such sets.
+    All recipes are picked at once, with a few vectorized draws.
+    
+    Parameters
+    ----------
+    rng : np.random.Generator
+    food_count : int
+        Number of foods to pick from
+    recipe_count : int
+        Number of recipes to pick
+    foods_per_recipe : int
+        Number of foods in each recipe. At most `food_count`.
+        
+    Returns
+    -------
+    np.array([[int]])
+        Food indices of a recipe per row. Rows are not necessarily distinct.
+    '''
+    assert 0 < foods_per_recipe <= food_count
+    if foods_per_recipe * 2 > food_count:
+        # Rejecting draws with duplicate foods would reject nearly all of
+        # them; shuffle all foods for each recipe instead
+        return rng.random((recipe_count, food_count)).argsort(axis=1)[:, :foods_per_recipe]
+    
+    # Draw foods with replacement, redraw recipes containing a food twice. As
+    # each sequence of distinct foods is equally likely to be drawn, so is
+    # each set of foods. With 20 out of thousands of foods, few recipes need
+    # to be redrawn.
+    recipes = rng.integers(food_count, size=(recipe_count, foods_per_recipe))
+    redraw = np.arange(recipe_count)
+    while True:
+        sorted_ = np.sort(recipes[redraw], axis=1)
+        redraw = redraw[(sorted_[:, 1:] == sorted_[:, :-1]).any(axis=1)]
+        if not redraw.size:
+            return recipes
+        recipes[redraw] = rng.integers(food_count, size=(len(redraw), foods_per_recipe))
@@ -0,0 +1,80 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+
+'''
+Cheap checks to reject recipes before solving them
+'''
+
+import numpy as np
+
+class Screen(object):
+    
+    '''
+    Reject recipes which cannot reach the minima of a nutrition target
+    
+    Checks necessary conditions for a recipe to be solvable on a whole batch of
+    recipes at once. Rejected recipes cannot be solved, but recipes which pass
+    may still turn out unsolvable.
+    
+    The checks are derived from capacity nutrients: nutrients with a max which
+    every food contains, e.g. mass. For a capacity nutrient `k`, no recipe can
+    contain more of nutrient `i` than ``max_k * max_j(foods[j,i] / foods[j,k])``.
+    E.g. for mass this is the best density of `i` among the recipe's foods,
+    times the max mass. A recipe is rejected if any of these upper bounds is
+    below the nutrient's min. A recipe in which none of the foods contain a
+    nutrient with a min is rejected as well.
+    
+    Parameters
+    ----------
+    nutrition_target : soylent_recipes.nutrition_target.NutritionTarget
+    foods : np.array
+        All foods. Contains exactly the nutrients required by the nutrition
+        target in the exact same order. Rows represent foods, columns represent
+        nutrients.
+    '''
+    
+    def __init__(self, nutrition_target, foods):
+        minima = nutrition_target['min'].values
+        maxima = nutrition_target['max'].values
+        has_min = ~np.isnan(minima)  # only nutrients with a min can fall short
+        is_capacity = ~np.isnan(maxima) & (foods > 0).all(axis=0)
+        self._minima = minima[has_min]
+        self._capacity_maxima = maxima[is_capacity]
+        self._contains = foods[:, has_min] > 0
+        
+        # Ratios of nutrients to capacity nutrients (food, capacity nutrient, nutrient)
+        self._ratios = foods[:, has_min][:, np.newaxis, :] / foods[:, is_capacity][:, :, np.newaxis]
+    
+    def __call__(self, food_indices):
+        '''
+        Get which recipes pass the screen
+        
+        Parameters
+        ----------
+        food_indices : np.array(int)
+            2D array. Each row is a recipe, listing indices of the foods it uses.
+            
+        Returns
+        -------
+        np.array(bool)
+            ``mask[i]`` is True iff the recipe of ``food_indices[i]`` passed.
+        '''
+        # Upper bound on the amount of each nutrient (recipe, nutrient)
+        bounds = np.where(self._contains[food_indices].any(axis=1), np.inf, 0.0)
+        if self._capacity_maxima.size:
+            capacity_bounds = self._ratios[food_indices].max(axis=1) * self._capacity_maxima[:, np.newaxis]
+            bounds = np.minimum(bounds, capacity_bounds.min(axis=1))
+        return ((bounds > self._minima) | np.isclose(bounds, self._minima)).all(axis=1)
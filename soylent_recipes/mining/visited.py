@@ -0,0 +1,175 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Memory of which recipes have been tried
+'''
+
+import logging
+import math
+import numpy as np
+
+_logger = logging.getLogger(__name__)
+
+class BloomFilter(object):
+    
+    '''
+    Set of recipes, which may wrongly report a recipe as added
+    
+    A recipe is identified by its set of foods, regardless of their order.
+    Recipes which have been added are always reported as added. Recipes which
+    have not been added are wrongly reported as added (a false positive) with
+    a chance of at most `error_rate`.
+    
+    The filter starts with room for `capacity` recipes. Each time it is full, a
+    filter twice as large is added to it, with half the false positive rate of
+    the previous one (a scalable Bloom filter), which keeps the overall rate
+    below `error_rate`. Memory use is therefore not bounded, it grows a little
+    faster than the number of recipes added; each growth is logged. This is a
+    deliberate choice over a fixed size filter, whose false positive rate
+    climbs towards 1 past its capacity (44% at 3 times, 99% at 10 times), which
+    would silently skip nearly all new recipes as already tried.
+    
+    To save it, pickle it.
+    
+    Parameters
+    ----------
+    capacity : int
+        Number of recipes to make room for initially
+    error_rate : float
+        Maximum false positive rate
+    '''
+    
+    _growth = 2  # capacity of each next layer relative to the previous one
+    _tightening = 0.5  # error rate of each next layer relative to the previous one
+    
+    def __init__(self, capacity, error_rate):
+        assert capacity > 0
+        assert 0 < error_rate < 1
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._layers = []
+        self._count = 0  # number of recipes added to the last layer
+        self._add_layer()
+        
+    def _add_layer(self):
+        index = len(self._layers)
+        capacity = self._capacity * self._growth**index
+        error_rate = self._error_rate * (1 - self._tightening) * self._tightening**index
+        bit_count = math.ceil(-capacity * math.log(error_rate) / math.log(2)**2)
+        hash_count = max(1, round(bit_count / capacity * math.log(2)))
+        self._layers.append(_Layer(np.zeros(math.ceil(bit_count / 8), dtype=np.uint8), hash_count, capacity))
+        self._count = 0
+        
+    @property
+    def size(self):
+        '''
+        Size of the filter in bytes
+        '''
+        return sum(len(layer.bits) for layer in self._layers)
+        
+    def add(self, food_indices):
+        '''
+        Add recipes, return which were already added
+        
+        Parameters
+        ----------
+        food_indices : np.array([[int]])
+            Food indices of a recipe per row. Rows may differ in order only.
+            
+        Returns
+        -------
+        np.array([bool])
+            Whether the recipe of each row was already added, either earlier
+            or in a previous row of the same call. May wrongly be True, see
+            `BloomFilter`.
+        '''
+        canonical = np.sort(food_indices, axis=1).astype(np.uint64)
+        hash1 = _hash(canonical, np.uint64(0x9e3779b97f4a7c15))
+        hash2 = _hash(canonical, np.uint64(0xc2b2ae3d27d4eb4f)) | np.uint64(1)
+        added = np.zeros(len(canonical), dtype=bool)
+        for layer in self._layers:
+            added |= layer.contains(hash1, hash2)
+        
+        # Rows repeating an earlier row in food_indices
+        _, first_rows = np.unique(canonical, axis=0, return_index=True)
+        repeated = np.ones(len(canonical), dtype=bool)
+        repeated[first_rows] = False
+        
+        # Add the new recipes to the last layer, adding layers as they fill up
+        new = np.flatnonzero(~(added | repeated))
+        while len(new):
+            layer = self._layers[-1]
+            if self._count == layer.capacity:
+                self._add_layer()
+                _logger.info(
+                    'Filter of tried recipes is full, growing it to {:.1f}MB to '
+                    'keep its error rate'.format(self.size / 1e6)
+                )
+                continue
+            rows = new[:layer.capacity - self._count]
+            layer.add(hash1[rows], hash2[rows])
+            self._count += len(rows)
+            new = new[len(rows):]
+        return added | repeated
+    
+class _Layer(object):
+    
+    '''
+    Plain, fixed size Bloom filter of a `BloomFilter`
+    
+    Double hashing: position i is ``(hash1 + i * hash2) % bit_count``.
+    '''
+    
+    def __init__(self, bits, hash_count, capacity):
+        self.bits = bits
+        self.hash_count = hash_count
+        self.capacity = capacity
+        self._bit_count = np.uint64(len(bits) * 8)
+        
+    def _positions(self, hash1, hash2):
+        '''
+        Get bytes and bit masks of each recipe
+        '''
+        i = np.arange(self.hash_count, dtype=np.uint64)
+        positions = (hash1[:, np.newaxis] + i * hash2[:, np.newaxis]) % self._bit_count
+        bytes_ = positions >> np.uint64(3)
+        masks = np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)
+        return bytes_, masks
+        
+    def contains(self, hash1, hash2):
+        bytes_, masks = self._positions(hash1, hash2)
+        return ((self.bits[bytes_] & masks) != 0).all(axis=1)
+    
+    def add(self, hash1, hash2):
+        bytes_, masks = self._positions(hash1, hash2)
+        np.bitwise_or.at(self.bits, bytes_.ravel(), masks.ravel())
+    
+def _hash(rows, seed):
+    '''
+    64-bit hash of each row of unsigned 64-bit ints
+    
+    Combines the values FNV-1a style, followed by the MurmurHash3 finalizer.
+    Multiplications wrap around, as intended.
+    '''
+    hash_ = np.full(len(rows), seed, dtype=np.uint64)
+    for column in rows.T:
+        hash_ = (hash_ ^ column) * np.uint64(0x100000001b3)
+    hash_ ^= hash_ >> np.uint64(33)
+    hash_ *= np.uint64(0xff51afd7ed558ccd)
+    hash_ ^= hash_ >> np.uint64(33)
+    hash_ *= np.uint64(0xc4ceb9fe1a85ec53)
+    hash_ ^= hash_ >> np.uint64(33)
+    return hash_
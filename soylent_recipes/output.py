@@ -0,0 +1,427 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Output of solved recipes
+'''
+
+import json
+import logging
+import queue
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+_logger = logging.getLogger(__name__)
+
+# Seconds after which written recipes are flushed to disk
+_flush_interval = 5
+
+# Maximum number of recipes waiting to be written
+_queue_size = 1000
+
+# Number of recipes per Parquet row group
+_parquet_batch_size = 1000
+
+_header = (
+    'Amounts are in grams of edible portion. E.g. if the food has bones, you should\n'
+    'weigh without the bones.\n\n'
+)
+_separator = '\n\n' + '-'*60 + '\n\n'
+
+class _Writer(object):
+    
+    '''
+    Write recipes to a file as they are found
+    
+    Recipes are formatted and written by a background thread, so that the
+    thread calling `write` need not wait. Written recipes are flushed every
+    `_flush_interval` seconds, so that little is lost when the process
+    crashes. Only the recipes waiting to be written are kept in memory.
+    
+    Use as a context manager, or call `close` when done.
+    
+    Parameters
+    ----------
+    path : Path
+        File to write to. Overwritten if it exists.
+    foods : pd.DataFrame
+        All foods. Index: (food_id, description). Columns: nutrients.
+    nutrition_target : soylent_recipes.nutrition_target.NutritionTarget
+    '''
+    
+    #: File extension of the format, e.g. '.txt'
+    extension = None
+    
+    def __init__(self, path, foods, nutrition_target):
+        self._path = path
+        self._foods = foods
+        self._nutrition_target = nutrition_target
+        self._recipes = queue.Queue(_queue_size)
+        self._recipes_written = 0
+        self._error = None
+        self._open()
+        self._thread = threading.Thread(target=self._write_recipes, name='recipe writer', daemon=True)
+        self._thread.start()
+        
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+        
+    def write(self, recipe):
+        '''
+        Write recipe
+        
+        Parameters
+        ----------
+        recipe : soylent_recipes.mining.recipe.Recipe
+            Solved recipe
+        '''
+        self._raise_error()
+        self._recipes.put(recipe)
+        
+    def close(self):
+        '''
+        Write the remaining recipes and close the file
+        '''
+        if self._thread.is_alive():
+            self._recipes.put(None)
+            self._thread.join()
+        self._close()
+        self._raise_error()
+        
+    def _raise_error(self):
+        if self._error is not None:
+            raise Exception('Failed to write recipes to {}'.format(self._path)) from self._error
+        
+    def _write_recipes(self):
+        # Write all recipes waiting at once, so that their nutrition is
+        # evaluated in a single batch
+        try:
+            flushed = time.monotonic()
+            closed = False
+            while not closed:
+                recipes = []
+                try:
+                    recipes.append(self._recipes.get(timeout=_flush_interval))
+                    while len(recipes) < _queue_size:
+                        recipes.append(self._recipes.get_nowait())
+                except queue.Empty:
+                    pass
+                if recipes and recipes[-1] is None:
+                    recipes.pop()
+                    closed = True
+                if recipes:
+                    self._write(recipes)
+                    self._recipes_written += len(recipes)
+                if time.monotonic() - flushed >= _flush_interval:
+                    self._flush()
+                    flushed = time.monotonic()
+        except Exception as ex:
+            _logger.exception('Failed to write recipes')
+            self._error = ex
+            
+    def _open(self):
+        raise NotImplementedError()
+    
+    def _write(self, recipes):
+        '''
+        Write batch of recipes
+        '''
+        raise NotImplementedError()
+    
+    def _flush(self):
+        self._file.flush()
+        
+    def _close(self):
+        self._file.close()
+            
+class TextWriter(_Writer):
+    
+    '''
+    Write recipes as human readable text, see `format_recipe`
+    '''
+    
+    extension = '.txt'
+    
+    def _open(self):
+        self._file = self._path.open('w')
+        self._file.write(_header)
+        
+    def _write(self, recipes):
+        if self._recipes_written:
+            self._file.write(_separator)
+        self._file.write(_separator.join(format_recipes(recipes, self._foods, self._nutrition_target)))
+        
+class JsonlWriter(_Writer):
+    
+    '''
+    Write recipes as JSON lines
+    
+    Each line is a recipe: an object with:
+    
+    foods : [{id :: int, description :: str, amount :: int}]
+        Foods used in the recipe and their amounts in grams
+    nutrition : {str => float}
+        Amount of each nutrient in the recipe
+    '''
+    
+    extension = '.jsonl'
+    
+    def _open(self):
+        self._file = self._path.open('w')
+        
+    def _write(self, recipes):
+        food_indices, amounts, contributions = _evaluate(recipes, self._foods.values)
+        nutrition = contributions.sum(axis=1)
+        nutrients = self._foods.columns
+        for food_indices_, amounts_, nutrition_ in zip(food_indices, amounts, nutrition):
+            used = ~np.isclose(amounts_, 0.0)
+            recipe_json = {
+                'foods': [
+                    {'id': int(food_id), 'description': description, 'amount': int(amount)}
+                    for (food_id, description), amount in zip(self._foods.index[food_indices_[used]], amounts_[used])
+                ],
+                'nutrition': dict(zip(nutrients, nutrition_.tolist())),
+            }
+            self._file.write(json.dumps(recipe_json) + '\n')
+        
+class CsvWriter(_Writer):
+    
+    '''
+    Write recipes as CSV
+    
+    Each row is a food of a recipe, see `_recipes_table`.
+    '''
+    
+    extension = '.csv'
+    
+    def _open(self):
+        self._file = self._path.open('w')
+        
+    def _write(self, recipes):
+        table = _recipes_table(recipes, self._recipes_written, self._foods)
+        table.to_csv(self._file, header=not self._recipes_written, index=False)
+        
+class ParquetWriter(_Writer):
+    
+    '''
+    Write recipes as Parquet
+    
+    Each row is a food of a recipe, see `_recipes_table`. Recipes are written in
+    row groups of at least `_parquet_batch_size` recipes. The file can only be
+    read after the writer has been closed.
+    
+    Requires pyarrow.
+    '''
+    
+    extension = '.parquet'
+    
+    def _open(self):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as ex:
+            raise Exception('Writing Parquet requires pyarrow, install it with: pip install "soylent-recipes[parquet]"') from ex
+        self._pyarrow = pyarrow
+        self._file = None  # pyarrow.parquet.ParquetWriter, created on first write
+        self._tables = []
+        self._pending_recipes = 0  # number of recipes in self._tables
+        
+    def _write(self, recipes):
+        self._tables.append(_recipes_table(recipes, self._recipes_written, self._foods))
+        self._pending_recipes += len(recipes)
+        if self._pending_recipes >= _parquet_batch_size:
+            self._write_batch()
+            
+    def _write_batch(self):
+        table = self._pyarrow.Table.from_pandas(pd.concat(self._tables), preserve_index=False)
+        if self._file is None:
+            self._file = self._pyarrow.parquet.ParquetWriter(str(self._path), table.schema)
+        self._file.write_table(table)
+        self._tables = []
+        self._pending_recipes = 0
+        
+    def _flush(self):
+        pass  # Parquet files are complete only once closed
+    
+    def _close(self):
+        if self._tables:
+            self._write_batch()
+        if self._file is not None:
+            self._file.close()
+        
+#: Writer class by format name
+writers = {
+    'text': TextWriter,
+    'jsonl': JsonlWriter,
+    'csv': CsvWriter,
+    'parquet': ParquetWriter,
+}
+
+def _evaluate(recipes, food_values):
+    '''
+    Get the food amounts of recipes and their nutrition, all at once
+    
+    Parameters
+    ----------
+    recipes : [soylent_recipes.mining.recipe.Recipe]
+        Solved recipes
+    food_values : np.array
+        All foods, a row per food, a column per nutrient
+    
+    Returns
+    -------
+    food_indices : np.array([[int]])
+        Food indices of each recipe, a row per recipe. Rows of recipes with
+        fewer foods are padded with food 0.
+    amounts : np.array([[int]])
+        Amount of each food, like food_indices. Padding has amount 0.
+    contributions : np.array([[[float]]])
+        Amount of each nutrient in the amount of each food. Indexed by recipe,
+        food, nutrient. Summing over foods gives the nutrition of each recipe.
+    '''
+    food_count = max(len(recipe.food_indices) for recipe in recipes)
+    food_indices = np.zeros((len(recipes), food_count), dtype=int)
+    amounts = np.zeros((len(recipes), food_count), dtype=int)
+    for i, recipe in enumerate(recipes):
+        food_indices[i, :len(recipe.food_indices)] = recipe.food_indices
+        amounts[i, :len(recipe.amounts)] = recipe.amounts
+    contributions = amounts[:, :, np.newaxis] * food_values[food_indices]
+    return food_indices, amounts, contributions
+
+def _recipes_table(recipes, first_recipe_index, foods):
+    '''
+    Get table of recipes with a row per food used
+    
+    Parameters
+    ----------
+    recipes : [soylent_recipes.mining.recipe.Recipe]
+        Solved recipes
+    first_recipe_index : int
+        Index of the first recipe in the output
+    foods : pd.DataFrame
+        All foods. Index: (food_id, description). Columns: nutrients.
+    
+    Returns
+    -------
+    pd.DataFrame
+        Columns:
+        
+        recipe : int
+            Index of the recipe in the output
+        food_id : int
+            USDA food id
+        description : str
+            Food description
+        amount : int
+            Amount of food in grams
+        {nutrient} : float
+            Amount of nutrient in the amount of food. The sum over the rows of
+            a recipe is the nutrition of the recipe.
+    '''
+    food_indices, amounts, contributions = _evaluate(recipes, foods.values)
+    used = ~np.isclose(amounts, 0.0)
+    used_food_indices = food_indices[used]
+    table = pd.DataFrame(contributions[used], columns=foods.columns)
+    table.insert(0, 'recipe', first_recipe_index + np.nonzero(used)[0])
+    table.insert(1, 'food_id', foods.index.get_level_values('food_id')[used_food_indices])
+    table.insert(2, 'description', foods.index.get_level_values('description')[used_food_indices])
+    table.insert(3, 'amount', amounts[used])
+    return table
+
+def format_recipes(recipes, foods, nutrition_target):
+    '''
+    Format recipes as text
+    
+    Parameters
+    ----------
+    recipes : [soylent_recipes.mining.recipe.Recipe]
+        Solved recipes
+    foods : pd.DataFrame
+        All foods. Index: (food_id, description). Columns: nutrients.
+    nutrition_target : soylent_recipes.nutrition_target.NutritionTarget
+    
+    Returns
+    -------
+    [str]
+        Per recipe: a table of foods and their amounts followed by a table
+        comparing the nutrition of the recipe to the nutrition target, marking
+        violated bounds with '!'.
+    '''
+    food_indices, amounts, contributions = _evaluate(recipes, foods.values)
+    nutrition = contributions.sum(axis=1)
+    
+    # Flag violated bounds of all recipes at once
+    nutrition_target = nutrition_target.reindex(foods.columns)
+    minima = nutrition_target['min'].values
+    maxima = nutrition_target['max'].values
+    too_little = (nutrition < minima) & ~np.isclose(nutrition, minima)
+    too_much = (nutrition > maxima) & ~np.isclose(nutrition, maxima)
+    
+    # Nutrients sorted by name. Columns which are the same for each recipe are
+    # formatted once.
+    order = np.argsort(foods.columns.values)
+    nutrients = [''] + list(foods.columns.values[order])
+    minima = ['min'] + [_format_amount(x) for x in minima[order]]
+    maxima = ['max'] + [_format_amount(x) for x in maxima[order]]
+    
+    descriptions = foods.index.get_level_values('description')
+    flag = lambda violated: '!' if violated else ''
+    texts = []
+    for i in range(len(recipes)):
+        used = ~np.isclose(amounts[i], 0.0)
+        recipe_foods = sorted(zip(descriptions[food_indices[i][used]], amounts[i][used]), key=lambda food: food[0])
+        recipe_table = _format_table(
+            [
+                ['{:.0f}g'.format(amount) for _, amount in recipe_foods] + ['=', '{:.0f}g'.format(amounts[i].sum())],
+                [description for description, _ in recipe_foods] + ['', ''],
+            ],
+            '<<'
+        )
+        nutrition_table = _format_table(
+            [
+                nutrients,
+                minima,
+                ['min_err'] + list(map(flag, too_little[i][order])),
+                ['actual'] + list(map(_format_amount, nutrition[i][order])),
+                ['max_err'] + list(map(flag, too_much[i][order])),
+                maxima,
+            ],
+            '<><><>'
+        )
+        texts.append('{}\n\n{}'.format(recipe_table, nutrition_table))
+    return texts
+
+def _format_amount(amount):
+    return '' if np.isnan(amount) else '{:.4g}'.format(amount)
+
+def _format_table(columns, alignments):
+    '''
+    Format columns of strings as a plain text table
+    
+    Parameters
+    ----------
+    columns : [[str]]
+        Columns of the table, all of the same length
+    alignments : str
+        Alignment of each column: '<' for left, '>' for right.
+    '''
+    widths = [max(map(len, column)) for column in columns]
+    line = '  '.join('{{:{}{}}}'.format(alignment, width) for alignment, width in zip(alignments, widths))
+    return '\n'.join(line.format(*row).rstrip() for row in zip(*columns))
@@ -17,34 +17,428 @@
 Diet problem solver
 '''
 
+from collections import Counter, OrderedDict
+from soylent_recipes.histogram import Histogram, format_count
 import numpy as np
 import logging
+import attr
+import re
+import ctypes
+import time
 import swiglpk as glp
 
 _logger = logging.getLogger(__name__)
 
-#TODO make class with nutrition_target in ctor and transform it to the perfect representation for perf here
-def solve(nutrition_target, foods):
+# Outcomes of a solve, see Telemetry
+outcomes = (
+    'solved',  # amounts found
+    'rounded',  # amounts found by rounding the LP relaxation's
+    'relaxation_infeasible',  # rejected by the LP relaxation or GLPK's presolver
+    'integer_infeasible',  # solvable with non-integer amounts only
+    'rounding_failed',  # solvable with non-integer amounts, which could not be rounded; may be solvable
+    'kkt_violation',  # solution found, but it exceeds bounds
+    'time_limit',  # glp_intopt hit its time limit
+    'failed',  # any other glp_intopt failure
+)
+
+# Names of glp_intopt return codes
+_return_code_names = {
+    getattr(glp, name): name
+    for name in (
+        'GLP_EBOUND', 'GLP_EROOT', 'GLP_ENOPFS', 'GLP_ENODFS', 'GLP_EFAIL',
+        'GLP_EMIPGAP', 'GLP_ETMLIM', 'GLP_ESTOP',
+    )
+}
+_return_code_names[0] = '0'
+
+# Matches the active and completed branch-and-bound node counts at the end of
+# a glp_intopt progress line, e.g. "+    11: mip = ... 0.0% (0; 9)"
+_progress_pattern = re.compile(r'^\+.*\((\d+); (\d+)\)\s*$')
+
+@attr.s
+class Telemetry(object):
+    
+    '''
+    Per-solve measurements of a Solver, aggregated
+    
+    Collected when the solver is created with ``telemetry=True``. Times are
+    wall times in seconds. Telemetry can be summed.
+    
+    Attributes
+    ----------
+    outcomes : Counter(str -> int)
+        Number of solves by outcome, one of `outcomes`
+    return_codes : Counter(str -> int)
+        Number of integer solves by glp_intopt return code, e.g. 'GLP_ENOPFS'
+        when the LP relaxation is infeasible, '0' on success
+    solve_time : {str -> Histogram}
+        Time of each solve by outcome
+    load_time : Histogram
+        Time of loading foods into the problem
+    relaxation_time : Histogram
+        Time of LP relaxations, see `Solver` screen_relaxation
+    integer_time : Histogram
+        Time of integer solves (glp_intopt)
+    check_time : Histogram
+        Time of checking and getting the solution
+    iterations : Histogram
+        Simplex iterations per solve, relaxation and integer solve combined
+    nodes : Histogram
+        Branch-and-bound nodes per integer solve, as reported by GLPK
+    '''
+    
+    outcomes = attr.ib(default=attr.Factory(Counter))
+    return_codes = attr.ib(default=attr.Factory(Counter))
+    solve_time = attr.ib(default=attr.Factory(lambda: OrderedDict((outcome, Histogram()) for outcome in outcomes)))
+    load_time = attr.ib(default=attr.Factory(Histogram))
+    relaxation_time = attr.ib(default=attr.Factory(Histogram))
+    integer_time = attr.ib(default=attr.Factory(Histogram))
+    check_time = attr.ib(default=attr.Factory(Histogram))
+    iterations = attr.ib(default=attr.Factory(lambda: Histogram(1, 1e7, format_count)))
+    nodes = attr.ib(default=attr.Factory(lambda: Histogram(1, 1e7, format_count)))
+    
+    def copy(self):
+        values = attr.asdict(self, recurse=False)
+        for name, value in values.items():
+            if isinstance(value, OrderedDict):
+                values[name] = OrderedDict((key, histogram.copy()) for key, histogram in value.items())
+            else:
+                values[name] = value.copy()
+        return type(self)(**values)
+    
+    def __add__(self, other):
+        values = attr.asdict(self, recurse=False)
+        for name, value in values.items():
+            other_value = getattr(other, name)
+            if isinstance(value, OrderedDict):
+                values[name] = OrderedDict((key, histogram + other_value[key]) for key, histogram in value.items())
+            else:
+                values[name] = value + other_value
+        return type(self)(**values)
+    
+    def __str__(self):
+        total = sum(self.outcomes.values())
+        if not total:
+            return 'Solver telemetry: no solves'
+        lines = ['Solver telemetry, {} solves:'.format(total)]
+        lines.append('Outcomes: {}'.format(', '.join(
+            '{} {} ({:.1%})'.format(outcome, self.outcomes[outcome], self.outcomes[outcome] / total)
+            for outcome in outcomes if self.outcomes[outcome]
+        )))
+        lines.append('glp_intopt return codes: {}'.format(', '.join(
+            '{} {}'.format(code, count) for code, count in sorted(self.return_codes.items())
+        )))
+        lines.extend(
+            'Solve time, {}: {}'.format(outcome, self.solve_time[outcome])
+            for outcome in outcomes if self.outcomes[outcome]
+        )
+        lines.extend([
+            'Load time: {}'.format(self.load_time),
+            'Relaxation time: {}'.format(self.relaxation_time),
+            'Integer solve time: {}'.format(self.integer_time),
+            'Check time: {}'.format(self.check_time),
+            'Simplex iterations: {}'.format(self.iterations),
+            'Branch-and-bound nodes: {}'.format(self.nodes),
+        ])
+        return '\n'.join(lines)
+    
+
+@attr.s
+class Stats(object):
+    
+    '''
+    Counters of a Solver
+    
+    Times are wall times in seconds. Stats can be summed, e.g. to combine
+    stats of multiple solvers.
+    
+    Attributes
+    ----------
+    relaxations : int
+        Number of LP relaxations solved by the relaxation screen
+    relaxations_infeasible : int
+        Number of recipes rejected by the relaxation screen, i.e. the number of
+        integer solves avoided
+    relaxation_time : float
+        Time spent solving LP relaxations
+    integer_solves : int
+        Number of integer solves
+    rounded : int
+        Number of recipes solved by rounding the amounts of their LP
+        relaxation, i.e. without integer solve
+    integer_time : float
+        Time spent on integer solves
+    rejected_samples : int
+        Number of rejected recipes which were also integer solved to measure
+        what rejecting saved. Not included in integer_solves.
+    rejected_samples_time : float
+        Time spent on integer solves of rejected_samples
+    telemetry : Telemetry
+        Empty unless the solver was created with ``telemetry=True``
+    '''
+    
+    relaxations = attr.ib(default=0)
+    relaxations_infeasible = attr.ib(default=0)
+    relaxation_time = attr.ib(default=0.0)
+    integer_solves = attr.ib(default=0)
+    integer_time = attr.ib(default=0.0)
+    rounded = attr.ib(default=0)
+    rejected_samples = attr.ib(default=0)
+    rejected_samples_time = attr.ib(default=0.0)
+    telemetry = attr.ib(default=attr.Factory(Telemetry))
+    
+    @property
+    def time_saved(self):
+        '''
+        Estimate of the time saved by the relaxation screen
+        
+        The time integer solves would have taken on the rejected recipes, as
+        estimated from the sampled ones, minus the time spent on LP relaxations.
+        
+        Returns
+        -------
+        float or None
+            Time saved. None if no rejected recipe has been sampled yet.
+        '''
+        if not self.rejected_samples:
+            return None
+        mean_rejected_time = self.rejected_samples_time / self.rejected_samples
+        return self.relaxations_infeasible * mean_rejected_time - self.relaxation_time
+    
+    def __add__(self, other):
+        values = attr.asdict(self, recurse=False)
+        return type(self)(**{name: value + getattr(other, name) for name, value in values.items()})
+    
+    def __str__(self):
+        lines = ['Integer solves: {} in {:.1f}s'.format(self.integer_solves, self.integer_time)]
+        if self.relaxations:
+            time_saved = self.time_saved
+            lines.extend([
+                'LP relaxations: {} in {:.1f}s'.format(self.relaxations, self.relaxation_time),
+                'Rejected by LP relaxation: {} ({:.1%})'.format(self.relaxations_infeasible, self.relaxations_infeasible / self.relaxations),
+                'Estimated time saved by LP relaxation: {}'.format('unknown' if time_saved is None else '{:.1f}s'.format(time_saved)),
+            ])
+        if self.rounded:
+            lines.append('Solved by rounding LP relaxation: {}'.format(self.rounded))
+        if sum(self.telemetry.outcomes.values()):
+            lines.append(str(self.telemetry))
+        return '\n'.join(lines)
+    
+class _Solver(object):
+    
     '''
-    Calculate food amounts to reach the nutrition target
+    Diet problem solver for a nutrition target and set of foods
+    
+    Base class of the solvers in `solvers`, which differ in the library or
+    algorithm they solve with. Nutrients are normalized, amounts bounded and
+    solutions rounded the same way for each.
     
     Parameters
     ----------
-    nutrition_target : soylent_recipes.nutrition_target.NormalizedNutritionTarget
+    nutrition_target : soylent_recipes.nutrition_target.NutritionTarget
         The desired nutrition
     foods : np.array
-        The foods to use to achieve the nutrition target. Contains exactly the
-        nutrients required by the nutrition target in the exact same order. Rows
+        All foods recipes can be made of. Contains exactly the nutrients
+        required by the nutrition target in the exact same order. Rows
         represent foods, columns represent nutrients.
+    screen_relaxation : bool
+        If True, first solve the LP relaxation (i.e. allow non-integer amounts)
+        and only do the integer solve if the relaxation is feasible. Whether
+        this is faster depends on the foods, see `Stats.time_saved`.
+    telemetry : bool
+        If True, collect `Stats.telemetry`. This makes solving slightly slower.
+    granularity : int
+        Amounts are multiples of this many grams, e.g. 1, 5 or 10. Some recipes
+        only have a solution with finer amounts.
+    round_relaxation : bool
+        If True, when the LP relaxation is feasible, round its amounts to the
+        nearest multiple of granularity and, if that breaks a bound, try to
+        repair it by changing amounts one step at a time. Only when that fails,
+        do the integer solve. This implies screen_relaxation. Recipes solve
+        faster, though amounts may differ from those of the integer solve; both
+        satisfy the nutrition target.
         
-    Returns
-    -------
-    amounts : np.array(int) or None
-        The amounts of each food to use to optimally achieve the nutrition
-        target. ``amounts[i]`` is the amount of the i-th food to use. If the
-        nutrition target cannot be achieved, returns None.
+    Attributes
+    ----------
+    stats : Stats
+        Counters, updated on each solve
     '''
-    # Implementation: using the GLPK C library via ecyglpki Python library binding
+    
+    # Max number of amounts to change when repairing a rounded relaxation
+    _max_repair_steps = 10
+    
+    # Nutrient excess, relative to the target, which still counts as within
+    # bounds after rounding. Like the KKT check of an integer solve.
+    _rounding_tolerance = 1e-8
+    
+    def __init__(self, nutrition_target, foods, screen_relaxation=False, telemetry=False, granularity=1, round_relaxation=False):
+        assert foods.shape[1] == len(nutrition_target)
+        assert granularity >= 1
+        self._screen_relaxation = screen_relaxation or round_relaxation
+        self._round_relaxation = round_relaxation
+        self._granularity = granularity
+        self._telemetry = telemetry
+        self.stats = Stats()
+        
+        # Normalize nutrients to their target: scale each row of A and its
+        # bounds by 1 / the nutrient's max, or its min if it has no max.
+        # Nutrient values range from about 1e-8 (vitamin B12 in g/g) to 1e3
+        # (energy in cal/g), normalized the constraints are all near 1. This
+        # conditions the problem better and makes the KKT check tolerance
+        # relative to the target. Scaling rows does not change the amounts.
+        extrema = nutrition_target[['min', 'max']].values
+        targets = np.where(np.isnan(extrema[:, 1]), extrema[:, 0], extrema[:, 1])
+        scales = np.ones(len(targets))
+        scales[targets > 0] = 1 / targets[targets > 0]
+        extrema = extrema * scales[:, np.newaxis]
+        self._minima = np.where(np.isnan(extrema[:, 0]), -np.inf, extrema[:, 0])
+        self._maxima = np.where(np.isnan(extrema[:, 1]), np.inf, extrema[:, 1])
+        
+        # Solve for amounts in units of granularity grams, i.e. a column is the
+        # nutrition of granularity grams of the food
+        self._foods = foods = foods * (scales * granularity)
+        
+        # Bound food amounts by the max constraints: as foods don't have
+        # negative amounts of a nutrient, a food can't be used more than the
+        # max of any nutrient allows on its own, e.g. sodium max / sodium per
+        # gram of food. Loosened by a relative 1e-6 before rounding down, so no
+        # amount the max constraints allow is cut off by rounding errors;
+        # GLPK requires integer bounds on integer columns.
+        maxima = self._maxima.copy()
+        maxima[(foods < 0).any(axis=0)] = np.inf
+        with np.errstate(divide='ignore'):
+            upper_bounds = np.where(foods > 0, maxima / foods, np.inf).min(axis=1)
+        self._upper_bounds = np.floor(upper_bounds * (1 + 1e-6))
+        
+    def solve(self, food_indices):
+        '''
+        Calculate food amounts to reach the nutrition target
+        
+        Parameters
+        ----------
+        food_indices : np.array([int])
+            The foods to use to achieve the nutrition target, as indices of the
+            foods given to the solver.
+            
+        Returns
+        -------
+        amounts : np.array(int) or None
+            The amounts of each food to use to optimally achieve the nutrition
+            target. ``amounts[i]`` is the amount of food ``food_indices[i]`` to
+            use in grams, a multiple of granularity. If the nutrition target
+            cannot be achieved, returns None.
+        '''
+        if not self._telemetry:
+            amounts, _ = self._solve(food_indices, None)
+            return amounts
+        
+        telemetry = self.stats.telemetry
+        start = time.perf_counter()
+        amounts, outcome = self._solve(food_indices, telemetry)
+        telemetry.outcomes[outcome] += 1
+        telemetry.solve_time[outcome].add(time.perf_counter() - start)
+        return amounts
+    
+    def _solve(self, food_indices, telemetry):
+        '''
+        Solve, recording parts of the solve in telemetry if not None
+        
+        Returns
+        -------
+        amounts : np.array(int) or None
+            See `solve`
+        outcome : str
+            One of `outcomes`
+        '''
+        raise NotImplementedError()
+    
+    def _round(self, amounts, food_indices):
+        '''
+        Round a solution of the LP relaxation, repairing it if needed
+        
+        Rounds each amount to the nearest integer within its bounds. While
+        that breaks a bound of a nutrient, change the one amount by one unit
+        which reduces the total excess of the nutrients over their bounds the
+        most.
+        
+        Parameters
+        ----------
+        amounts : np.array(float)
+            Amounts in units of granularity, satisfying the nutrition target
+        food_indices : np.array([int])
+        
+        Returns
+        -------
+        np.array(int) or None
+            Amounts in units of granularity, within bounds. None if they could
+            not be repaired.
+        '''
+        upper_bounds = self._upper_bounds[food_indices]
+        amounts = np.clip(np.round(amounts), 0, upper_bounds)
+        foods = self._foods[food_indices]
+        nutrition = amounts @ foods
+        excess = self._get_excess(nutrition)
+        if not excess:
+            return amounts.astype(int)
+        
+        steps = np.concatenate([foods, -foods])  # +1 of each food, then -1
+        for _ in range(self._max_repair_steps):
+            excesses = self._get_excess(nutrition + steps)
+            excesses[:len(foods)][amounts >= upper_bounds] = np.inf
+            excesses[len(foods):][amounts <= 0] = np.inf
+            step = int(np.argmin(excesses))
+            if excesses[step] >= excess:
+                return None
+            excess = excesses[step]
+            nutrition += steps[step]
+            if step < len(foods):
+                amounts[step] += 1
+            else:
+                amounts[step - len(foods)] -= 1
+            if not excess:
+                return amounts.astype(int)
+        return None
+    
+    def _get_excess(self, nutrition):
+        '''
+        Get sum of how much each nutrient exceeds its bounds
+        
+        Parameters
+        ----------
+        nutrition : np.array
+            Normalized nutrition, one row per recipe or a single recipe
+        
+        Returns
+        -------
+        float or np.array
+            Total excess, per row. Excess within `_rounding_tolerance` is
+            ignored.
+        '''
+        excess = np.maximum(self._minima - nutrition, 0) + np.maximum(nutrition - self._maxima, 0)
+        excess[excess <= self._rounding_tolerance] = 0
+        return excess.sum(axis=-1)
+    
+class GlpkSolver(_Solver):
+    
+    '''
+    Solver using GLPK, see `_Solver` for the parameters
+    
+    The nutrition target is compiled into a GLPK problem once and the foods
+    into sparse columns of its constraint matrix. Each `solve` then only swaps
+    in the columns of the recipe's foods.
+    
+    Telemetry also counts simplex iterations and, from GLPK's progress output,
+    branch-and-bound nodes.
+    
+    With round_relaxation, the relaxation is solved again with the interior
+    point method before rounding. The simplex solution is a vertex of the
+    feasible region: many nutrients are exactly at a bound, so rounding nearly
+    always breaks some. With a 0 objective, every feasible solution is optimal
+    and the interior point method ends up near the center of the feasible
+    region instead, leaving room for rounding.
+    '''
+    
+    # Implementation: using the GLPK C library via swiglpk Python library binding
     # GLPK documentation: download it and look inside the package (http://ftp.gnu.org/gnu/glpk/)
     # GLPK wikibook: https://en.wikibooks.org/wiki/GLPK
     #
@@ -57,46 +451,169 @@ def solve(nutrition_target, foods):
     # by providing the solution to the least squares equivalent, with amounts
     # rounded afterwards, as starting point could improve performance.
     
-    nutrition_target = nutrition_target.values
+    # Every how many-th rejected recipe to integer solve anyway, to estimate
+    # the time saved by rejecting
+    _rejected_sample_interval = 1000
     
-    problem = glp.glp_create_prob()
-    try:
-        glp.glp_add_rows(problem, len(nutrition_target))
-        glp.glp_add_cols(problem, len(foods))
+    def __init__(self, nutrition_target, foods, screen_relaxation=False, telemetry=False, granularity=1, round_relaxation=False):
+        # Note: set these first so that __del__ works when the ctor raises
+        self._problem = None
+        self._columns = []
+        
+        super().__init__(nutrition_target, foods, screen_relaxation, telemetry, granularity, round_relaxation)
+        self._problem = glp.glp_create_prob()
+        
+        # Compile foods into sparse columns of A, ready to pass to
+        # glp_set_mat_col: per food, the number of nonzero nutrients, their
+        # 1-based row indices and their values. Foods tend to lack some
+        # nutrients, so this has fewer entries than the dense matrix, and
+        # loading a recipe needs no copying or conversion of its foods.
+        for food in self._foods:
+            rows = np.flatnonzero(food)
+            self._columns.append((len(rows), _as_int_array(rows + 1), _as_double_array(food[rows])))
         
-        # Configure columns/amounts
-        for i in range(len(foods)):
-            glp.glp_set_col_kind(problem, i+1, glp.GLP_IV)  # int
-            glp.glp_set_col_bnds(problem, i+1, glp.GLP_LO, 0.0, np.nan)  # >=0
+        # Column bounds per food, ready to pass to glp_set_col_bnds
+        self._column_bounds = [
+            (glp.GLP_LO, 0.0, np.nan) if np.isinf(upper_bound)
+            else (glp.GLP_FX, 0.0, 0.0) if upper_bound == 0
+            else (glp.GLP_DB, 0.0, upper_bound)
+            for upper_bound in self._upper_bounds.tolist()
+        ]
         
         # Configure rows/nutrients
-        for i, extrema in enumerate(nutrition_target):
-            if np.isnan(extrema[0]):
+        glp.glp_add_rows(self._problem, len(self._minima))
+        for i, (min_, max_) in enumerate(zip(self._minima.tolist(), self._maxima.tolist())):
+            if np.isinf(min_):
                 bounds_type = glp.GLP_UP
-            elif np.isnan(extrema[1]):
+            elif np.isinf(max_):
                 bounds_type = glp.GLP_LO
             else:
                 # Note: a nutrition target has either min, max or both and min!=max
                 bounds_type = glp.GLP_DB
-            glp.glp_set_row_bnds(problem, i+1, bounds_type, *extrema)
-            
-        # Load A of our Ax=b
-        non_zero_count = foods.size
-        row_indices = glp.intArray(non_zero_count+1)  # +1 because (insane) 1-indexing
-        column_indices = glp.intArray(non_zero_count+1)
-        values = glp.doubleArray(non_zero_count+1)
-        for i, ((row, column), value) in enumerate(np.ndenumerate(foods.transpose())):
-            row_indices[i+1] = row+1
-            column_indices[i+1] = column+1
-            values[i+1] = value
-        glp.glp_load_matrix(problem, non_zero_count, row_indices, column_indices, values)
+            glp.glp_set_row_bnds(self._problem, i+1, bounds_type, min_, max_)
+        
+        # Configure solver
+        self._int_opt_args = glp.glp_iocp()
+        glp.glp_init_iocp(self._int_opt_args)
+        self._int_opt_args.presolve = glp.GLP_ON  # without this, you have to provide an LP relaxation basis
+        self._int_opt_args.msg_lev = glp.GLP_MSG_OFF  # be quiet, no stdout
+        if telemetry:
+            # Capture progress output instead, to count branch-and-bound
+            # nodes. GLPK does not keep a reference to the hook, so we do.
+            self._int_opt_args.msg_lev = glp.GLP_MSG_ON
+            self._output = []
+            self._output_hook = self._output.append
+        
+        # Configure LP relaxation solver
+        self._simplex_args = glp.glp_smcp()
+        glp.glp_init_smcp(self._simplex_args)
+        self._simplex_args.presolve = glp.GLP_ON
+        self._simplex_args.msg_lev = glp.GLP_MSG_OFF
+        
+        # Configure interior point solver, see _solve_interior
+        self._interior_args = glp.glp_iptcp()
+        glp.glp_init_iptcp(self._interior_args)
+        self._interior_args.msg_lev = glp.GLP_MSG_OFF
+        
+    def __del__(self):
+        if self._problem is not None:
+            glp.glp_delete_prob(self._problem)
+            self._problem = None
+        self._columns = []
+    
+    def solve(self, food_indices):
+        if not self._telemetry:
+            return super().solve(food_indices)
+        
+        iterations = glp.glp_get_it_cnt(self._problem)
+        del self._output[:]
+        glp.glp_term_hook(self._output_hook)
+        try:
+            amounts = super().solve(food_indices)
+        finally:
+            glp.glp_term_hook(None)
+        self.stats.telemetry.iterations.add(glp.glp_get_it_cnt(self._problem) - iterations)
+        return amounts
+    
+    def _solve(self, food_indices, telemetry):
+        problem = self._problem
+        time_ = time.perf_counter
+        start = time_()
+        self._set_food_count(len(food_indices))
+        
+        # Load A of our Ax=b and the bounds of x, column by column.
+        # glp_set_mat_col replaces the column's entries with a copy of the
+        # food's.
+        columns = self._columns
+        column_bounds = self._column_bounds
+        for column, food_index in enumerate(food_indices.tolist(), 1):
+            glp.glp_set_mat_col(problem, column, *columns[food_index])
+            glp.glp_set_col_bnds(problem, column, *column_bounds[food_index])
+        if telemetry is not None:
+            end = time_()
+            telemetry.load_time.add(end - start)
+            start = end
         
         # Solve
-        int_opt_args = glp.glp_iocp()
-        glp.glp_init_iocp(int_opt_args)
-        int_opt_args.presolve = glp.GLP_ON  # without this, you have to provide an LP relaxation basis
-        int_opt_args.msg_lev = glp.GLP_MSG_OFF  # be quiet, no stdout
-        glp.glp_intopt(problem, int_opt_args)  # returns an error code; can safely ignore
+        #
+        # Note: the integer solve does not continue from the relaxation's
+        # solution. This would skip solving the relaxation again, but recipes
+        # rarely pass the screen, while it could change the solution.
+        if self._screen_relaxation:
+            feasible = self._solve_relaxation()
+            if telemetry is not None:
+                end = time_()
+                telemetry.relaxation_time.add(end - start)
+                start = end
+            if not feasible:
+                return None, 'relaxation_infeasible'
+            if self._round_relaxation:
+                amounts = self._solve_interior(len(food_indices))
+                if amounts is not None:
+                    amounts = self._round(amounts, food_indices)
+                if telemetry is not None:
+                    end = time_()
+                    telemetry.check_time.add(end - start)
+                    start = end
+                if amounts is not None:
+                    self.stats.rounded += 1
+                    return amounts * self._granularity, 'rounded'
+        start = time_()
+        return_code = glp.glp_intopt(problem, self._int_opt_args)
+        end = time_()
+        self.stats.integer_solves += 1
+        self.stats.integer_time += end - start
+        if telemetry is not None:
+            telemetry.integer_time.add(end - start)
+            telemetry.return_codes[_return_code_names.get(return_code, str(return_code))] += 1
+            telemetry.nodes.add(self._get_node_count())
+            start = end
+            
+        amounts, outcome = self._get_solution(return_code)
+        if telemetry is not None:
+            telemetry.check_time.add(time_() - start)
+        return amounts, outcome
+    
+    def _get_solution(self, return_code):
+        '''
+        Get the solution of glp_intopt, if any
+        
+        Returns
+        -------
+        amounts : np.array(int) or None
+        outcome : str
+        '''
+        problem = self._problem
+        if return_code != 0:
+            # Failed to solve, e.g. LP relaxation infeasible (only reported
+            # when using presolve). Any solution values left in the problem
+            # are not ours.
+            if return_code == glp.GLP_ENOPFS:
+                return None, 'relaxation_infeasible'
+            elif return_code == glp.GLP_ETMLIM:
+                return None, 'time_limit'
+            else:
+                return None, 'failed'
         
         # Check we've got a valid solution
         #
@@ -108,15 +625,277 @@ def solve(nutrition_target, foods):
         # bounds constraints. The thing you actually need to use is
         # glp_check_kkt and check that the solution satisfies KKT.PB (all within
         # bounds)
+        #
+        # As the problem is reused, the solution values may be left over from a
+        # previous solve when there is no solution, so check the status too.
+        status = glp.glp_mip_status(problem)
+        if status == glp.GLP_NOFEAS:
+            return None, 'integer_infeasible'
+        elif status not in (glp.GLP_OPT, glp.GLP_FEAS):
+            return None, 'failed'
         max_error = glp.doubleArray(1)
         glp.glp_check_kkt(problem, glp.GLP_MIP, glp.GLP_KKT_PB, max_error, None, None, None)
         if not np.isclose(max_error[0], 0.0):
             # A row/column value exceeds its bounds
-            return None
+            return None, 'kkt_violation'
         
         # Return solution
-        amounts = np.fromiter((glp.glp_mip_col_val(problem, i+1) for i in range(len(foods))), int)
+        amounts = np.array(glp.get_col_primals(problem)).astype(int) * self._granularity
         
-        return amounts
-    finally:
-        glp.glp_delete_prob(problem)
+        return amounts, 'solved'
+    
+    def _get_node_count(self):
+        '''
+        Get number of branch-and-bound nodes of the last glp_intopt
+        
+        GLPK only exposes the search tree to callbacks, which swiglpk does not
+        support, so the count is taken from the last progress line, which
+        lists the active and the completed nodes.
+        '''
+        for line in reversed(''.join(self._output).splitlines()):
+            match = _progress_pattern.match(line)
+            if match:
+                return int(match.group(1)) + int(match.group(2))
+        return 0
+    
+    def _solve_relaxation(self):
+        '''
+        Solve LP relaxation of the loaded problem
+        
+        Returns
+        -------
+        bool
+            Whether the relaxation is feasible
+        '''
+        problem = self._problem
+        stats = self.stats
+        start = time.perf_counter()
+        return_code = glp.glp_simplex(problem, self._simplex_args)
+        feasible = return_code == 0 and glp.glp_get_status(problem) == glp.GLP_OPT  # with a 0 objective, feasible is optimal
+        stats.relaxations += 1
+        stats.relaxation_time += time.perf_counter() - start
+        if not feasible:
+            stats.relaxations_infeasible += 1
+            if stats.relaxations_infeasible % self._rejected_sample_interval == 1:
+                start = time.perf_counter()
+                glp.glp_intopt(problem, self._int_opt_args)
+                stats.rejected_samples += 1
+                stats.rejected_samples_time += time.perf_counter() - start
+        return feasible
+    
+    def _solve_interior(self, food_count):
+        '''
+        Solve LP relaxation of the loaded problem with the interior point method
+        
+        Returns
+        -------
+        np.array(float) or None
+            Amounts, None if not solved
+        '''
+        problem = self._problem
+        return_code = glp.glp_interior(problem, self._interior_args)
+        if return_code != 0 or glp.glp_ipt_status(problem) != glp.GLP_OPT:
+            return None
+        return np.array([glp.glp_ipt_col_prim(problem, column) for column in range(1, food_count + 1)])
+    
+    def _set_food_count(self, food_count):
+        '''
+        Add or remove columns/amounts to match food_count
+        '''
+        problem = self._problem
+        column_count = glp.glp_get_num_cols(problem)
+        if column_count < food_count:
+            glp.glp_add_cols(problem, food_count - column_count)
+            for i in range(column_count, food_count):
+                glp.glp_set_col_kind(problem, i+1, glp.GLP_IV)  # int, bounds are set per food
+        elif column_count > food_count:
+            columns = _as_int_array(np.arange(food_count+1, column_count+1))
+            glp.glp_del_cols(problem, column_count - food_count, columns)
+
+class HighsSolver(_Solver):
+    
+    '''
+    Solver using HiGHS via `scipy.optimize.milp`, see `_Solver` for the parameters
+    
+    Requires scipy 1.9 or newer. Each solve builds the problem of the recipe's
+    foods anew, HiGHS has no problem to reuse.
+    
+    Unlike GLPK, `milp` does not report whether an infeasible problem has an
+    infeasible LP relaxation; without screen_relaxation, all infeasible
+    recipes are 'integer_infeasible'. With round_relaxation, the relaxation's
+    solution is rounded as is.
+    '''
+    
+    def __init__(self, nutrition_target, foods, screen_relaxation=False, telemetry=False, granularity=1, round_relaxation=False):
+        try:
+            from scipy.optimize import milp, Bounds, LinearConstraint
+        except ImportError as ex:
+            raise Exception('The highs solver requires scipy 1.9 or newer, install it with: pip install "soylent-recipes[solvers]"') from ex
+        super().__init__(nutrition_target, foods, screen_relaxation, telemetry, granularity, round_relaxation)
+        self._milp = milp
+        self._bounds = Bounds
+        self._linear_constraint = LinearConstraint
+        
+    def _solve(self, food_indices, telemetry):
+        time_ = time.perf_counter
+        stats = self.stats
+        foods = self._foods[food_indices]
+        problem = dict(
+            c=np.zeros(len(food_indices)),
+            constraints=self._linear_constraint(foods.T, self._minima, self._maxima),
+            bounds=self._bounds(0, self._upper_bounds[food_indices]),
+        )
+        if self._screen_relaxation:
+            start = time_()
+            result = self._milp(**problem)
+            end = time_()
+            stats.relaxations += 1
+            stats.relaxation_time += end - start
+            if telemetry is not None:
+                telemetry.relaxation_time.add(end - start)
+            if result.status != 0:
+                stats.relaxations_infeasible += 1
+                return None, 'relaxation_infeasible'
+            if self._round_relaxation:
+                amounts = self._round(result.x, food_indices)
+                if amounts is not None:
+                    stats.rounded += 1
+                    return amounts * self._granularity, 'rounded'
+                
+        start = time_()
+        result = self._milp(integrality=np.ones(len(food_indices)), **problem)
+        end = time_()
+        stats.integer_solves += 1
+        stats.integer_time += end - start
+        if telemetry is not None:
+            telemetry.integer_time.add(end - start)
+            if result.mip_node_count is not None:  # None when presolve decides
+                telemetry.nodes.add(result.mip_node_count)
+        if result.status == 1:
+            return None, 'time_limit'
+        elif result.status == 2:
+            return None, 'integer_infeasible'
+        elif result.status != 0:
+            return None, 'failed'
+        amounts = np.round(result.x)
+        if self._get_excess(amounts @ foods):
+            return None, 'kkt_violation'
+        return amounts.astype(int) * self._granularity, 'solved'
+    
+class NnlsSolver(_Solver):
+    
+    '''
+    Solver using non-negative least squares, see `_Solver` for the parameters
+    
+    Requires scipy. As described in `docs/history.rst`, finding amounts
+    ``x >= 0`` with ``m <= Ax <= M`` is rewritten as the least squares
+    problem::
+    
+        [[-A;A], I] [x;z] = [-m;M]
+        
+    with ``z >= 0`` and is solved with `scipy.optimize.nnls`. Nutrients without
+    a min or max are left out of ``m`` or ``M``. The residual is the L2 norm of
+    the shortages to the minima and excesses to the maxima; when it is 0, the
+    recipe can be solved with non-integer amounts.
+    
+    Like the simplex method, nnls tends to return amounts at which many
+    nutrients are exactly at a bound, which breaks when rounded. So next, the
+    bounds are narrowed by a margin, from wide to narrow, until the solution
+    can be rounded and repaired as with round_relaxation.
+    
+    This is a heuristic: there is no integer solve to fall back on, so a
+    recipe is reported unsolved when rounding cannot be repaired (outcome
+    'rounding_failed'), even when other solvers solve it. Returned amounts do satisfy the nutrition target.
+    screen_relaxation and round_relaxation are ignored.
+    '''
+    
+    # Residual of a solution which still counts as satisfying the normalized
+    # nutrition target
+    _residual_tolerance = 1e-6
+    
+    # Margins to narrow the normalized bounds by, i.e. fractions of the target,
+    # to try in order. A margin is at most a third of the range of a nutrient
+    # with both a min and a max.
+    _margins = (0.01, 0.005, 0.002, 0.001, 0.0003)
+    
+    def __init__(self, nutrition_target, foods, screen_relaxation=False, telemetry=False, granularity=1, round_relaxation=False):
+        try:
+            from scipy.optimize import nnls
+        except ImportError as ex:
+            raise Exception('The nnls solver requires scipy, install it with: pip install "soylent-recipes[solvers]"') from ex
+        super().__init__(nutrition_target, foods, screen_relaxation, telemetry, granularity, round_relaxation)
+        self._nnls = nnls
+        self._has_min = np.isfinite(self._minima)
+        self._has_max = np.isfinite(self._maxima)
+        ranges = np.where(self._has_min & self._has_max, (self._maxima - self._minima) / 3, np.inf)
+        self._bs = [
+            np.concatenate([
+                -(self._minima + margin)[self._has_min],
+                (self._maxima - margin)[self._has_max],
+            ])
+            for margin in [0.0] + [np.minimum(margin, ranges) for margin in self._margins]
+        ]
+        self._slack = np.eye(len(self._bs[0]))
+        
+    def _solve(self, food_indices, telemetry):
+        stats = self.stats
+        start = time.perf_counter()
+        foods = self._foods[food_indices].T
+        a = np.hstack([np.vstack([-foods[self._has_min], foods[self._has_max]]), self._slack])
+        _, residual = self._nnls(a, self._bs[0])
+        end = time.perf_counter()
+        stats.relaxations += 1
+        stats.relaxation_time += end - start
+        if telemetry is not None:
+            telemetry.relaxation_time.add(end - start)
+        if residual > self._residual_tolerance:
+            stats.relaxations_infeasible += 1
+            return None, 'relaxation_infeasible'
+        
+        amounts = None
+        for b in self._bs[1:]:
+            solution, residual = self._nnls(a, b)
+            if residual <= self._residual_tolerance:
+                amounts = self._round(solution[:len(food_indices)], food_indices)
+                if amounts is not None:
+                    break
+        if telemetry is not None:
+            telemetry.check_time.add(time.perf_counter() - end)
+        if amounts is None:
+            return None, 'rounding_failed'
+        stats.rounded += 1
+        return amounts * self._granularity, 'rounded'
+    
+#: Solver class by name, see config.solver
+solvers = {
+    'glpk': GlpkSolver,
+    'highs': HighsSolver,
+    'nnls': NnlsSolver,
+}
+
+# Note: Setting items one by one on a glp.intArray/doubleArray (__setitem__) is
+# slow: it used to take 40% of solve time. Instead, the array is copied into
+# the C array in a single memmove. glp.as_intArray/as_doubleArray did the same,
+# but their return value changed in swiglpk 5.0.11 (from a raw C array which
+# had to be freed explicitly to an intArray/doubleArray) and GLPK ends up
+# reading garbage from it. The arrays created here own their memory, keep a
+# reference to them for as long as GLPK uses them.
+
+def _as_int_array(array):
+    '''
+    Copy np.array of ints into a new 1-indexed glp.intArray
+    '''
+    return _as_glp_array(glp.intArray, np.intc, array)
+
+def _as_double_array(array):
+    '''
+    Copy np.array of floats into a new 1-indexed glp.doubleArray
+    '''
+    return _as_glp_array(glp.doubleArray, np.double, array)
+
+def _as_glp_array(type_, dtype, array):
+    values = np.zeros(len(array) + 1, dtype=dtype)  # index 0 is unused
+    values[1:] = array
+    glp_array = type_(len(values))
+    ctypes.memmove(int(glp_array.this), values.ctypes.data, values.nbytes)
+    return glp_array
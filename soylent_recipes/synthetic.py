@@ -0,0 +1,368 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Synthetic USDA SR28-format data for scale testing
+
+SR28 has about 8800 foods. `generate_usda` writes FOOD_DES, NUTR_DEF and
+NUT_DATA files in the same ``^``/``~`` delimited format with any number of
+foods, to test importing, preprocessing and mining at a larger scale. E.g.
+``soylent-synthetic-usda --foods 100000 --output-dir data/synthetic`` then
+``soylent --usda-data data/synthetic``.
+
+Values are random but plausible: the macronutrients of a food add up to at
+most 100g, energy follows from the macronutrients and the other nutrients are
+log-normally distributed around typical amounts, with some exact zeros. Like
+in SR28, some nutrients are missing (NaN) for a food. Nutrients are analysed
+in panels (e.g. minerals), so when a food lacks a nutrient, it tends to lack
+related nutrients as well.
+
+Unlike real foods, the nutrients of a food are not correlated beyond that, so
+recipes which meet the default nutrition target are rarer. The data is meant
+to measure how the import, preprocessing and mining scale, not to find
+recipes.
+'''
+
+from collections import OrderedDict
+from pathlib import Path
+import csv
+import logging
+from chicken_turtle_util import click as click_
+import click
+import numpy as np
+import pandas as pd
+from soylent_recipes import __version__
+
+_logger = logging.getLogger(__name__)
+
+# NUTR_DEF.txt rows of the nutrients used by foods.import_usda, copied from
+# SR28. Energy in kJ (268) and Ash (207) aren't used, but are included as
+# import_usda is expected to ignore them.
+_nutrient_definitions = '''\
+~203~^~g~^~PROCNT~^~Protein~^~2~^~600~
+~204~^~g~^~FAT~^~Total lipid (fat)~^~2~^~800~
+~205~^~g~^~CHOCDF~^~Carbohydrate, by difference~^~2~^~1100~
+~207~^~g~^~ASH~^~Ash~^~2~^~1000~
+~208~^~kcal~^~ENERC_KCAL~^~Energy~^~0~^~300~
+~255~^~g~^~WATER~^~Water~^~2~^~100~
+~257~^~g~^~~^~Adjusted Protein~^~2~^~700~
+~262~^~mg~^~CAFFN~^~Caffeine~^~0~^~18300~
+~268~^~kJ~^~ENERC_KJ~^~Energy~^~0~^~400~
+~269~^~g~^~SUGAR~^~Sugars, total~^~2~^~1500~
+~291~^~g~^~FIBTG~^~Fiber, total dietary~^~1~^~1200~
+~301~^~mg~^~CA~^~Calcium, Ca~^~0~^~5300~
+~303~^~mg~^~FE~^~Iron, Fe~^~2~^~5400~
+~304~^~mg~^~MG~^~Magnesium, Mg~^~0~^~5500~
+~305~^~mg~^~P~^~Phosphorus, P~^~0~^~5600~
+~306~^~mg~^~K~^~Potassium, K~^~0~^~5700~
+~307~^~mg~^~NA~^~Sodium, Na~^~0~^~5800~
+~309~^~mg~^~ZN~^~Zinc, Zn~^~2~^~5900~
+~312~^~mg~^~CU~^~Copper, Cu~^~3~^~6000~
+~313~^~µg~^~FLD~^~Fluoride, F~^~1~^~6240~
+~315~^~mg~^~MN~^~Manganese, Mn~^~3~^~6100~
+~317~^~µg~^~SE~^~Selenium, Se~^~1~^~6200~
+~319~^~µg~^~RETOL~^~Retinol~^~0~^~7430~
+~320~^~µg~^~VITA_RAE~^~Vitamin A, RAE~^~0~^~7420~
+~321~^~µg~^~CARTB~^~Carotene, beta~^~0~^~7440~
+~322~^~µg~^~CARTA~^~Carotene, alpha~^~0~^~7450~
+~323~^~mg~^~TOCPHA~^~Vitamin E (alpha-tocopherol)~^~2~^~7900~
+~328~^~µg~^~VITD~^~Vitamin D (D2 + D3)~^~1~^~8700~
+~334~^~µg~^~CRYPX~^~Cryptoxanthin, beta~^~0~^~7460~
+~337~^~µg~^~LYCPN~^~Lycopene~^~0~^~7530~
+~338~^~µg~^~LUT+ZEA~^~Lutein + zeaxanthin~^~0~^~7560~
+~401~^~mg~^~VITC~^~Vitamin C, total ascorbic acid~^~1~^~6300~
+~404~^~mg~^~THIA~^~Thiamin~^~3~^~6400~
+~405~^~mg~^~RIBF~^~Riboflavin~^~3~^~6500~
+~406~^~mg~^~NIA~^~Niacin~^~3~^~6600~
+~410~^~mg~^~PANTAC~^~Pantothenic acid~^~3~^~6700~
+~415~^~mg~^~VITB6A~^~Vitamin B-6~^~3~^~6800~
+~418~^~µg~^~VITB12~^~Vitamin B-12~^~2~^~7300~
+~421~^~mg~^~CHOLN~^~Choline, total~^~1~^~7220~
+~430~^~µg~^~VITK1~^~Vitamin K (phylloquinone)~^~1~^~8800~
+~431~^~µg~^~FOLAC~^~Folic acid~^~0~^~7000~
+~435~^~µg~^~FOLDFE~^~Folate, DFE~^~0~^~7200~
+~573~^~mg~^~~^~Vitamin E, added~^~2~^~7920~
+~601~^~mg~^~CHOLE~^~Cholesterol~^~0~^~15700~
+~605~^~g~^~FATRN~^~Fatty acids, total trans~^~3~^~15400~
+~606~^~g~^~FASAT~^~Fatty acids, total saturated~^~3~^~9700~
+~618~^~g~^~F18D2~^~18:2 undifferentiated~^~3~^~13100~
+~851~^~g~^~F18D3CN3~^~18:3 n-3 c,c,c (ALA)~^~3~^~14000~
+'''
+
+# Nutrient panels: probability that a food has the panel, and per nutrient the
+# probability it's reported given the food has the panel. Nutrients not in a
+# panel are always reported. Roughly matches the NaN counts of SR28.
+_panels = (
+    # Minerals
+    (0.97, {301: 0.99, 303: 0.99, 304: 0.95, 305: 0.96, 306: 0.97, 307: 0.99, 309: 0.94, 312: 0.91, 315: 0.84, 317: 0.85}),
+    
+    # Water soluble vitamins
+    (0.93, {401: 0.92, 404: 0.96, 405: 0.96, 406: 0.96, 410: 0.8, 415: 0.93, 418: 0.93, 431: 0.9, 435: 0.9}),
+    (0.5, {421: 1}),  # Choline
+    
+    # Fat soluble vitamins and carotenoids
+    (0.85, {319: 0.9, 320: 0.95, 323: 0.7, 328: 0.7, 430: 0.65, 573: 0.35}),
+    (0.75, {321: 0.97, 322: 0.93, 334: 0.93, 337: 0.93, 338: 0.93}),
+    
+    # Lipids
+    (0.95, {601: 0.97, 606: 0.97, 605: 0.6, 618: 0.85, 851: 0.55}),
+    
+    # Carbohydrates
+    (0.9, {291: 0.95, 269: 0.8}),
+    
+    # Other
+    (0.55, {262: 1}),  # Caffeine
+    (0.01, {257: 1}),  # Adjusted protein
+)
+
+# Kinds of food: fraction of foods; Dirichlet concentrations of water, protein,
+# fat, carbohydrate and ash; and fraction of foods with fluoride reported, as
+# fluoride is mostly reported for beverages
+_kinds = (
+    (0.9, (1.5, 0.5, 0.4, 0.7, 0.1), 0.02),  # Regular foods
+    (0.1, (30, 0.1, 0.05, 1, 0.05), 0.5),  # Beverages
+)
+
+# Log-normal distribution of other nutrients: median amount in 100g of food in
+# the unit of NUTR_DEF and the fraction of foods with none of it.
+# {nutrient_id :: int => (median :: float, zero_fraction :: float)}
+_distributions = {
+    262: (40, 0.95),
+    301: (30, 0.02),
+    303: (1.2, 0.02),
+    304: (22, 0.02),
+    305: (150, 0.02),
+    306: (250, 0.02),
+    307: (80, 0.03),
+    309: (1, 0.03),
+    312: (0.1, 0.03),
+    313: (100, 0.1),
+    315: (0.2, 0.1),
+    317: (10, 0.1),
+    319: (10, 0.6),
+    320: (10, 0.35),
+    321: (30, 0.35),
+    322: (5, 0.7),
+    323: (0.5, 0.1),
+    328: (0.5, 0.6),
+    334: (2, 0.65),
+    337: (100, 0.85),
+    338: (30, 0.35),
+    401: (2, 0.4),
+    404: (0.08, 0.05),
+    405: (0.15, 0.05),
+    406: (2, 0.05),
+    410: (0.5, 0.05),
+    415: (0.15, 0.05),
+    418: (0.5, 0.45),
+    421: (20, 0.05),
+    430: (3, 0.2),
+    431: (50, 0.85),
+    435: (15, 0.1),
+    573: (2, 0.95),
+    601: (20, 0.4),
+}
+
+# Food group codes of SR28
+_food_groups = (
+    '0100', '0200', '0300', '0400', '0500', '0600', '0700', '0800', '0900',
+    '1000', '1100', '1200', '1300', '1400', '1500', '1600', '1700', '1800',
+    '1900', '2000', '2100', '2200', '2500', '3500', '3600',
+)
+
+# Words to make up food descriptions with: '{food}, {qualifier}, {preparation}'
+_description_words = (
+    (
+        'Apples', 'Barley', 'Beans', 'Beef', 'Bread', 'Broccoli', 'Butter',
+        'Carrots', 'Cheese', 'Chicken', 'Cod', 'Corn', 'Eggs', 'Lentils',
+        'Milk', 'Oats', 'Onions', 'Pasta', 'Peanuts', 'Peas', 'Pork',
+        'Potatoes', 'Rice', 'Salmon', 'Soybeans', 'Spinach', 'Tomatoes',
+        'Tuna', 'Turkey', 'Wheat flour', 'Yogurt',
+    ),
+    (
+        'whole', 'lean', 'low fat', 'enriched', 'unenriched', 'with salt',
+        'without salt', 'dried', 'frozen', 'canned', 'fresh', 'mature seeds',
+        'commercial', 'home-prepared', 'fortified',
+    ),
+    ('raw', 'cooked', 'boiled', 'baked', 'roasted', 'fried', 'steamed', 'drained'),
+)
+
+# Conversion factors (kcal/g) to pick from, as they occur in SR28
+_conversion_factors = (
+    (4.27, 4.36, 4.0, 3.47, 4.05, 4.22, 2.44, 3.18),  # protein
+    (8.79, 9.02, 8.37, 8.84, 9.0, 8.93),  # fat
+    (3.87, 4.12, 3.68, 4.0, 4.16, 3.82, 3.57, 4.03),  # carbohydrate
+)
+
+# Fraction of foods with conversion factors, respectively a common name
+_conversion_factor_fraction = 0.52
+_common_name_fraction = 0.13
+
+# Number of foods to generate and write at a time
+_chunk_size = 10000
+
+def generate_usda(directory, food_count, seed=0):
+    '''
+    Write synthetic USDA data files
+    
+    Parameters
+    ----------
+    directory : Path
+        Directory to write the files in, created if missing. Existing files
+        are overwritten.
+    food_count : int
+        Number of foods to generate.
+    seed : int
+        Seed of the random values. The same seed and food count yield the same
+        files.
+    '''
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    with _open(directory / 'NUTR_DEF.txt') as f:
+        f.write(_nutrient_definitions)
+    with _open(directory / 'FOOD_DES.txt') as food_descriptions, _open(directory / 'NUT_DATA.txt') as nutrient_data:
+        for start in range(0, food_count, _chunk_size):
+            food_ids = np.arange(start, min(start + _chunk_size, food_count)) + 1001
+            _logger.info('Generating foods {} to {} of {}'.format(start + 1, start + len(food_ids), food_count))
+            food_ids = pd.Series(food_ids).map('~{:05d}~'.format)
+            _write(food_descriptions, _generate_descriptions(rng, food_ids))
+            _write(nutrient_data, _generate_nutrient_data(rng, food_ids))
+        
+def _open(path):
+    # SR28 files are latin1 encoded with Windows line endings
+    return path.open('w', encoding='latin1', newline='\r\n')
+
+def _write(f, rows):
+    rows.to_csv(f, sep='^', header=False, index=False, quoting=csv.QUOTE_NONE, float_format='%g')
+    
+def _generate_descriptions(rng, food_ids):
+    '''
+    Get FOOD_DES.txt rows
+    '''
+    count = len(food_ids)
+    words = [rng.choice(words, count) for words in _description_words]
+    long_descriptions = pd.Series([', '.join(food_words) for food_words in zip(*words)])
+    common_names = np.where(rng.random(count) < _common_name_fraction, pd.Series(words[0]).str.lower(), '')
+    has_factors = rng.random(count) < _conversion_factor_fraction
+    factors = [np.where(has_factors, rng.choice(factors, count), np.nan) for factors in _conversion_factors]
+    quote = lambda values: '~' + pd.Series(values) + '~'
+    return pd.DataFrame(OrderedDict([
+        ('NDB_No', food_ids),
+        ('FdGrp_Cd', quote(rng.choice(_food_groups, count))),
+        ('Long_Desc', quote(long_descriptions)),
+        ('Shrt_Desc', quote(long_descriptions.str.upper().str.replace(', ', ',').str[:60])),
+        ('ComName', quote(common_names)),
+        ('ManufacName', '~~'),
+        ('Survey', '~~'),
+        ('Ref_desc', '~~'),
+        ('Refuse', 0),
+        ('SciName', '~~'),
+        ('N_Factor', np.where(has_factors, 6.25, np.nan)),
+        ('Pro_Factor', factors[0]),
+        ('Fat_Factor', factors[1]),
+        ('CHO_Factor', factors[2]),
+    ]))
+    
+def _generate_nutrient_data(rng, food_ids):
+    '''
+    Get NUT_DATA.txt rows
+    '''
+    count = len(food_ids)
+    values = {}
+    
+    fractions, concentrations, fluoride_fractions = zip(*_kinds)
+    kinds = rng.choice(len(_kinds), count, p=fractions)
+    
+    # Macronutrients (g/100g)
+    macronutrients = np.empty((count, 5))
+    for kind, kind_concentrations in enumerate(concentrations):
+        mask = kinds == kind
+        macronutrients[mask] = rng.dirichlet(kind_concentrations, mask.sum()) * 100
+    water, protein, fat, carbohydrate, ash = macronutrients.T
+    values[255] = water
+    values[203] = protein
+    values[257] = protein * rng.uniform(0.9, 1, count)
+    values[204] = fat
+    values[205] = carbohydrate
+    values[207] = ash
+    values[208] = (4 * protein + 9 * fat + 3.75 * carbohydrate) * rng.uniform(0.95, 1.05, count)
+    values[268] = values[208] * 4.184
+    
+    # Parts of macronutrients
+    values[291] = carbohydrate * rng.beta(1, 6, count)
+    values[269] = carbohydrate * rng.beta(1, 2, count)
+    values[606] = fat * rng.beta(2, 3, count)
+    values[605] = fat * rng.beta(0.3, 10, count)
+    values[618] = fat * rng.beta(1, 5, count)
+    values[851] = fat * rng.beta(0.5, 20, count)
+    
+    # Other nutrients
+    for nutrient_id, (median, zero_fraction) in _distributions.items():
+        value = median * rng.lognormal(0, 2, count)
+        value[rng.random(count) < zero_fraction] = 0
+        values[nutrient_id] = value
+        
+    # Remove unreported nutrients
+    values[313][rng.random(count) >= np.array(fluoride_fractions)[kinds]] = np.nan
+    for panel_probability, nutrients in _panels:
+        has_panel = rng.random(count) < panel_probability
+        for nutrient_id, probability in nutrients.items():
+            reported = has_panel & (rng.random(count) < probability)
+            values[nutrient_id][~reported] = np.nan
+    
+    # Round to the precision of NUTR_DEF
+    for line in _nutrient_definitions.splitlines():
+        fields = line.split('^')
+        nutrient_id = int(fields[0].strip('~'))
+        values[nutrient_id] = values[nutrient_id].round(int(fields[4].strip('~')))
+        
+    # To rows, ordered by food, then nutrient
+    values = pd.DataFrame(values, columns=sorted(values))
+    foods, nutrients = np.nonzero(values.notnull().values)
+    return pd.DataFrame(OrderedDict([
+        ('NDB_No', food_ids.values[foods]),
+        ('Nutr_No', values.columns.map('~{}~'.format)[nutrients]),
+        ('Nutr_Val', values.values[foods, nutrients]),
+        ('Num_Data_Pts', rng.integers(1, 20, len(foods))),
+        ('Std_Error', np.nan),
+        ('Src_Cd', '~1~'),
+        ('Deriv_Cd', '~~'),
+        ('Ref_NDB_No', '~~'),
+        ('Add_Nutr_Mark', '~~'),
+        ('Num_Studies', np.nan),
+        ('Min', np.nan),
+        ('Max', np.nan),
+        ('DF', np.nan),
+        ('Low_EB', np.nan),
+        ('Up_EB', np.nan),
+        ('Stat_cmt', '~~'),
+        ('AddMod_Date', '~~'),
+        ('CC', '~~'),
+    ]))
+
+@click.command(context_settings={'help_option_names': ['-h', '--help']})
+@click.version_option(version=__version__)
+@click_.option('--foods', 'food_count', type=click.IntRange(min=1), help='Number of foods to generate')
+@click_.option('--output-dir', 'directory', type=click.Path(file_okay=False), help='Directory to write USDA data files to')
+@click_.option('--seed', type=int, default=0, help='Seed of the random values')
+def main(food_count, directory, seed):
+    '''
+    Generate synthetic USDA SR28 data for scale testing
+    
+    The output directory can be passed to --usda-data of soylent and
+    soylent-benchmark.
+    '''
+    logging.basicConfig(level=logging.INFO)
+    generate_usda(Path(directory), food_count, seed)
@@ -0,0 +1,47 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Test soylent_recipes.mining.checkpoint
+'''
+
+from pathlib import Path
+from soylent_recipes.mining import checkpoint
+import pytest
+
+def test_resume_journal(tmpdir):
+    '''
+    Only recipes covered by the checkpoint are emitted and kept, appending
+    continues after them
+    '''
+    path = Path(str(tmpdir)) / 'checkpoint.recipes'
+    with checkpoint.Journal(path, 'run1') as journal:
+        for worker, recipe in [(0, 'a'), (1, 'b'), (1, 'c'), (0, 'd'), (1, 'e')]:
+            journal.append(worker, recipe)
+            
+    emitted = []
+    with checkpoint.resume_journal(path, 'run1', [1, 2], emitted.append) as journal:
+        journal.append(0, 'f')
+    assert emitted == ['a', 'b', 'c']
+    
+    emitted = []
+    checkpoint.resume_journal(path, 'run1', [2, 2], emitted.append).close()
+    assert emitted == ['a', 'b', 'c', 'f']
+    
+    # Journal of another run or missing recipes
+    with pytest.raises(ValueError):
+        checkpoint.resume_journal(path, 'run2', [1, 2], [].append)
+    with pytest.raises(ValueError):
+        checkpoint.resume_journal(path, 'run1', [3, 2], [].append)
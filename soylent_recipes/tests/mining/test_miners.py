@@ -0,0 +1,45 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Test soylent_recipes.mining.miners
+'''
+
+from soylent_recipes.mining import miners
+from soylent_recipes.tests.various import NutritionTarget
+from soylent_recipes.config import max_foods
+import numpy as np
+
+def test_solve_workers(mocker):
+    '''
+    Each solve worker solves with its own solver, their stats are combined
+    '''
+    mocker.patch.object(miners, 'max_recipes', 5)
+    mocker.patch.object(miners, 'solve_workers', 2)
+    nutrition_target = NutritionTarget([[1, np.nan]], index=['nutrient1'])
+    foods = np.ones((max_foods * 2, 1))  # any recipe solves
+    miner = miners.Miner(np.random.default_rng(0))
+    recipes = []
+    stats = miner.mine_random(nutrition_target, foods, recipes.append)
+    assert len(recipes) == 5
+    solvers = miner._solvers
+    assert len(solvers) == 2 and solvers[0] is not solvers[1]
+    assert stats.solver.integer_solves == sum(solver.stats.integer_solves for solver in solvers) >= 5
+    
+    # Not with GLPK solver telemetry
+    mocker.patch.object(miners, 'solver_telemetry', True)
+    miner = miners.Miner(np.random.default_rng(0))
+    miner.mine_random(nutrition_target, foods, [].append)
+    assert len(miner._solvers) == 1
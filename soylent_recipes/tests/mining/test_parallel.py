@@ -0,0 +1,96 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+
+'''
+Test soylent_recipes.mining.parallel
+'''
+
+from pathlib import Path
+from soylent_recipes import metrics
+from soylent_recipes.mining import parallel, checkpoint
+from soylent_recipes.tests.various import NutritionTarget
+from soylent_recipes.config import max_foods
+import numpy as np
+import pytest
+
+def test_max_recipes(mocker):
+    '''
+    Collect exactly max_recipes recipes from all workers combined
+    '''
+    mocker.patch.object(parallel, 'max_recipes', 5)
+    nutrition_target = NutritionTarget([[1, np.nan]], index=['nutrient1'])
+    foods = np.ones((max_foods * 2, 1))  # any recipe solves
+    miner = parallel.ParallelMiner(workers=2, seed=1)
+    recipes = []
+    stats = miner.mine_random(nutrition_target, foods, recipes.append)
+    assert len(recipes) == 5
+    assert all(recipe.solved for recipe in recipes)
+    assert stats.recipes_tried >= 5
+    
+def test_resume(mocker, tmpdir):
+    '''
+    Resuming from a checkpoint finds the same recipes as an uninterrupted run
+    '''
+    mocker.patch.object(parallel, 'max_recipes', 100)
+    nutrition_target = NutritionTarget([[1, np.nan]], index=['nutrient1'])
+    foods = np.zeros((max_foods * 100, 1))
+    foods[0] = 1  # only recipes with the first food solve
+    
+    # Uninterrupted
+    expected = []
+    parallel.ParallelMiner(workers=1, seed=1).mine_random(nutrition_target, foods, expected.append)
+    
+    # Cancelled after 10 recipes, which saves a checkpoint
+    checkpoint_path = Path(str(tmpdir)) / 'checkpoint.pickle'
+    miner = parallel.ParallelMiner(workers=1, seed=1, checkpoint_path=checkpoint_path)
+    recipes = []
+    def emit(recipe):
+        recipes.append(recipe)
+        if len(recipes) == 10:
+            miner.cancel()
+    miner.mine_random(nutrition_target, foods, emit)
+    assert 10 <= len(recipes) < 100
+    
+    # Recipes are kept in the journal rather than in the checkpoint
+    assert 'recipes' not in checkpoint.load(checkpoint_path)
+    assert checkpoint.get_journal_path(checkpoint_path).exists()
+    
+    # Resumed, rates only count what is tried after resuming
+    miner = parallel.ParallelMiner(workers=1, seed=2, checkpoint_path=checkpoint_path)
+    miner.load_checkpoint(nutrition_target, foods)
+    resumed_tried = miner.stats.recipes_tried
+    assert resumed_tried >= 10
+    actual = []
+    with metrics.Reporter(lambda: miner.stats, Path(str(tmpdir)) / 'stats.json', interval=60) as reporter:
+        reporter._report()
+        assert reporter.metrics['rates']['tried_per_second'] == 0
+        stats = miner.mine_random(nutrition_target, foods, actual.append, resume=True)
+    assert [list(recipe.food_indices) for recipe in actual] == [list(recipe.food_indices) for recipe in expected]
+    assert stats.recipes_tried >= 100
+    rates = reporter.metrics['rates']
+    assert rates['tried_per_second'] * reporter.metrics['elapsed'] == pytest.approx(stats.recipes_tried - resumed_tried, rel=0.01)
+    
+    # Not resuming refuses to overwrite the checkpoint's journal
+    journal = checkpoint.get_journal_path(checkpoint_path).read_bytes()
+    miner = parallel.ParallelMiner(workers=1, checkpoint_path=checkpoint_path)
+    with pytest.raises(ValueError):
+        miner.mine_random(nutrition_target, foods, [].append)
+    assert checkpoint.get_journal_path(checkpoint_path).read_bytes() == journal
+    
+    # Other number of workers
+    miner = parallel.ParallelMiner(workers=2, checkpoint_path=checkpoint_path)
+    with pytest.raises(ValueError):
+        miner.mine_random(nutrition_target, foods, [].append, resume=True)
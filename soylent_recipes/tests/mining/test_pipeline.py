@@ -0,0 +1,106 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Test soylent_recipes.mining.pipeline
+'''
+
+from soylent_recipes.mining.pipeline import Pipeline, Stage, StageStats
+import itertools
+import threading
+import pytest
+
+def test_run():
+    '''
+    Items flow through stages in order, stats are counted per stage
+    '''
+    cancelled = threading.Event()
+    pipeline = Pipeline([
+        Stage('count', lambda: itertools.count, queue_size=2),
+        Stage('double', lambda: lambda x: [x, x]),
+        Stage('odd', lambda: lambda x: [x] if x % 2 else [], workers=2, queue_size=3),
+    ])
+    items = []
+    for item in pipeline.run(cancelled):
+        items.append(item)
+        if len(items) == 6:
+            cancelled.set()
+    assert sorted(items) == [1, 1, 3, 3, 5, 5]
+    
+    stats = pipeline.stats
+    assert list(stats.stages) == ['count', 'double', 'odd', 'emit']
+    assert stats.stages['emit'].items_in == 6
+    assert stats.stages['emit'].items_out == 6
+    assert stats.stages['odd'].items_out >= 6
+    assert stats.stages['count'].items_in == 0
+    assert stats.stages['count'].items_out >= 6
+    for stage in stats.stages.values():
+        assert stage.queue_depth_max <= 3
+        assert 0 <= stage.utilization <= 1
+    
+def test_error():
+    '''
+    Errors in stages are raised by run
+    '''
+    def fail(item):
+        raise ValueError('fail')
+    pipeline = Pipeline([
+        Stage('count', lambda: itertools.count),
+        Stage('fail', lambda: fail),
+    ])
+    with pytest.raises(ValueError):
+        list(pipeline.run(threading.Event()))
+        
+def test_close():
+    '''
+    Closing the generator stops the stages
+    '''
+    pipeline = Pipeline([Stage('count', lambda: itertools.count)])
+    items = pipeline.run(threading.Event())
+    assert next(items) == 0
+    items.close()
+    assert not [thread for thread in threading.enumerate() if thread.name == 'count stage']
+    
+def test_stage_stats_add():
+    stats = StageStats(1, 2, 1.0, 2.0, 3, 4) + StageStats(1, 2, 1.0, 2.0, 3, 1)
+    assert stats == StageStats(2, 4, 2.0, 4.0, 6, 4)
+    assert stats.throughput == 1
+    assert stats.utilization == 0.5
+    assert stats.queue_depth_mean == 3
+    
+def test_drain():
+    '''
+    When drained, all items produced by the source have been yielded
+    '''
+    produced = []
+    def count():
+        for item in itertools.count():
+            produced.append(item)
+            yield item
+    cancelled = threading.Event()
+    drained = []
+    def on_drained():
+        drained.append(list(produced))
+    pipeline = Pipeline([
+        Stage('count', lambda: count, queue_size=5),
+        Stage('identity', lambda: lambda x: [x], workers=2, queue_size=5),
+    ])
+    items = []
+    for item in pipeline.run(cancelled, lambda: len(items) >= 3 and not drained, on_drained):
+        items.append(item)
+        if drained and len(items) == len(drained[0]) + 3:
+            cancelled.set()
+    assert len(drained) == 1
+    assert sorted(items[:len(drained[0])]) == drained[0]
@@ -19,71 +19,50 @@ Test soylent_recipes.mining.recipe
 
 from chicken_turtle_util.exceptions import InvalidOperationError
 from soylent_recipes.mining.recipe import Recipe
-from soylent_recipes.tests.various import NutritionTarget
-from soylent_recipes import solver
 from functools import partial
 import numpy as np
 import pytest
 
-@pytest.fixture
-def nutrition_target():
-    return NutritionTarget([], [])
-    
-def patch_solve(mocker, amounts=None):
+def mock_solver(mocker, amounts=None):
     '''
-    Patch solver.solve to return mock value instead of actually solving
+    Mock solver which returns a mock value instead of actually solving
     '''
-    mocker.patch.object(solver, 'solve', lambda *args: amounts)
+    solver = mocker.Mock()
+    solver.solve.return_value = amounts
+    return solver
 
 assert_allclose = partial(np.testing.assert_allclose, atol=1e-8)
     
-def test_solved(mocker, nutrition_target):
+def test_solved(mocker):
     '''
     Test solved recipe
     '''
-    # Later we check these or combined and passed to `solve`
-    foods_ = np.array(
-        [
-            [0.2, 1.3],
-            [2.2, 0.0],
-            [1337, 22.0],  # added this unused one to test food_indices are used correctly
-            [0.1, 4.0],
-        ]
-    )
-    expected_foods = np.array(
-        [
-            [2.2, 0.0],
-            [0.1, 4.0],
-            [0.2, 1.3],
-        ],
-    )
+    food_indices = np.array([1,3,0])
     
     # Mock `solve`
     amounts = np.array([2.0, 1.1, 3.0])
-    def solve(nutrition_target_, foods):
+    def solve(food_indices_):
         # Correct args passed in
-        assert nutrition_target_.equals(nutrition_target)
-        np.testing.assert_allclose(foods, expected_foods)  # Note: column order does not matter
+        np.testing.assert_array_equal(food_indices_, food_indices)
         
         # Return mock values 
         return amounts
-    mocker.patch.object(solver, 'solve', solve)
+    solver = mocker.Mock()
+    solver.solve = solve
     
     # Create and assert
-    food_indices = np.array([1,3,0])
-    recipe = Recipe(food_indices, nutrition_target, foods_)
+    recipe = Recipe(food_indices, solver)
     assert_allclose(recipe.amounts, amounts)  # matches return of `solve`
     assert recipe.solved  # score close to 0 == recipe.solved
     np.testing.assert_array_equal(recipe.food_indices, food_indices)
     
-def test_not_solved(mocker, nutrition_target):
+def test_not_solved(mocker):
     '''
     Test things specific to an unsolved recipe
     '''
-    patch_solve(mocker, None)
+    solver = mock_solver(mocker, None)
     food_indices = np.array([0])
-    foods = np.ones((1,1))
-    recipe = Recipe(food_indices, nutrition_target, foods)
+    recipe = Recipe(food_indices, solver)
     assert not recipe.solved
     with pytest.raises(InvalidOperationError):
         recipe.amounts
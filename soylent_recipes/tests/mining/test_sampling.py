@@ -0,0 +1,34 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Test soylent_recipes.mining.sampling
+'''
+
+from soylent_recipes.mining.sampling import sample_recipes
+import numpy as np
+import pytest
+
+@pytest.mark.parametrize('foods_per_recipe', (1, 3, 8, 10))
+def test_sample_recipes(foods_per_recipe):
+    '''
+    Recipes have distinct foods, all foods are equally likely
+    '''
+    rng = np.random.default_rng(0)
+    recipes = sample_recipes(rng, 10, 10000, foods_per_recipe)
+    assert recipes.shape == (10000, foods_per_recipe)
+    assert all(len(set(recipe)) == foods_per_recipe for recipe in recipes)
+    counts = np.bincount(recipes.ravel(), minlength=10)
+    np.testing.assert_allclose(counts / counts.sum(), 0.1, atol=0.01)
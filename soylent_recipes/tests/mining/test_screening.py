@@ -0,0 +1,79 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+
+'''
+Test soylent_recipes.mining.screening
+'''
+
+from soylent_recipes.mining.screening import Screen
+from soylent_recipes.tests.various import NutritionTarget
+import numpy as np
+
+def test_missing_nutrient():
+    '''
+    When none of the foods contain a nutrient with a min, reject
+    '''
+    nutrition_target = NutritionTarget(
+        [
+            [1, np.nan],
+            [np.nan, 2],
+        ],
+        index=['nutrient1', 'nutrient2']
+    )
+    foods = np.array(
+        [
+            [0.0, 1.0],
+            [0.0, 0.0],
+            [1e-9, 5.0],
+        ]
+    )
+    screen = Screen(nutrition_target, foods)
+    np.testing.assert_array_equal(screen(np.array([[0, 1], [1, 2], [2, 0]])), [False, True, True])
+
+def test_capacity():
+    '''
+    When the best nutrient density times the max of a capacity nutrient (a
+    nutrient with a max all foods contain, e.g. mass) is less than the min,
+    reject
+    '''
+    nutrition_target = NutritionTarget(
+        [
+            [10, np.nan],
+            [np.nan, 4],  # capacity
+            [np.nan, 1],  # not a capacity, not all foods contain it
+        ],
+        index=['nutrient1', 'mass', 'nutrient2']
+    )
+    foods = np.array(
+        [
+            [2.0, 1.0, 0.0],
+            [2.5, 1.0, 1.0],  # exactly reaches the min
+            [6.0, 2.0, 1.0],  # 3 per unit of mass
+            [1.0, 1.0, 1.0],
+        ]
+    )
+    screen = Screen(nutrition_target, foods)
+    actual = screen(np.array([[0, 3], [0, 1], [3, 2], [1, 1]]))
+    np.testing.assert_array_equal(actual, [False, True, True, True])
+
+def test_no_minima():
+    '''
+    When the target has no minima, pass everything
+    '''
+    nutrition_target = NutritionTarget([[np.nan, 1]], index=['nutrient1'])
+    foods = np.array([[0.0], [2.0]])
+    screen = Screen(nutrition_target, foods)
+    np.testing.assert_array_equal(screen(np.array([[0], [1]])), [True, True])
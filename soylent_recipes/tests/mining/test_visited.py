@@ -0,0 +1,69 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Test soylent_recipes.mining.visited
+'''
+
+from soylent_recipes.mining.visited import BloomFilter
+import numpy as np
+import pickle
+
+def test_add():
+    '''
+    Recipes are reported as added regardless of food order, also when repeated
+    within the same call
+    '''
+    bloom_filter = BloomFilter(1000, 0.01)
+    added = bloom_filter.add(np.array([[1, 2, 3], [4, 5, 6], [3, 2, 1]]))
+    np.testing.assert_array_equal(added, [False, False, True])
+    added = bloom_filter.add(np.array([[6, 4, 5], [1, 2, 4]]))
+    np.testing.assert_array_equal(added, [True, False])
+    
+def test_error_rate():
+    '''
+    False positive rate does not exceed error_rate much at capacity
+    '''
+    rng = np.random.default_rng(0)
+    bloom_filter = BloomFilter(10000, 0.01)
+    bloom_filter.add(rng.integers(0, 10**6, (10000, 5)))
+    assert bloom_filter.add(rng.integers(0, 10**6, (10000, 5))).mean() < 0.02
+    
+def test_pickle():
+    bloom_filter = BloomFilter(1000, 0.01)
+    recipes = np.array([[1, 2, 3], [4, 5, 6]])
+    bloom_filter.add(recipes)
+    loaded = pickle.loads(pickle.dumps(bloom_filter))
+    assert loaded.size == bloom_filter.size
+    assert loaded.add(recipes).all()
+    assert not loaded.add(np.array([[1, 2, 4]])).any()
+    
+def test_over_capacity():
+    '''
+    Past its initial capacity, the filter grows to keep its error rate
+    '''
+    rng = np.random.default_rng(0)
+    bloom_filter = BloomFilter(1000, 0.01)
+    size = bloom_filter.size
+    recipes = rng.integers(0, 10**6, (10000, 5))
+    assert bloom_filter.add(recipes).mean() < 0.01
+    assert bloom_filter.size > size
+    assert bloom_filter.add(recipes).all()
+    assert bloom_filter.add(rng.integers(0, 10**6, (10000, 5))).mean() < 0.015
+    
+    # Growth survives pickling, as in checkpoints
+    loaded = pickle.loads(pickle.dumps(bloom_filter))
+    assert loaded.size == bloom_filter.size
+    assert loaded.add(recipes).all()
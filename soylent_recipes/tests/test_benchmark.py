@@ -0,0 +1,74 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Test soylent_recipes.benchmark
+'''
+
+from soylent_recipes import benchmark
+from soylent_recipes.config import max_foods
+from .various import NutritionTarget
+import numpy as np
+import pytest
+
+def test_solve_and_mine():
+    '''
+    Candidates are fixed by the seed, benchmarks report their metrics
+    '''
+    nutrition_target = NutritionTarget([[1, 2]], index=['nutrient1'])
+    foods = np.full((max_foods * 10, 1), 3.0)
+    foods[:5] = 1.5  # only recipes with one of the first foods solve
+    feasible, infeasible = benchmark.get_candidates(nutrition_target, foods, seed=0, count=10)
+    assert len(feasible) == len(infeasible) == 10
+    assert all((food_indices < 5).any() for food_indices in feasible)
+    feasible2, _ = benchmark.get_candidates(nutrition_target, foods, seed=0, count=10)
+    np.testing.assert_array_equal(feasible, feasible2)
+    
+    results = benchmark.benchmark_solve(nutrition_target, foods, feasible, repeat=1)
+    assert list(results) == ['median_seconds', 'mean_seconds', 'solves_per_second', 'iterations_mean', 'kkt_violations']
+    assert results['kkt_violations'] == 0
+    assert benchmark.benchmark_solve(nutrition_target, foods, []) is None
+    
+    results = benchmark.benchmark_mine(nutrition_target, foods, seed=0, seconds=0.5)
+    assert results['tried_per_second'] > results['solved_per_second'] > 0
+    
+    results = benchmark.benchmark_solve(nutrition_target, foods, feasible, repeat=1, solver='nnls')
+    assert results['iterations_mean'] is None
+    
+    results = benchmark.benchmark_solvers(nutrition_target, foods, list(feasible) + list(infeasible), ['glpk', 'nnls', 'highs'])
+    assert list(results) == ['glpk', 'nnls', 'highs']
+    assert results['glpk']['agreement'] == 1.0
+    assert results['glpk']['invalid'] == results['nnls']['invalid'] == 0
+    assert isinstance(results['highs'], (dict, str))  # str if scipy is too old
+    
+def test_compare():
+    '''
+    Regressions are worse than the baseline by more than the tolerance
+    '''
+    baseline = {'solve': {'median_seconds': 1.0, 'solves_per_second': 10.0}, 'import_usda': None}
+    results = {'solve': {'median_seconds': 1.2, 'solves_per_second': 9.5}, 'import_usda': {'seconds': 1.0}}
+    rows = benchmark.compare(results, baseline, tolerance=0.1)
+    assert [row[:2] for row in rows] == [('import_usda', 'seconds'), ('solve', 'median_seconds'), ('solve', 'solves_per_second')]
+    assert rows[0][-2:] == (None, False)
+    assert rows[1][-1]  # 20% slower
+    assert not rows[2][-1]  # 5% fewer per second
+    assert rows[2][-2] == pytest.approx(-0.05)
+    
+    # Counts with a baseline of 0 regress on any increase
+    baseline = {'solve': {'kkt_violations': 0, 'solves_per_second': 0.0}}
+    results = {'solve': {'kkt_violations': 1, 'solves_per_second': 1.0}}
+    rows = benchmark.compare(results, baseline, tolerance=0.1)
+    assert rows == [('solve', 'kkt_violations', 0, 1, None, True), ('solve', 'solves_per_second', 0.0, 1.0, None, False)]
+    assert not benchmark.compare(baseline, baseline, tolerance=0.1)[0][-1]
@@ -0,0 +1,63 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Test soylent_recipes.cache
+'''
+
+from chicken_turtle_util import data_frame as df_
+from soylent_recipes import cache
+from .various import NutritionTarget
+from pathlib import Path
+import pytest
+import pandas as pd
+import numpy as np
+
+@pytest.fixture
+def nutrition_target():
+    return NutritionTarget([[1, 2]], index=('protein',))
+
+def test_get_key(tmpdir, nutrition_target):
+    '''
+    Key changes when file contents or nutrition target change
+    '''
+    file = Path(str(tmpdir / 'file'))
+    file.write_text('a')
+    key = cache.get_key([file], nutrition_target)
+    assert cache.get_key([file], nutrition_target) == key
+    
+    other_target = NutritionTarget([[1, 3]], index=('protein',))
+    assert cache.get_key([file], other_target) != key
+    
+    file.write_text('b')
+    assert cache.get_key([file], nutrition_target) != key
+
+def test_save_load(tmpdir):
+    '''
+    Load what was saved, None when not in cache
+    '''
+    cache_directory = Path(str(tmpdir / 'cache'))
+    foods = pd.DataFrame(
+        [[1.0, 2.5], [0.0, np.inf]],
+        index=pd.MultiIndex.from_tuples(
+            [(1001, 'Butter, salted'), (1002, 'Crème fraîche')],
+            names=('food_id', 'description'),
+        ),
+        columns=['protein', 'fat'],
+    )
+    assert cache.load(cache_directory, 'key') is None
+    cache.save(cache_directory, 'key', foods)
+    df_.assert_equals(cache.load(cache_directory, 'key'), foods)
+    assert cache.load(cache_directory, 'other') is None
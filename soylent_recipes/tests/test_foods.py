@@ -20,6 +20,10 @@ Test soylent_recipes.foods
 from chicken_turtle_util.test import assert_text_equals
 from soylent_recipes import foods as foods_
 from textwrap import dedent
+from pathlib import Path
+import numpy as np
+import shutil
+import pytest
 
 def test_import_usda(usda_data_dir):
     '''
@@ -29,6 +33,8 @@ def test_import_usda(usda_data_dir):
     carbohydrate factor and a {internal_nutrient_name} column for each nutrient
     hardcoded in _mapping.
     '''
+    if not (usda_data_dir / 'NUT_DATA.txt').exists():
+        pytest.skip('NUT_DATA.txt of USDA SR28 is not in data/usda_nutrient_db_sr28')
     foods = foods_.import_usda(usda_data_dir)
     expected = dedent('''\
         description                             Butter, salted
@@ -79,3 +85,31 @@ def test_import_usda(usda_data_dir):
         zinc                                             9e-07'''
     )
     assert_text_equals(foods.loc[1001].to_string(), expected)
+    
+def test_import_usda_chunks(usda_data_dir, tmpdir, monkeypatch):
+    '''
+    NUT_DATA is read correctly across chunks, ignoring unknown foods and
+    unused nutrients, dropping foods without nutrient data
+    '''
+    monkeypatch.setattr(foods_, '_chunk_size', 2)
+    usda_directory = Path(str(tmpdir))
+    (usda_directory / 'FOOD_DES.txt').write_text(dedent('''\
+        ~01001~^~0100~^~Butter, salted~^~BUTTER,WITH SALT~^~~^~~^~Y~^~~^0^~~^6.38^4.27^8.79^3.87
+        ~01002~^~0100~^~Cheese~^~CHEESE~^~Gouda~^~~^~Y~^~~^0^~~^6.38^4.27^8.79^3.87
+        ~01003~^~0100~^~Cream~^~CREAM~^~~^~~^~Y~^~~^0^~~^6.38^4.27^8.79^3.87
+        ~01004~^~0100~^~Whey~^~WHEY~^~~^~~^~Y~^~~^0^~~^6.38^4.27^8.79^3.87
+    '''))
+    shutil.copy(str(usda_data_dir / 'NUTR_DEF.txt'), str(usda_directory))
+    (usda_directory / 'NUT_DATA.txt').write_text(dedent('''\
+        ~01001~^~203~^0.85^16^
+        ~01001~^~268~^5^1^
+        ~01002~^~301~^700^1^
+        ~09999~^~203~^1^1^
+        ~01002~^~203~^25^1^
+        ~01004~^~268~^5^1^
+    '''))
+    foods = foods_.import_usda(usda_directory)
+    assert list(foods.index) == [1001, 1002]
+    assert foods['description'].tolist() == ['Butter, salted', 'Cheese (Gouda)']
+    np.testing.assert_allclose(foods['protein'], [0.0085, 0.25])
+    np.testing.assert_allclose(foods['calcium'], [np.nan, 0.007])
@@ -0,0 +1,75 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Test soylent_recipes.histogram
+'''
+
+from soylent_recipes.histogram import Histogram, format_duration
+import numpy as np
+import pytest
+
+def test_percentile():
+    '''
+    Percentiles are accurate to a bucket, mean and max are exact
+    '''
+    values = np.random.default_rng(0).lognormal(np.log(1e-3), 1, 10000)
+    histogram = Histogram()
+    histogram.add_many(values[:5000])
+    for value in values[5000:]:
+        histogram.add(value)
+    assert histogram.count == 10000
+    assert histogram.mean == pytest.approx(values.mean())
+    assert histogram.max == values.max()
+    for q in (1, 50, 90, 99):
+        assert histogram.percentile(q) == pytest.approx(np.percentile(values, q), rel=0.13)
+    assert histogram.percentile(100) == values.max()
+    
+def test_out_of_range():
+    '''
+    Values outside the buckets are reported as the smallest or largest value
+    '''
+    histogram = Histogram(1, 10)
+    histogram.add_many(np.array([0, 0, 5, 100]))
+    assert histogram.percentile(25) == 0
+    assert histogram.percentile(60) == pytest.approx(5, rel=0.13)
+    assert histogram.percentile(100) == 100
+    
+def test_empty():
+    histogram = Histogram()
+    assert histogram.count == 0
+    assert histogram.mean is None
+    assert histogram.max is None
+    assert histogram.percentile(50) is None
+    assert str(histogram) == 'n=0'
+    
+def test_add():
+    '''
+    Summed histograms are as if all values were added to one
+    '''
+    histogram1 = Histogram()
+    histogram1.add(1e-3)
+    histogram2 = Histogram()
+    histogram2.add_many(np.array([1e-2, 1e4, 1e-9]))
+    expected = Histogram()
+    expected.add_many(np.array([1e-3, 1e-2, 1e4, 1e-9]))
+    assert histogram1 + histogram2 == expected
+    assert histogram1.count == 1
+    
+def test_format_duration():
+    assert format_duration(2.5) == '2.5s'
+    assert format_duration(0.0123) == '12.3ms'
+    assert format_duration(5e-6) == '5µs'
+    assert format_duration(5e-8) == '50ns'
@@ -0,0 +1,80 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Test soylent_recipes.metrics
+'''
+
+from soylent_recipes import metrics
+from soylent_recipes.mining.miners import Stats
+from soylent_recipes.mining import pipeline
+from pathlib import Path
+from urllib.request import urlopen
+import json
+import stat
+import os
+import pytest
+
+def test_get_metrics():
+    start_stats = Stats(recipes_tried=100, recipes_solved=1)
+    recent_stats = Stats(recipes_tried=500, recipes_solved=3)
+    stats = Stats(
+        recipes_tried=1100, recipes_solved=11, recipes_screened_out=1000,
+        recipes_skipped_due_to_visited=100,
+        pipeline=pipeline.Stats({'solve': pipeline.StageStats(items_in=100, busy_time=1.0, run_time=4.0)}),
+    )
+    actual = metrics.get_metrics(stats, 10.0, start_stats, recent_stats, 2.0)
+    assert actual['totals']['recipes_tried'] == 1100
+    assert actual['rates']['tried_per_second'] == 100
+    assert actual['rates']['solved_per_second'] == 1
+    assert actual['rates']['recent_tried_per_second'] == 300
+    assert actual['rates']['recent_solved_per_second'] == 4
+    assert actual['ratios']['success'] == pytest.approx(0.01)
+    assert actual['ratios']['screened_out'] == pytest.approx(1000 / 1100)
+    assert actual['ratios']['skipped_due_to_visited'] == pytest.approx(100 / 1200)
+    assert actual['ratios']['relaxation_infeasible'] is None
+    assert actual['stages']['solve']['utilization'] == 0.25
+    assert actual['stages']['solve']['latency']['p50'] is None
+    json.dumps(actual)
+    assert 'Tried 300/s, solved 4.00/s' in metrics.format_metrics(actual)
+    
+def test_reporter(tmpdir):
+    '''
+    Metrics are written to file and served
+    '''
+    path = Path(str(tmpdir)) / 'stats.json'
+    stats = [Stats()]
+    with metrics.Reporter(lambda: stats[0], path, interval=60, port=0) as reporter:
+        stats[0] = Stats(recipes_tried=10)
+        reporter._report()
+        with urlopen('http://localhost:{}/metrics'.format(reporter.port)) as response:
+            served = json.loads(response.read().decode())
+        assert served['totals']['recipes_tried'] == 10
+        stats[0] = Stats(recipes_tried=20)
+    written = json.loads(path.read_text())
+    assert written['totals']['recipes_tried'] == 20
+    
+def test_reporter_file_mode(tmpdir):
+    '''
+    The stats file is readable by others, as allowed by the umask
+    '''
+    path = Path(str(tmpdir)) / 'stats.json'
+    umask = os.umask(0o022)
+    try:
+        with metrics.Reporter(lambda: Stats(), path, interval=60):
+            pass
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(path.stat().st_mode) == 0o644
@@ -0,0 +1,132 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Test soylent_recipes.output
+'''
+
+from soylent_recipes import output
+from .various import NutritionTarget
+from pathlib import Path
+import pandas as pd
+import numpy as np
+import json
+from textwrap import dedent
+import time
+import pytest
+
+def recipe(mocker, food_indices, amounts):
+    recipe = mocker.Mock()
+    recipe.food_indices = np.array(food_indices)
+    recipe.amounts = np.array(amounts)
+    return recipe
+
+def foods_and_target():
+    foods = pd.DataFrame(
+        [[1.0, 0.5], [2.0, 0.0]],
+        index=pd.MultiIndex.from_tuples([(1, 'apple'), (2, 'pear')], names=('food_id', 'description')),
+        columns=['mass', 'sugar'],
+    )
+    nutrition_target = NutritionTarget([[1, 100], [np.nan, 5]], index=['mass', 'sugar'])
+    return foods, nutrition_target
+
+def test_text_writer(mocker, tmpdir, monkeypatch):
+    '''
+    Recipes are appended and flushed as they are written
+    '''
+    monkeypatch.setattr(output, '_flush_interval', 0.01)
+    foods, nutrition_target = foods_and_target()
+    path = Path(str(tmpdir / 'recipes.txt'))
+    with output.TextWriter(path, foods, nutrition_target) as writer:
+        writer.write(recipe(mocker, [0, 1], [3, 0]))
+        for _ in range(100):
+            time.sleep(0.01)
+            if 'apple' in path.read_text():
+                break
+        text = path.read_text()
+        assert 'apple' in text
+        assert 'pear' not in text  # zero amount
+        writer.write(recipe(mocker, [1], [5]))
+    text = path.read_text()
+    assert text.startswith(output._header)
+    assert text.count(output._separator) == 1
+    assert 'pear' in text
+    
+def test_jsonl_writer(mocker, tmpdir):
+    foods, nutrition_target = foods_and_target()
+    path = Path(str(tmpdir / 'recipes.jsonl'))
+    with output.JsonlWriter(path, foods, nutrition_target) as writer:
+        writer.write(recipe(mocker, [0, 1], [3, 0]))
+        writer.write(recipe(mocker, [1, 0], [2, 4]))
+    recipes = [json.loads(line) for line in path.read_text().splitlines()]
+    assert recipes == [
+        {
+            'foods': [{'id': 1, 'description': 'apple', 'amount': 3}],
+            'nutrition': {'mass': 3.0, 'sugar': 1.5},
+        },
+        {
+            'foods': [{'id': 2, 'description': 'pear', 'amount': 2}, {'id': 1, 'description': 'apple', 'amount': 4}],
+            'nutrition': {'mass': 8.0, 'sugar': 2.0},
+        },
+    ]
+    
+def test_csv_writer(mocker, tmpdir):
+    foods, nutrition_target = foods_and_target()
+    path = Path(str(tmpdir / 'recipes.csv'))
+    with output.CsvWriter(path, foods, nutrition_target) as writer:
+        writer.write(recipe(mocker, [0, 1], [3, 0]))
+        writer.write(recipe(mocker, [1, 0], [2, 4]))
+    actual = pd.read_csv(str(path))
+    expected = pd.DataFrame(
+        [
+            [0, 1, 'apple', 3, 3.0, 1.5],
+            [1, 2, 'pear', 2, 4.0, 0.0],
+            [1, 1, 'apple', 4, 4.0, 2.0],
+        ],
+        columns=['recipe', 'food_id', 'description', 'amount', 'mass', 'sugar'],
+    )
+    pd.testing.assert_frame_equal(actual, expected)
+    
+def test_parquet_writer(mocker, tmpdir, monkeypatch):
+    pytest.importorskip('pyarrow')
+    monkeypatch.setattr(output, '_parquet_batch_size', 1)
+    foods, nutrition_target = foods_and_target()
+    path = Path(str(tmpdir / 'recipes.parquet'))
+    with output.ParquetWriter(path, foods, nutrition_target) as writer:
+        writer.write(recipe(mocker, [0, 1], [3, 0]))
+        writer.write(recipe(mocker, [1, 0], [2, 4]))
+    actual = pd.read_parquet(str(path))
+    assert actual['recipe'].tolist() == [0, 1, 1]
+    assert actual['food_id'].tolist() == [1, 2, 1]
+    
+def test_format_recipes(mocker):
+    '''
+    Nutrition of each recipe is shown, with violated bounds marked
+    '''
+    foods, nutrition_target = foods_and_target()
+    texts = output.format_recipes(
+        [recipe(mocker, [0, 1], [3, 0]), recipe(mocker, [1, 0], [2, 12])],
+        foods, nutrition_target
+    )
+    assert texts[0] == dedent('''\
+        3g  apple
+        =
+        3g
+        
+               min  min_err  actual  max_err  max
+        mass     1                3           100
+        sugar                   1.5             5''')
+    assert texts[1].splitlines()[:4] == ['12g  apple', '2g   pear', '=', '14g']
+    assert texts[1].splitlines()[-1].split() == ['sugar', '6', '!', '5']
@@ -23,6 +23,7 @@ from soylent_recipes import nutrition_target as nutrition_target_
 from .various import NutritionTarget
 import pandas as pd
 import numpy as np
+import swiglpk as glp
 from functools import partial
 import pytest
 
@@ -34,7 +35,7 @@ def nutrition(amounts, foods):
 @pytest.fixture
 def solve(): #TODO inline
     def solve(nutrition_target, foods):
-        return solver.solve(nutrition_target, foods.values)
+        return solver.GlpkSolver(nutrition_target, foods.values).solve(np.arange(len(foods)))
     return solve
 
 def assert_all_integer(x):
@@ -149,3 +150,303 @@ def test_infeasible_ints(solve):
         columns=['nutrient1', 'nutrient2']
     )
     assert solve(nutrition_target, foods) is None
+    
+def test_reuse():
+    '''
+    When solving multiple times with the same solver, each solve is independent
+    of the previous ones, even when the food count changes
+    '''
+    nutrition_target = NutritionTarget(
+        [
+            [20, 30],
+            [10, 20],
+        ],
+        index=['nutrient1', 'nutrient2']
+    )
+    foods = pd.DataFrame(
+        [
+            [3.0, 0.0],
+            [2.0, 4.0],
+            [1.0, 1.0],
+        ],
+        columns=['nutrient1', 'nutrient2']
+    )
+    solver_ = solver.GlpkSolver(nutrition_target, foods.values)
+    infeasible_indices = np.array([0])
+    for food_indices in (np.arange(2), infeasible_indices, np.arange(3), np.arange(2)):
+        amounts = solver_.solve(food_indices)
+        if food_indices is infeasible_indices:
+            assert amounts is None
+        else:
+            assert len(amounts) == len(food_indices)
+            assert_all_integer(amounts)
+            nutrition_ = nutrition(amounts, foods.iloc[food_indices])
+            nutrition_target_.assert_satisfied(nutrition_target, nutrition_)
+    
+def test_food_indices():
+    '''
+    Recipes are solved for the given foods, in the given order, including foods
+    with no nutrients at all
+    '''
+    nutrition_target = NutritionTarget(
+        [
+            [5, np.nan],
+            [2, np.nan],
+        ],
+        index=['nutrient1', 'nutrient2']
+    )
+    foods = pd.DataFrame(
+        [
+            [0.0, 0.0],
+            [2.0, 0.0],
+            [9.0, 9.0],
+            [0.0, 4.0],
+        ],
+        columns=['nutrient1', 'nutrient2']
+    )
+    food_indices = np.array([3, 0, 1])
+    amounts = solver.GlpkSolver(nutrition_target, foods.values).solve(food_indices)
+    assert len(amounts) == 3
+    nutrition_ = nutrition(amounts, foods.iloc[food_indices])
+    nutrition_target_.assert_satisfied(nutrition_target, nutrition_)
+    
+def test_upper_bounds():
+    '''
+    Food amounts are bounded by the max constraints, without cutting off
+    solutions
+    '''
+    nutrition_target = NutritionTarget(
+        [
+            [10, 12],
+            [np.nan, 9],
+            [1, np.nan],
+        ],
+        index=['nutrient1', 'nutrient2', 'nutrient3']
+    )
+    foods = np.array(
+        [
+            [4.0, 3.0, 1.0],  # at most 3 (nutrient2)
+            [0.1, 0.0, 1.0],  # at most 120 (nutrient1)
+            [3.0, 10.0, 1.0],  # can't be used (nutrient2)
+            [0.0, 0.0, 1.0],  # unbounded
+        ]
+    )
+    solver_ = solver.GlpkSolver(nutrition_target, foods)
+    np.testing.assert_array_equal(solver_.solve(np.array([0])), [3])
+    problem = solver_._problem
+    assert glp.glp_get_col_type(problem, 1) == glp.GLP_DB
+    assert glp.glp_get_col_ub(problem, 1) == 3
+    
+    amounts = solver_.solve(np.array([2, 3, 1]))
+    assert amounts[0] == 0
+    assert amounts[2] >= 100
+    assert [glp.glp_get_col_type(problem, i) for i in (1, 2, 3)] == [glp.GLP_FX, glp.GLP_LO, glp.GLP_DB]
+    assert glp.glp_get_col_ub(problem, 3) == 120
+    
+@pytest.mark.parametrize('name', sorted(solver.solvers))
+def test_solvers(name):
+    '''
+    Each solver finds valid amounts for feasible recipes and none otherwise
+    '''
+    nutrition_target = NutritionTarget(
+        [
+            [10, 12],
+            [np.nan, 9],
+            [1, np.nan],
+        ],
+        index=['nutrient1', 'nutrient2', 'nutrient3']
+    )
+    foods = np.array(
+        [
+            [4.0, 3.0, 1.0],
+            [0.1, 0.0, 1.0],
+            [3.0, 10.0, 1.0],
+            [0.0, 0.0, 1.0],
+        ]
+    )
+    try:
+        solver_ = solver.solvers[name](nutrition_target, foods, telemetry=True)
+    except Exception as ex:  # its dependency is missing
+        pytest.skip(str(ex))
+    for food_indices in (np.array([0]), np.array([1, 3])):
+        amounts = solver_.solve(food_indices)
+        assert amounts is not None
+        assert (amounts >= 0).all()
+        nutrition = amounts.dot(foods[food_indices])
+        assert 10 <= nutrition[0] <= 12
+        assert nutrition[1] <= 9
+        assert nutrition[2] >= 1
+    assert solver_.solve(np.array([2])) is None
+    assert sum(solver_.stats.telemetry.outcomes.values()) == 3
+    
+def test_nnls_rounding_failed():
+    '''
+    When nnls cannot round a solution, it does not claim the recipe to be
+    infeasible
+    '''
+    nutrition_target = NutritionTarget([[10, 12]], index=['nutrient1'])
+    foods = np.array([[4.0]])  # 2.5 to 3 non-integer amounts, but no multiple of 5
+    try:
+        solver_ = solver.NnlsSolver(nutrition_target, foods, telemetry=True, granularity=5)
+    except Exception as ex:  # scipy is missing
+        pytest.skip(str(ex))
+    assert solver_.solve(np.array([0])) is None
+    assert solver_.stats.telemetry.outcomes == {'rounding_failed': 1}
+    
+def test_glp_arrays():
+    '''
+    Arrays are copied into 1-indexed GLPK arrays with the installed swiglpk
+    '''
+    int_array = solver._as_int_array(np.array([3, 1, 2]))
+    assert [int_array[i] for i in (1, 2, 3)] == [3, 1, 2]
+    double_array = solver._as_double_array(np.array([0.5, 2.0]))
+    assert [double_array[i] for i in (1, 2)] == [0.5, 2.0]
+    
+def test_normalized_nutrients():
+    '''
+    Nutrients of very different magnitude are normalized to their target
+    '''
+    nutrition_target = NutritionTarget(
+        [
+            [2e-6, 3e-6],
+            [2e3, 2.5e3],
+        ],
+        index=['nutrient1', 'nutrient2']
+    )
+    foods = np.array(
+        [
+            [1e-8, 5.0],
+            [2e-8, 15.0],
+        ]
+    )
+    solver_ = solver.GlpkSolver(nutrition_target, foods)
+    amounts = solver_.solve(np.array([0, 1]))
+    assert_all_integer(amounts)
+    actual = amounts.dot(foods)
+    assert np.all(actual >= nutrition_target['min'].values * (1 - 1e-9))
+    assert np.all(actual <= nutrition_target['max'].values * (1 + 1e-9))
+    problem = solver_._problem
+    assert [glp.glp_get_row_ub(problem, i) for i in (1, 2)] == [1, 1]
+    
+def test_granularity():
+    '''
+    Amounts are multiples of granularity
+    '''
+    nutrition_target = NutritionTarget([[9, 11], [12, 14]], index=['nutrient1', 'nutrient2'])
+    foods = np.array([[1.0, 0.0], [0.0, 1.0], [0.0, 0.5]])
+    solver_ = solver.GlpkSolver(nutrition_target, foods, granularity=5)
+    np.testing.assert_array_equal(solver_.solve(np.array([0, 2])), [10, 25])
+    assert glp.glp_get_col_ub(solver_._problem, 2) == 5  # at most 14 / 2.5 units of 5g of food 2
+    assert solver_.solve(np.array([0, 1])) is None  # 12 to 14 of nutrient2 can't be had in steps of 5
+    
+    solver_ = solver.GlpkSolver(nutrition_target, foods)
+    amounts = solver_.solve(np.array([0, 1]))
+    assert 9 <= amounts[0] <= 11
+    assert 12 <= amounts[1] <= 14
+    
+def test_round_relaxation(monkeypatch):
+    '''
+    When round_relaxation, round and repair the relaxation, falling back to
+    the integer solve
+    '''
+    nutrition_target = NutritionTarget([[1.6, 1.8], [np.nan, 30]], index=['nutrient1', 'nutrient2'])
+    foods = np.array([[1.0, 1.0], [0.1, 1.0]])
+    food_indices = np.array([0, 1])
+    def assert_valid(amounts):
+        nutrition_ = amounts.dot(foods)
+        assert 1.6 - 1e-9 <= nutrition_[0] <= 1.8 + 1e-9
+        assert nutrition_[1] <= 30
+        
+    # Rounding the center of the relaxation, (0.67, 10), exceeds the max of
+    # nutrient1, which is repaired
+    solver_ = solver.GlpkSolver(nutrition_target, foods, telemetry=True, round_relaxation=True)
+    amounts = solver_.solve(food_indices)
+    assert_all_integer(amounts)
+    assert_valid(amounts)
+    assert solver_.stats.telemetry.outcomes == {'rounded': 1}
+    assert solver_.stats.rounded == 1
+    assert solver_.stats.integer_solves == 0
+    
+    # Without repair, fall back to the integer solve
+    monkeypatch.setattr(solver.GlpkSolver, '_max_repair_steps', 0)
+    solver_ = solver.GlpkSolver(nutrition_target, foods, telemetry=True, round_relaxation=True)
+    assert_valid(solver_.solve(food_indices))
+    assert solver_.stats.telemetry.outcomes == {'solved': 1}
+    assert solver_.stats.rounded == 0
+    
+def test_screen_relaxation():
+    '''
+    When screening with the LP relaxation, reject recipes with an infeasible
+    relaxation without an integer solve, integer solve the others
+    '''
+    nutrients = ['nutrient1', 'nutrient2']
+    nutrition_target = NutritionTarget(
+        [
+            [2, 3],
+            [1, 2],
+        ],
+        index=nutrients
+    )
+    foods = np.array(
+        [
+            [3.0, 0.0],
+            [1.9, 0.8],
+            [2.1, 0.7],
+            [1.0, 1.6],
+            [2.0, 1.0],
+        ]
+    )
+    infeasible_foods = np.array([0])
+    infeasible_ints_foods = np.array([1, 2, 3])  # feasible relaxation
+    feasible_foods = np.array([4])
+    solver_ = solver.GlpkSolver(nutrition_target, foods, screen_relaxation=True)
+    assert solver_.solve(infeasible_foods) is None
+    assert solver_.stats.relaxations == 1
+    assert solver_.stats.relaxations_infeasible == 1
+    assert solver_.stats.integer_solves == 0
+    
+    assert solver_.solve(infeasible_ints_foods) is None
+    assert solver_.stats.relaxations == 2
+    assert solver_.stats.relaxations_infeasible == 1
+    assert solver_.stats.integer_solves == 1
+    
+    np.testing.assert_array_equal(solver_.solve(feasible_foods), [1])
+    assert solver_.stats.relaxations == 3
+    assert solver_.stats.relaxations_infeasible == 1
+    assert solver_.stats.integer_solves == 2
+    
+def test_telemetry():
+    '''
+    With telemetry, count outcomes and record histograms of each solve
+    '''
+    nutrition_target = NutritionTarget(
+        [
+            [1.2, 1.8],
+            [1.2, 1.8],
+        ],
+        index=['nutrient1', 'nutrient2']
+    )
+    foods = np.array([[1.0, 0.0], [1.4, 1.1], [0.8, 0.4], [0.2, 1.5], [1.5, 1.5]])
+    relaxation_infeasible_foods = np.array([0])
+    integer_infeasible_foods = np.array([1, 2, 3])
+    feasible_foods = np.array([4])
+    solver_ = solver.GlpkSolver(nutrition_target, foods, telemetry=True)
+    assert solver_.solve(relaxation_infeasible_foods) is None
+    assert solver_.solve(integer_infeasible_foods) is None
+    np.testing.assert_array_equal(solver_.solve(feasible_foods), [1])
+    
+    telemetry = solver_.stats.telemetry
+    assert telemetry.outcomes == {'relaxation_infeasible': 1, 'integer_infeasible': 1, 'solved': 1}
+    assert telemetry.return_codes == {'GLP_ENOPFS': 1, '0': 2}
+    assert telemetry.solve_time['solved'].count == 1
+    assert telemetry.integer_time.count == 3
+    assert telemetry.iterations.count == 3
+    assert telemetry.nodes.count == 3
+    assert telemetry.nodes.max >= 1  # the integer infeasible recipe goes through branch-and-bound
+    assert 'solved 1' in str(solver_.stats)
+    assert (telemetry + telemetry).outcomes['solved'] == 2
+    
+    # Without, nothing is recorded
+    solver_ = solver.GlpkSolver(nutrition_target, foods)
+    solver_.solve(feasible_foods)
+    assert not solver_.stats.telemetry.outcomes
@@ -0,0 +1,49 @@
+# This file is part of Soylent Recipes.
+# 
+# Soylent Recipes is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Soylent Recipes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Soylent Recipes.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Test soylent_recipes.synthetic
+'''
+
+from soylent_recipes import synthetic, foods as foods_
+from pathlib import Path
+
+def test_generate_usda(tmpdir, monkeypatch):
+    '''
+    Generated files can be imported, across chunks, with some NaN values
+    '''
+    monkeypatch.setattr(synthetic, '_chunk_size', 300)
+    usda_directory = Path(str(tmpdir)) / 'usda'
+    synthetic.generate_usda(usda_directory, 1000, seed=0)
+    foods = foods_.import_usda(usda_directory)
+    assert list(foods.index) == list(range(1001, 2001))
+    assert foods['description'].notnull().all()
+    assert foods['protein'].notnull().all()
+    assert (foods['energy'] >= 0).all()
+    assert foods['fluoride'].isnull().any()
+    assert foods['fluoride'].notnull().any()
+    assert foods['Conversion factor: fat'].isnull().any()
+    
+def test_generate_usda_seed(tmpdir):
+    '''
+    The same seed generates the same files
+    '''
+    directory = Path(str(tmpdir))
+    synthetic.generate_usda(directory / '1', 10, seed=1)
+    synthetic.generate_usda(directory / '2', 10, seed=1)
+    synthetic.generate_usda(directory / '3', 10, seed=2)
+    for file in foods_.usda_files:
+        assert (directory / '1' / file).read_bytes() == (directory / '2' / file).read_bytes()
+    assert (directory / '1' / 'NUT_DATA.txt').read_bytes() != (directory / '3' / 'NUT_DATA.txt').read_bytes()